@@ -1,15 +1,163 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List, Optional
 from pydantic import BaseModel
-from utils import GeminiClient
+import metrics
+from certificates import COHORT_MAX_USERS, cohort_zip_stream, shutdown_pool
+from job_queue import QueueFull, DONE, FAILED
+from resources import get_gemini, get_jobs, register_job_handler
+import asyncio
+import hmac
+import json
 import os
 
-app = FastAPI()
-gemini = GeminiClient(api_key=os.environ.get("GEMINI_API_KEY"))
+SUMMARY_CHUNK_CHARS = 2000
+SUMMARY_FAN_IN = 8                   # summaries merged per combine call
+SUMMARY_MAX_CHARS = int(os.environ.get("EDUGENIE_SUMMARY_MAX_CHARS", "1000000"))
+
+def _combine_calls(n: int) -> int:
+    calls = 0
+    while n > 1:
+        n = -(-n // SUMMARY_FAN_IN)
+        calls += n
+    return calls
+
+def summarize_job(payload: dict, progress):
+    """
+    Summarize arbitrarily long text: summarize each chunk, then merge the summaries
+    SUMMARY_FAN_IN at a time until one is left. Every chunk is used; a chunk or
+    merge that comes back empty fails the job (and it is retried) rather than
+    leaving a hole in the summary. Progress is reported per model call.
+    """
+    text = payload["text"]
+    chunks = [text[i:i + SUMMARY_CHUNK_CHARS] for i in range(0, len(text), SUMMARY_CHUNK_CHARS)]
+    if len(chunks) <= 1:
+        progress(0.1, "summarizing")
+        summary = get_gemini().summarize(text)
+        if text and not summary:
+            raise RuntimeError("model returned no summary")
+        return {"summary": summary}
+
+    gemini = get_gemini()
+    total, done = len(chunks) + _combine_calls(len(chunks)), 0
+    parts = []
+    for i, chunk in enumerate(chunks):
+        progress(done / total, f"summarizing part {i + 1}/{len(chunks)}")
+        parts.append(gemini.summarize(chunk))
+        done += 1
+        if not parts[-1]:
+            raise RuntimeError(f"model returned no summary for part {i + 1}")
+    while len(parts) > 1:
+        final = len(parts) <= SUMMARY_FAN_IN
+        merged = []
+        for i in range(0, len(parts), SUMMARY_FAN_IN):
+            progress(done / total, "combining" if final else f"combining {len(parts)} summaries")
+            merged.append(gemini.combine_summaries(parts[i:i + SUMMARY_FAN_IN], final=final))
+            done += 1
+            if not merged[-1]:
+                raise RuntimeError("model returned no summary while combining")
+        parts = merged
+    return {"summary": parts[0]}
+
+# the shared queue (resources.get_jobs) also runs mastery_recompute and cohort_certificates
+register_job_handler("summarize", summarize_job)
+
+@asynccontextmanager
+async def lifespan(app):
+    get_jobs()      # starts the workers
+    yield
+    get_jobs().stop()
+    shutdown_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 class SummReq(BaseModel):
     text: str
 
+class CohortReq(BaseModel):
+    course: str
+    users: List[str]
+    date: Optional[str] = None
+
 @app.post("/summarize")
 def summarize(req: SummReq):
-    summary = gemini.summarize(req.text)
+    summary = get_gemini().summarize(req.text)
     return {"summary": summary}
+
+# ---- async jobs: submit, poll / stream, fetch result
+@app.post("/jobs/summarize", status_code=202)
+def submit_summarize(req: SummReq):
+    if len(req.text) > SUMMARY_MAX_CHARS:
+        return JSONResponse({"error": f"text too long ({len(req.text)} chars, max {SUMMARY_MAX_CHARS})"},
+                            status_code=413)
+    try:
+        return get_jobs().submit("summarize", {"text": req.text})
+    except QueueFull:
+        return JSONResponse({"error": "queue full, retry later"}, status_code=429, headers={"Retry-After": "5"})
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = get_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    job.pop("result")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = get_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    if job["status"] == DONE:
+        return job["result"]
+    if job["status"] == FAILED:
+        return JSONResponse({"status": FAILED, "error": job["error"]}, status_code=500)
+    return JSONResponse({"status": job["status"], "progress": job["progress"]}, status_code=202)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events: one `data:` line per progress change, ending when the job finishes."""
+    jobs = get_jobs()
+    if jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+
+    async def stream():
+        last = None
+        while True:
+            job = await asyncio.to_thread(jobs.get, job_id)
+            if job is None:     # deleted (e.g. by retention cleanup) while we were watching
+                yield f"data: {json.dumps({'id': job_id, 'status': 'gone'})}\n\n"
+                return
+            state = (job["status"], job["progress"], job["message"])
+            if state != last:
+                last = state
+                yield f"data: {json.dumps(job)}\n\n"
+            if job["status"] in (DONE, FAILED):
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
+
+def require_admin(token: Optional[str]):
+    """Admin endpoints need `X-Admin-Token: $EDUGENIE_ADMIN_TOKEN`; with no token configured they are off."""
+    expected = os.environ.get("EDUGENIE_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="admin endpoints are disabled (EDUGENIE_ADMIN_TOKEN not set)")
+    if not token or not hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="invalid admin token")
+
+@app.post("/certificates/cohort")
+def cohort_certificates(req: CohortReq, x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    if len(req.users) > COHORT_MAX_USERS:
+        raise HTTPException(status_code=413, detail=f"{len(req.users)} users; at most {COHORT_MAX_USERS} per request")
+    return StreamingResponse(
+        cohort_zip_stream(req.users, req.course, req.date),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="certificates.zip"'},
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,106 @@
+"""
+Cold-start and rerun-latency benchmark for app.py.
+
+  python benchmarks/bench_app_startup.py [--reruns 20] [--cold 5]
+
+Cold start: fresh interpreter importing what app.py used to import eagerly vs.
+what it imports now (plus the landing page module).
+Rerun: per-rerun cost of building Database/GeminiClient/LearningPath vs. the
+process-wide singletons, and end-to-end reruns of app.py via Streamlit's AppTest.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+EAGER_IMPORTS = (
+    "import streamlit, json, os, time, jwt, requests, boto3, math; "
+    "import utils, db, learning_path; "
+    "import streamlit.components.v1; from streamlit_webrtc import webrtc_streamer; "
+    "import plotly.express; from reportlab.pdfgen import canvas\n"
+    # some canvas builds refuse to register outside a running Streamlit server
+    "try:\n    from streamlit_drawable_canvas import st_canvas\nexcept Exception:\n    pass"
+)
+LAZY_IMPORTS = "import streamlit, os, metrics, views, resources; import views.landing"
+
+
+def _cold(stmt: str, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-W", "ignore", "-c", stmt], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def _median_ms(fn, n: int) -> float:
+    times = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def bench_resources(n: int, db_path: str):
+    from db import Database
+    from learning_path import LearningPath
+    from utils import GeminiClient
+    import resources
+
+    def per_rerun():
+        d = Database(db_path)
+        GeminiClient(api_key=os.environ.get("GEMINI_API_KEY"))
+        LearningPath(db=d)
+
+    def shared():
+        resources.get_db()
+        resources.get_gemini()
+        resources.get_learning_path()
+
+    resources.DB_PATH = db_path
+    return _median_ms(per_rerun, n), _median_ms(shared, n)
+
+
+def bench_reruns(n: int, pages):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    at.secrets["JWT_SECRET"] = "bench"
+    at.secrets["ADMIN_KEY"] = "bench"
+    at.run()
+    out = {}
+    for page in pages:
+        at.sidebar.radio[0].set_value(page)
+        at.run()
+        out[page] = _median_ms(at.run, n)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--reruns", type=int, default=20)
+    ap.add_argument("--cold", type=int, default=5)
+    args = ap.parse_args()
+    os.chdir(ROOT)
+
+    eager = _cold(EAGER_IMPORTS, args.cold)
+    lazy = _cold(LAZY_IMPORTS, args.cold)
+    print(f"cold start imports   eager: {eager * 1000:8.1f} ms   lazy: {lazy * 1000:8.1f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before, after = bench_resources(args.reruns, os.path.join(tmp, "bench.db"))
+    print(f"per-rerun resources  rebuilt: {before:8.2f} ms   shared: {after:8.4f} ms")
+
+    for page, ms in bench_reruns(args.reruns, ["AI Learning Planner", "Quizzes", "Settings"]).items():
+        print(f"app.py rerun         {page:<22} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
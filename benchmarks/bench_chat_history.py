@@ -0,0 +1,79 @@
+"""
+Opening a long-lived room chat: full download vs. paged queries + local mirror,
+and a burst of sends: one push per message vs. ChatBatcher.
+
+  python benchmarks/bench_chat_history.py [--messages 20000] [--latency 0.02] [--burst 200]
+
+Runs against fakes.LocalRealtimeDB with `--latency` seconds per Firebase round trip.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firebase_utils  # noqa: E402
+from chat_history import ChatBatcher, ChatMirror  # noqa: E402
+from fakes import LocalRealtimeDB  # noqa: E402
+
+
+def measure(fdb, fn):
+    reads, rbytes = fdb.reads, fdb.bytes_read
+    start = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - start, fdb.reads - reads, fdb.bytes_read - rbytes, out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=20000)
+    ap.add_argument("--latency", type=float, default=0.02)
+    ap.add_argument("--burst", type=int, default=200)
+    args = ap.parse_args()
+
+    fdb = LocalRealtimeDB()
+    firebase_utils.use_backend(fdb)
+    for i in range(0, args.messages, 1000):
+        firebase_utils.push_chat_messages("study", [
+            {"user": f"user{j % 30}", "message": f"message {j}: " + "lorem ipsum " * 4}
+            for j in range(i, min(args.messages, i + 1000))])
+    fdb.latency = args.latency
+    mirror = ChatMirror(os.path.join(tempfile.mkdtemp(), "chat_mirror.db"))
+
+    print(f"room with {args.messages} messages, {args.latency * 1000:.0f}ms per Firebase round trip\n")
+    print(f"{'open':<28} {'seconds':>8} {'reads':>6} {'bytes':>11}")
+    rows = [
+        ("full /messages download", lambda: firebase_utils._ref("/messages/study").get()),
+        ("get_messages (latest 50)", lambda: firebase_utils.get_messages("study", limit=50)),
+        ("mirror, first open", lambda: mirror.get_messages("study", limit=50)),
+    ]
+    for label, fn in rows:
+        s, r, b, _ = measure(fdb, fn)
+        print(f"{label:<28} {s:8.3f} {r:6d} {b:11d}")
+    firebase_utils.push_chat_messages("study", [{"user": "late", "message": f"new {i}"} for i in range(20)])
+    for label in ("mirror, reopen (+20 new)", "mirror, reopen (no change)"):
+        s, r, b, _ = measure(fdb, lambda: mirror.get_messages("study", limit=50))
+        print(f"{label:<28} {s:8.3f} {r:6d} {b:11d}")
+
+    print(f"\n{'burst of ' + str(args.burst) + ' sends':<28} {'seconds':>8} {'writes':>6}")
+    writes = fdb.writes
+    start = time.perf_counter()
+    for i in range(args.burst):
+        firebase_utils.push_chat_message("study", "bursty", f"push {i}")
+    print(f"{'push per message':<28} {time.perf_counter() - start:8.3f} {fdb.writes - writes:6d}")
+    batcher = ChatBatcher(mirror=mirror)
+    writes = fdb.writes
+    start = time.perf_counter()
+    for i in range(args.burst):
+        batcher.send("study", "bursty", f"batched {i}")
+    sent = time.perf_counter() - start
+    batcher.stop()
+    print(f"{'ChatBatcher (send calls)':<28} {sent:8.3f} {fdb.writes - writes:6d}")
+    print(f"{'ChatBatcher (until flushed)':<28} {time.perf_counter() - start:8.3f}")
+    firebase_utils.use_backend(None)
+
+
+if __name__ == "__main__":
+    main()
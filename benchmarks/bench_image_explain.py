@@ -0,0 +1,113 @@
+"""
+AI Tutor image analysis: request payload and latency for a raw upload vs.
+images.prepare_image, plus the perceptual-hash cache and blank-canvas skip.
+
+  python benchmarks/bench_image_explain.py [--latency 0.4] [--upload-kbps 1000] [--repeats 5]
+
+Runs against fakes.FakeLLMBackend: `--latency` seconds per call plus the payload
+size over an `--upload-kbps` link.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakes import FakeLLMBackend  # noqa: E402
+from images import PerceptualCache, prepare_image  # noqa: E402
+from utils import GeminiClient  # noqa: E402
+
+PROMPT = "Explain this hand-drawn concept diagram in simple, visual terms."
+
+
+def canvas_sketch(dx: int = 0, stray_dot: bool = False) -> np.ndarray:
+    """What st_canvas hands back: a 350x250 RGBA array with strokes on a transparent layer."""
+    img = Image.new("RGBA", (350, 250), (0, 0, 0, 0))
+    d = ImageDraw.Draw(img)
+    d.line([(30 + dx, 200), (170 + dx, 40), (320 + dx, 200)], fill=(0, 0, 0, 255), width=2)
+    d.ellipse([150 + dx, 120, 200 + dx, 170], outline=(0, 0, 0, 255), width=2)
+    d.text((40, 20), "sin(x)", fill=(0, 0, 0, 255))
+    if stray_dot:
+        d.point([(10, 10)], fill=(0, 0, 0, 255))
+    return np.array(img)
+
+
+def canvas_text(text: str) -> np.ndarray:
+    """A short formula on an otherwise empty canvas - the sparse case a whole-frame hash can't tell apart."""
+    img = Image.new("RGBA", (350, 250), (0, 0, 0, 0))
+    ImageDraw.Draw(img).text((40, 20), text, fill=(0, 0, 0, 255))
+    return np.array(img)
+
+
+def phone_photo(seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    grad = np.outer(np.linspace(0.2, 1, 3024), np.linspace(0.3, 1, 4032))[..., None] * np.array([210, 170, 120])
+    pixels = (grad + rng.normal(0, 12, grad.shape)).clip(0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=92)
+    return buf.getvalue()
+
+
+def raw_png(arr: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def timed(fn, repeats):
+    out, times = None, []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    return out, statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.4)
+    ap.add_argument("--upload-kbps", type=float, default=1000, help="upload link in KB/s")
+    ap.add_argument("--repeats", type=int, default=5)
+    args = ap.parse_args()
+
+    backend = FakeLLMBackend(latency=args.latency, upload_bps=args.upload_kbps * 1000)
+    sketch, photo = canvas_sketch(), phone_photo()
+    print(f"fake Gemini: {args.latency * 1000:.0f}ms per call + payload at {args.upload_kbps:.0f} KB/s\n")
+    print(f"{'input':<34}{'payload bytes':>14}{'prepare ms':>12}{'call ms':>10}")
+
+    for label, src, raw, canvas in (("canvas sketch 350x250", sketch, raw_png(sketch), True),
+                                    ("phone photo 4032x3024", photo, photo, False)):
+        # uncached client each time so every call reaches the backend
+        client = lambda: GeminiClient(backend=backend, image_cache=PerceptualCache(max_entries=0))
+        _, raw_s = timed(lambda: client().chat([PROMPT, {"mime_type": "image/png", "data": raw}]), args.repeats)
+        print(f"{label + ' (raw)':<34}{len(raw):>14}{'-':>12}{raw_s * 1000:>10.0f}")
+        prepared, prep_s = timed(lambda: prepare_image(src, canvas=canvas), args.repeats)
+        _, call_s = timed(lambda: client().explain_image(prepared, PROMPT), args.repeats)
+        print(f"{label + ' (prepared)':<34}{len(prepared.data):>14}{prep_s * 1000:>12.1f}{call_s * 1000:>10.0f}")
+
+    print(f"\n{'same client':<40}{'ms':>8}{'backend calls':>15}")
+    gemini = GeminiClient(backend=backend)
+    rows = [
+        ("blank canvas", np.zeros((250, 350, 4), np.uint8)),
+        ("first sketch", sketch),
+        ("same sketch + stray dot", canvas_sketch(stray_dot=True)),
+        ("same sketch moved 2px", canvas_sketch(dx=2)),
+        ("formula E=mc^2", canvas_text("E=mc^2")),
+        ("formula F=ma (must not reuse E=mc^2)", canvas_text("F=ma")),
+        ("formula x + y", canvas_text("x + y")),
+    ]
+    for label, src in rows:
+        calls = backend.calls
+        start = time.perf_counter()
+        gemini.explain_image(src, PROMPT, canvas=True)
+        print(f"{label:<40}{(time.perf_counter() - start) * 1000:>8.1f}{backend.calls - calls:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Nightly cohort mastery recompute at scale, vs. the per-user Python loop
+(LearningPath.suggest_next_topic's fallback) for a sample of users.
+
+  python benchmarks/bench_mastery.py [--users 100000] [--rows-per-user 10] [--topics 20] [--shards 1]
+
+Topics are free text, so also try a long tail, e.g. --topics 5000: the recompute
+keeps one cell per (user, topic) pair that has results, not a users x topics array.
+
+Quiz history is generated on the fly in storage-sized chunks (the generator stands
+in for Storage.iter_quiz_history); results are persisted to a temp SQLite file.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mastery  # noqa: E402
+from db import Database  # noqa: E402
+from storage import open_storage  # noqa: E402
+
+
+def synthetic_history(users: int, rows_per_user: int, topics: int, now: int, chunk_size: int = 50000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    names = np.array([f"user{i}" for i in range(users)], dtype=object)
+    topic_names = np.array([f"topic{j}" for j in range(topics)], dtype=object)
+    # each user's true accuracy on a topic, from a per-user and a per-topic part (no users x topics array)
+    ability, ease = rng.beta(4, 3, size=users), rng.beta(4, 3, size=topics)
+    for start in range(0, users * rows_per_user, chunk_size):
+        n = min(chunk_size, users * rows_per_user - start)
+        u = rng.integers(0, users, n)
+        t = rng.integers(0, topics, n)
+        score = rng.binomial(5, (ability[u] + ease[t]) / 2)
+        ts = now - rng.integers(0, 180 * 24 * 3600, n)
+        yield list(zip(names[u].tolist(), topic_names[t].tolist(), score.tolist(), [5] * n, ts.tolist()))
+
+
+def per_user_loop(rows_by_user):
+    """What suggest_next_topic's history fallback does for one user."""
+    scores, counts = {}, {}
+    for _, t, s, tot, _ in rows_by_user:
+        scores[t] = scores.get(t, 0) + s
+        counts[t] = counts.get(t, 0) + tot
+    ratios = {t: scores[t] / counts[t] for t in scores}
+    return min(ratios, key=ratios.get)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=100000)
+    ap.add_argument("--rows-per-user", type=int, default=10)
+    ap.add_argument("--topics", type=int, default=20)
+    ap.add_argument("--shards", type=int, default=1)
+    args = ap.parse_args()
+
+    now = int(time.time())
+    db = Database(storage=open_storage(os.path.join(tempfile.mkdtemp(), "mastery.db"), shards=args.shards))
+    rows = args.users * args.rows_per_user
+    print(f"{args.users} users, {rows} quiz results, {args.topics} topics, sqlite x{args.shards}\n")
+
+    start = time.perf_counter()
+    summary = mastery.recompute(db, chunks=synthetic_history(args.users, args.rows_per_user, args.topics, now),
+                                now=now)
+    total = time.perf_counter() - start
+    for phase, s in summary["seconds"].items():
+        print(f"{phase:<12}{s:>9.2f}s")
+    print(f"{'total':<12}{total:>9.2f}s   ({rows / total:,.0f} rows/s)")
+    print("weakest topics:", ", ".join(summary["weakest"][:3]))
+
+    sample = [f"user{i}" for i in range(0, args.users, max(1, args.users // 1000))]
+    start = time.perf_counter()
+    for u in sample:
+        db.get_mastery(u)
+    lookup = (time.perf_counter() - start) / len(sample)
+    print(f"\nget_mastery lookup   {lookup * 1e6:8.1f} us/user")
+
+    # the per-user loop only ever sees one user's rows; time it on a sample and extrapolate
+    history = {}
+    for chunk in synthetic_history(min(args.users, 20000), args.rows_per_user, args.topics, now):
+        for r in chunk:
+            history.setdefault(r[0], []).append(r)
+    start = time.perf_counter()
+    for user_rows in history.values():
+        per_user_loop(user_rows)
+    per_user = (time.perf_counter() - start) / len(history)
+    print(f"per-user loop        {per_user * 1e6:8.1f} us/user  "
+          f"(x{args.users} users = {per_user * args.users:.1f}s, no cohort percentiles)")
+
+
+if __name__ == "__main__":
+    main()
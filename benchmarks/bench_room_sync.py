@@ -0,0 +1,136 @@
+"""
+Peer room bandwidth and Firebase write volume: full-state writes vs. the delta relay.
+
+  python benchmarks/bench_room_sync.py [--participants 4] [--doc-chars 1000 5000 20000] [--keystrokes 500] [--strokes 40]
+
+Replays the same session both ways against fakes.LocalRealtimeDB:
+  full-state - what peer_room.html used to do: the whole notes text on every
+               keystroke, a full-canvas PNG data URL on every mouseup, each write
+               pushed by Firebase to every other participant
+  delta      - text ops + 50ms stroke point batches through room_sync, fanned out
+               by the relay, with compact snapshots persisted via firebase_utils
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import firebase_utils  # noqa: E402
+from fakes import LocalRealtimeDB  # noqa: E402
+from room_sync import RoomSyncService  # noqa: E402
+
+try:
+    from PIL import Image, ImageDraw
+    HAS_PIL = True
+except Exception:
+    HAS_PIL = False
+
+W, H = 600, 300
+POINTS_PER_STROKE = 40
+POINTS_PER_BATCH = 3   # ~50ms of mousemove events
+
+
+def size(obj) -> int:
+    return len(json.dumps(obj, separators=(",", ":")))
+
+
+def session(doc_chars: int, keystrokes: int, n_strokes: int, seed: int = 0):
+    """Yields ("key", pos) / ("stroke", points) events for one editing session."""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(keystrokes):
+        events.append(("key", rng.randint(0, doc_chars)))
+    for _ in range(n_strokes):
+        x, y = rng.randint(0, W), rng.randint(0, H)
+        pts = []
+        for _ in range(POINTS_PER_STROKE):
+            x = max(0, min(W, x + rng.randint(-8, 8)))
+            y = max(0, min(H, y + rng.randint(-8, 8)))
+            pts.append([x, y])
+        events.append(("stroke", pts))
+    rng.shuffle(events)
+    return events
+
+
+def full_state(doc_chars, events, participants):
+    fdb = LocalRealtimeDB()
+    notes_ref, canvas_ref = fdb.reference("rooms/r/notes"), fdb.reference("rooms/r/canvas")
+    text = "x" * doc_chars
+    img = Image.new("RGB", (W, H), "white") if HAS_PIL else None
+    down = 0
+    for kind, arg in events:
+        if kind == "key":
+            text = text[:arg] + "a" + text[arg:]
+            payload = {"text": text, "ts": 0}
+            notes_ref.set(payload)
+        else:
+            if img is not None:
+                ImageDraw.Draw(img).line([tuple(p) for p in arg], fill="black", width=2)
+                buf = io.BytesIO()
+                img.save(buf, format="PNG")
+                image = "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+            else:
+                image = "x" * 20000
+            payload = {"image": image, "ts": 0}
+            canvas_ref.set(payload)
+        down += size(payload) * (participants - 1)
+    return {"upload": fdb.bytes_written, "download": down, "fb_writes": fdb.writes, "fb_bytes": fdb.bytes_written}
+
+
+def delta(doc_chars, events, participants, snapshot_every):
+    fdb = LocalRealtimeDB()
+    firebase_utils.use_backend(fdb)
+    try:
+        firebase_utils.save_room_snapshot("r", {"version": 0, "text": "x" * doc_chars, "strokes": []})
+        fdb.writes = fdb.bytes_written = 0
+        svc = RoomSyncService(snapshot_every=snapshot_every, snapshot_interval=1e9)
+        join = size(svc.snapshot("r")) * participants
+        up = down = 0
+        for i, (kind, arg) in enumerate(events):
+            if kind == "key":
+                ops = [{"type": "text", "pos": arg, "del": 0, "ins": "a"}]
+            else:
+                ops = [{"type": "stroke", "id": f"c0-{i}", "color": "#000", "width": 2,
+                        "points": arg[j:j + POINTS_PER_BATCH]} for j in range(0, len(arg), POINTS_PER_BATCH)]
+            for op in ops:
+                up += size({"client_id": "c0", "base_version": 0, "op": op})
+                applied = svc.submit("r", "c0", op)
+                down += size({"version": applied["version"], "client_id": "c0", "op": applied["op"]}) * (participants - 1)
+        svc.flush()
+        return {"upload": up, "download": down + join, "fb_writes": fdb.writes, "fb_bytes": fdb.bytes_written}
+    finally:
+        firebase_utils.use_backend(None)
+
+
+def fmt(n):
+    return f"{n / 1e6:8.2f} MB" if n >= 1e5 else f"{n / 1e3:8.1f} kB"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--participants", type=int, default=4)
+    ap.add_argument("--doc-chars", type=int, nargs="+", default=[1000, 5000, 20000])
+    ap.add_argument("--keystrokes", type=int, default=500)
+    ap.add_argument("--strokes", type=int, default=40)
+    ap.add_argument("--snapshot-every", type=int, default=200)
+    args = ap.parse_args()
+    if not HAS_PIL:
+        print("Pillow not installed; full-state canvas writes use a 20 kB placeholder image\n")
+
+    print(f"{args.participants} participants, {args.keystrokes} keystrokes, {args.strokes} strokes "
+          f"x {POINTS_PER_STROKE} points\n")
+    print(f"{'doc chars':>9}  {'mode':<10} {'upload':>11} {'fan-out':>11} {'fb writes':>9} {'fb bytes':>11}")
+    for n in args.doc_chars:
+        events = session(n, args.keystrokes, args.strokes)
+        for mode, r in (("full-state", full_state(n, events, args.participants)),
+                        ("delta", delta(n, events, args.participants, args.snapshot_every))):
+            print(f"{n:>9}  {mode:<10} {fmt(r['upload'])} {fmt(r['download'])} {r['fb_writes']:>9} {fmt(r['fb_bytes'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Write throughput and cross-shard read latency per storage backend.
+
+  python benchmarks/bench_storage.py [--users 2000] [--writes 20000] [--threads 8] [--shards 1 2 4 8]
+
+Each writer thread records quiz results + XP for random users, the same
+writes the Quizzes page makes on "Finish Quiz" (quiz row, review schedule, XP).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import Database  # noqa: E402
+from learning_path import LearningPath  # noqa: E402
+from storage import MemoryStorage, open_storage  # noqa: E402
+
+
+def run_writes(db: Database, users, writes: int, threads: int) -> float:
+    per_thread = writes // threads
+    lp = LearningPath(db)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(per_thread):
+            u = rng.choice(users)
+            lp.record_quiz_result(u, rng.choice(["algebra", "fourier", "optics"]), rng.randint(0, 5), 5)
+            db.add_xp(u, rng.randint(1, 10))
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return per_thread * threads * 3 / (time.perf_counter() - start)
+
+
+def time_reads(db: Database, users, n: int = 50):
+    lb, an, due, hour = [], [], [], []
+    for _ in range(n):
+        start = time.perf_counter()
+        db.get_leaderboard(limit=10)
+        lb.append(time.perf_counter() - start)
+    for _ in range(3):
+        start = time.perf_counter()
+        db.get_activity_dataframe()
+        an.append(time.perf_counter() - start)
+    # review schedules from the writes are 1 day out: look from a day ahead
+    later = int(time.time()) + 24 * 3600
+    for u in users[:n]:
+        start = time.perf_counter()
+        db.get_due_reviews(u, until=later, limit=5)
+        due.append(time.perf_counter() - start)
+    for _ in range(5):
+        start = time.perf_counter()
+        db.get_users_due(within=3600, now=later - 3600)
+        hour.append(time.perf_counter() - start)
+    ms = lambda xs: statistics.median(xs) * 1000
+    return ms(lb), ms(an), ms(due), ms(hour)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=2000)
+    ap.add_argument("--writes", type=int, default=20000)
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = ap.parse_args()
+    users = [f"learner{i}" for i in range(args.users)]
+
+    print(f"{'backend':<14}{'writes/s':>12}{'leaderboard ms':>17}{'analytics ms':>15}"
+          f"{'due/user ms':>14}{'due by +1h ms':>19}")
+    row = "{:<14}{:>12.0f}{:>17.2f}{:>15.1f}{:>14.3f}{:>19.2f}"
+    db = Database(storage=MemoryStorage())
+    wps = run_writes(db, users, args.writes, args.threads)
+    print(row.format("memory", wps, *time_reads(db, users)))
+    for n in args.shards:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(storage=open_storage(os.path.join(tmp, "bench.db"), shards=n))
+            wps = run_writes(db, users, args.writes, args.threads)
+            print(row.format("sqlite x" + str(n), wps, *time_reads(db, users)))
+            db.storage.close()
+
+
+if __name__ == "__main__":
+    main()
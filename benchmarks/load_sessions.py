@@ -0,0 +1,326 @@
+"""
+End-to-end load test: N concurrent learners running the app's flows in one process.
+
+  python benchmarks/load_sessions.py [--learners 50] [--duration 30] [--llm-latency 0.3]
+                                     [--tts-latency 0.2] [--firebase-latency 0.02] [--json out.json]
+
+Each learner is a thread that loops: think, pick a flow, run it. Flows call the
+same functions the Streamlit pages do (resources accessors, Database,
+LearningPath, GeminiClient, certificates, the chat mirror/batcher), plus
+api_server (/jobs/summarize, under uvicorn) and token_server (room relay, under
+werkzeug) over HTTP. Gemini, gTTS and Firebase are local stand-ins
+(fakes.FakeLLMBackend, fakes.FakeTTS, fakes.LocalRealtimeDB) with the given
+latencies, so the numbers are the app's own overhead and contention.
+
+Per flow: completed runs, errors, throughput, p50/p95/p99 latency and time spent
+waiting on the in-process storage locks (storage.TimedLock, one per SQLite
+connection; see storage.lock_wait_seconds). That is Python-side contention
+between sessions sharing a connection - SQLite's own busy waits between
+connections are not in it. --json writes the same table for regression checks.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# (flow, weight): roughly how often learners open each page
+FLOWS = [("tutor", 30), ("quiz", 30), ("leaderboard", 20), ("upload", 8), ("api_summarize", 4), ("peer_room", 8)]
+TOPICS = ["Fourier Transform", "Algebra", "Optics", "Probability", "Thermodynamics", "Calculus"]
+NOTES = "Sampling theorem: a band-limited signal can be reconstructed from samples taken above twice " \
+        "its highest frequency. Aliasing folds higher frequencies onto lower ones. " * 20
+
+
+def pct(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * (len(values) - 1)))]
+
+
+def serve_api(app, port):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def serve_relay(app, port):
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)   # no per-request access log
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def quiz_responder(prompt):
+    """FakeLLMBackend responder: a JSON quiz for generate_quiz prompts, canned text otherwise."""
+    text = prompt if isinstance(prompt, str) else " ".join(p for p in prompt if isinstance(p, str))
+    if text.startswith("Generate ") and "multiple-choice" in text:
+        n = int(text.split()[1])
+        return json.dumps([{"q": f"Question {i + 1}?", "options": ["a", "b", "c", "d"], "answer": "b",
+                            "explanation": "because"} for i in range(n)])
+    return f"[FAKE RESPONSE] {text[:120]} " + "lorem ipsum dolor sit amet " * 20
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}   # flow -> [(seconds, lock_wait_seconds)]
+        self.errors = {}    # flow -> {error: count}
+
+    def record(self, flow, seconds, lock_wait, error=None):
+        with self._lock:
+            if error is None:
+                self.samples.setdefault(flow, []).append((seconds, lock_wait))
+            else:
+                errs = self.errors.setdefault(flow, {})
+                errs[error] = errs.get(error, 0) + 1
+
+    def step(self, flow, fn, *args, **kwargs):
+        from storage import lock_wait_seconds
+        waited = lock_wait_seconds()
+        start = time.perf_counter()
+        try:
+            out = fn(*args, **kwargs)
+        except Exception as e:
+            self.record(flow, time.perf_counter() - start, 0.0, f"{type(e).__name__}: {str(e)[:60]}")
+            raise
+        self.record(flow, time.perf_counter() - start, lock_wait_seconds() - waited)
+        return out
+
+
+class Learner:
+    """One simulated browser session; each method mirrors what a page does on a click."""
+    def __init__(self, i, rec, api_base, relay_base, jwt_secret, rng):
+        import httpx
+        self.name = f"learner{i}"
+        self.rec = rec
+        self.rng = rng
+        self.api = httpx.Client(base_url=api_base, timeout=30)
+        self.relay = httpx.Client(base_url=relay_base, timeout=30)
+        self.jwt_secret = jwt_secret
+
+    def tutor(self):
+        # views/tutor.py: "Ask EduGenie"
+        from resources import get_db, get_gemini
+        db, gemini = get_db(), get_gemini()
+        prev_ctx = db.cache_get(f"context:{self.name}") or ""
+        query = f"Explain {self.rng.choice(TOPICS)} in simple terms ({self.rng.randrange(1000)})"
+        response = gemini.chat(prev_ctx + "\nUser: " + query)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        text = response.get("text", "")
+        audio = gemini.tts(text)
+        if os.path.exists(audio):
+            os.remove(audio)
+        new_ctx = (prev_ctx + f"\nUser: {query}\nAI: {text}")[-4000:]
+        db.cache_set_many({f"chat:{query[:64]}": text, f"context:{self.name}": new_ctx}, int(time.time()))
+
+    def quiz_generate(self):
+        # views/quiz.py: page load + "Generate Quiz"
+        from resources import get_gemini, get_learning_path
+        lp = get_learning_path()
+        topic = lp.suggest_next_topic(self.name) or self.rng.choice(TOPICS)
+        diff = lp.adapt_difficulty(self.name, self.rng.choice(["Easy", "Medium", "Hard"]))
+        quiz = get_gemini().generate_quiz(topic, difficulty=diff, n_questions=3)
+        if not quiz or not quiz[0].get("answer"):
+            raise RuntimeError("quiz was not JSON")
+        return topic, diff, quiz
+
+    def quiz_submit(self, q):
+        # views/quiz.py: "Submit Qn"
+        from resources import get_gemini
+        ans = q["answer"] if self.rng.random() < 0.7 else "x"
+        get_gemini().chat(f'Grade: Q: {q.get("q")} | User: {ans}. Give correct/incorrect + feedback.')
+        return ans.strip().lower() == q["answer"].lower()
+
+    def quiz_finish(self, topic, diff, score, total):
+        # views/quiz.py: "Finish Quiz"
+        from resources import get_db, get_learning_path
+        get_db().add_xp(self.name, score * (1 if diff == "Easy" else 2 if diff == "Medium" else 3) + 1)
+        get_learning_path().record_quiz_result(user=self.name, topic=topic, score=score, total=total)
+
+    def leaderboard(self):
+        # views/progress.py
+        from certificates import render_certificate
+        from resources import get_db
+        db = get_db()
+        db.get_xp(self.name)
+        db.get_leaderboard(limit=10)
+        render_certificate(self.name, "EduGenie Quick Course")
+
+    def upload(self):
+        # views/upload.py: "Summarize & Generate Flashcards"
+        from resources import get_db, get_gemini
+        gemini = get_gemini()
+        raw = f"{self.name} notes {self.rng.randrange(10 ** 6)}\n" + NOTES
+        summ = gemini.summarize(raw)
+        gemini.generate_quiz(raw[:120], difficulty="Medium", n_questions=5)
+        get_db().cache_set(f"summary:{self.name}-{self.rng.randrange(100)}.txt", summ, int(time.time()))
+
+    def api_summarize(self):
+        # api_server: submit a job, poll for the result
+        r = self.api.post("/jobs/summarize", json={"text": f"{self.name} {self.rng.random()}\n" + NOTES * 3})
+        if r.status_code != 202:
+            raise RuntimeError(f"submit {r.status_code}")
+        job_id = r.json()["id"]
+        while True:
+            time.sleep(0.1)
+            r = self.api.get(f"/jobs/{job_id}/result")
+            if r.status_code == 200:
+                return
+            if r.status_code == 500:
+                raise RuntimeError("job failed")
+
+    def peer_room(self):
+        # views/peer_rooms.py + peer_room.html: join (snapshot), type a little, chat
+        import jwt
+        from resources import get_chat_batcher, get_chat_mirror
+        room = f"room{self.rng.randrange(5)}"
+        token = jwt.encode({"room": room, "user": self.name, "exp": int(time.time()) + 3600},
+                           self.jwt_secret, algorithm="HS256")
+        headers = {"Authorization": f"Bearer {token}"}
+        snap = self.relay.get(f"/rooms/{room}/snapshot", headers=headers).json()
+        version = snap["version"]
+        for word in ("note ", "from ", self.name + " "):
+            r = self.relay.post(f"/rooms/{room}/ops", headers=headers, json={
+                "client_id": self.name, "base_version": version,
+                "op": {"type": "text", "pos": len(snap["text"]), "del": 0, "ins": word}})
+            if r.status_code != 200:
+                raise RuntimeError(f"op {r.status_code}")
+            version = r.json()["version"]
+        get_chat_mirror().get_messages(room, limit=50)
+        get_chat_batcher().send(room, self.name, f"hi from {self.name}")
+
+    def run_once(self, flow):
+        rec = self.rec
+        if flow == "quiz":
+            topic, diff, quiz = rec.step("quiz_generate", self.quiz_generate)
+            score = sum(rec.step("quiz_submit", self.quiz_submit, q) for q in quiz)
+            rec.step("quiz_finish", self.quiz_finish, topic, diff, score, len(quiz))
+        else:
+            rec.step(flow, getattr(self, flow))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--learners", type=int, default=50)
+    ap.add_argument("--duration", type=float, default=30)
+    ap.add_argument("--think", type=float, default=1.0, help="mean seconds between a learner's actions")
+    ap.add_argument("--llm-latency", type=float, default=0.3)
+    ap.add_argument("--llm-quota", type=int, default=None, help="max concurrent calls the fake upstream accepts")
+    ap.add_argument("--llm-slots", type=int, default=None,
+                    help="GeminiClient's local call slots (default: GEMINI_MAX_CONCURRENCY or 32)")
+    ap.add_argument("--tts-latency", type=float, default=0.2)
+    ap.add_argument("--firebase-latency", type=float, default=0.02)
+    ap.add_argument("--shards", type=int, default=1)
+    ap.add_argument("--api-port", type=int, default=8766)
+    ap.add_argument("--relay-port", type=int, default=5002)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="also write the results here")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    jwt_secret = "load-test-secret-0123456789abcdef"
+    os.environ.update({
+        "EDUGENIE_DB_PATH": os.path.join(tmp, "edugenie.db"),
+        "EDUGENIE_DB_SHARDS": str(args.shards),
+        "EDUGENIE_CHAT_DB": os.path.join(tmp, "chat_mirror.db"),
+        "EDUGENIE_JOBS_DB": os.path.join(tmp, "jobs.db"),
+        "JWT_SECRET": jwt_secret,
+    })
+    os.environ.setdefault("EDUGENIE_SLOW_MS", "600000")  # keep the slow-op log quiet
+
+    import firebase_utils
+    import resources
+    from fakes import FakeLLMBackend, FakeTTS, LocalRealtimeDB
+    from utils import GeminiClient
+
+    firebase_utils.use_backend(LocalRealtimeDB(latency=args.firebase_latency))
+    llm = FakeLLMBackend(latency=args.llm_latency, jitter=args.llm_latency / 3, responder=quiz_responder,
+                         max_concurrency=args.llm_quota, seed=args.seed)
+    gemini = GeminiClient(backend=llm, tts_engine=FakeTTS(args.tts_latency), max_concurrency=args.llm_slots)
+    resources.override(gemini=gemini)
+
+    import api_server
+    import token_server
+    serve_api(api_server.app, args.api_port)
+    token_server.sync.start_flusher()
+    relay = serve_relay(token_server.app, args.relay_port)
+
+    rec = Recorder()
+    stop = threading.Event()
+    names, weights = zip(*FLOWS)
+
+    def session(i):
+        rng = random.Random(args.seed * 100003 + i)
+        learner = Learner(i, rec, f"http://127.0.0.1:{args.api_port}", f"http://127.0.0.1:{args.relay_port}",
+                          jwt_secret, rng)
+        time.sleep(rng.uniform(0, args.think))   # stagger arrivals
+        while not stop.is_set():
+            try:
+                learner.run_once(rng.choices(names, weights)[0])
+            except Exception:
+                pass   # already recorded against the flow
+            stop.wait(rng.expovariate(1 / args.think) if args.think else 0)
+
+    print(f"{args.learners} learners for {args.duration:.0f}s, think ~{args.think}s; stand-ins: "
+          f"LLM {args.llm_latency * 1000:.0f}ms, TTS {args.tts_latency * 1000:.0f}ms, "
+          f"Firebase {args.firebase_latency * 1000:.0f}ms; sqlite x{args.shards}\n")
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(args.learners)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    for t in threads:
+        t.join(60)
+    elapsed = time.perf_counter() - start
+    relay.shutdown()
+    resources.get_chat_batcher().stop()
+
+    results = {}
+    print(f"{'flow':<15}{'ok':>7}{'err':>6}{'per s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'TimedLock ms':>14}{'TL p99 ms':>13}")
+    for flow in ["tutor", "quiz_generate", "quiz_submit", "quiz_finish", "leaderboard", "upload",
+                 "api_summarize", "peer_room"]:
+        samples = rec.samples.get(flow, [])
+        errors = rec.errors.get(flow, {})
+        lat = [s for s, _ in samples]
+        waits = [w for _, w in samples]
+        row = {
+            "ok": len(samples), "errors": sum(errors.values()), "per_s": len(samples) / elapsed,
+            "p50_ms": pct(lat, .5) * 1000, "p95_ms": pct(lat, .95) * 1000, "p99_ms": pct(lat, .99) * 1000,
+            "timedlock_wait_ms_mean": (sum(waits) / len(waits) * 1000) if waits else float("nan"),
+            "timedlock_wait_ms_p99": pct(waits, .99) * 1000,
+            "error_kinds": errors,
+        }
+        results[flow] = row
+        print(f"{flow:<15}{row['ok']:>7}{row['errors']:>6}{row['per_s']:>8.1f}{row['p50_ms']:>9.0f}"
+              f"{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}{row['timedlock_wait_ms_mean']:>14.2f}"
+              f"{row['timedlock_wait_ms_p99']:>13.2f}")
+    for flow, row in results.items():
+        for err, n in row["error_kinds"].items():
+            print(f"  {flow}: {n} x {err}")
+    print("TimedLock = waits on the in-process storage lock per step (not SQLite busy waits)")
+    total = sum(r["ok"] for r in results.values())
+    print(f"\n{total} flow steps in {elapsed:.1f}s = {total / elapsed:.1f}/s; "
+          f"{llm.calls} LLM calls, {gemini.tts_engine.calls} TTS calls")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "elapsed_s": elapsed, "flows": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
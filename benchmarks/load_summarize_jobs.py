@@ -0,0 +1,143 @@
+"""
+Overload test: synchronous /summarize vs. the /jobs/summarize queue.
+
+  python benchmarks/load_summarize_jobs.py [--rate 40] [--duration 15] [--llm-latency 0.25] [--llm-quota 4]
+
+api_server runs in-process under uvicorn with a local stand-in LLM
+(fakes.FakeLLMBackend) whose concurrency quota caps capacity at roughly
+quota / latency requests per second. Requests arrive open-loop at --rate,
+above that capacity. Sync clients give up after --client-timeout; job clients
+submit, then poll until their result is ready.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def pct(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * (len(values) - 1)))]
+
+
+def serve(app, port):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def open_loop(rate, duration, fn):
+    results = []
+    lock = threading.Lock()
+    with ThreadPoolExecutor(max_workers=1024) as pool:
+        start = time.perf_counter()
+        i = 0
+        while time.perf_counter() - start < duration:
+            def task(i=i):
+                r = fn(i)
+                with lock:
+                    results.append(r)
+            pool.submit(task)
+            i += 1
+            time.sleep(max(0.0, start + i / rate - time.perf_counter()))
+    return results, time.perf_counter() - start
+
+
+def completions_per_window(done_times, t0, window=5.0):
+    buckets = {}
+    for t in done_times:
+        buckets[int((t - t0) // window)] = buckets.get(int((t - t0) // window), 0) + 1
+    return [round(buckets.get(k, 0) / window, 1) for k in range(max(buckets) + 1)] if buckets else []
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rate", type=float, default=40)
+    ap.add_argument("--duration", type=float, default=15)
+    ap.add_argument("--llm-latency", type=float, default=0.25)
+    ap.add_argument("--llm-quota", type=int, default=4)
+    ap.add_argument("--client-timeout", type=float, default=5.0)
+    ap.add_argument("--max-pending", type=int, default=200)
+    ap.add_argument("--poll-interval", type=float, default=1.0)
+    ap.add_argument("--port", type=int, default=8765)
+    args = ap.parse_args()
+
+    os.environ["EDUGENIE_JOBS_DB"] = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    os.environ.setdefault("EDUGENIE_SLOW_MS", "600000")  # keep the slow-op log quiet
+    os.environ["EDUGENIE_JOB_WORKERS"] = str(args.llm_quota)
+    os.environ["EDUGENIE_JOB_MAX_PENDING"] = str(args.max_pending)
+    import httpx
+    import api_server
+    import resources
+    from fakes import FakeLLMBackend
+    from utils import GeminiClient
+
+    resources.override(gemini=GeminiClient(
+        backend=FakeLLMBackend(latency=args.llm_latency, jitter=args.llm_latency / 5, max_concurrency=args.llm_quota),
+        deadline=args.client_timeout * 4))
+    serve(api_server.app, args.port)
+    base = f"http://127.0.0.1:{args.port}"
+    capacity = args.llm_quota / args.llm_latency
+    print(f"offered {args.rate:.0f} req/s for {args.duration:.0f}s; stand-in LLM capacity ~{capacity:.0f} req/s\n")
+
+    # --- synchronous endpoint
+    def sync_call(i):
+        t = time.perf_counter()
+        try:
+            r = httpx.post(base + "/summarize", json={"text": f"sync notes {i}"}, timeout=args.client_timeout)
+            return ("ok" if r.status_code == 200 else "error", time.perf_counter() - t, time.perf_counter())
+        except httpx.TimeoutException:
+            return ("timeout", time.perf_counter() - t, None)
+
+    t0 = time.perf_counter()
+    res, _ = open_loop(args.rate, args.duration, sync_call)
+    ok = [r for r in res if r[0] == "ok"]
+    print("sync /summarize")
+    print(f"  completed {len(ok)}/{len(res)}  timeouts {sum(r[0] == 'timeout' for r in res)}  "
+          f"p50 {pct([r[1] for r in ok], .5):.2f}s  p99 {pct([r[1] for r in ok], .99):.2f}s")
+    print(f"  completions/s per 5s window: {completions_per_window([r[2] for r in ok], t0)}\n")
+    time.sleep(args.client_timeout)  # let abandoned sync work drain
+
+    # --- job queue
+    client = httpx.Client(base_url=base, timeout=args.client_timeout,
+                          limits=httpx.Limits(max_connections=256, max_keepalive_connections=256))
+
+    def job_call(i):
+        t = time.perf_counter()
+        r = client.post("/jobs/summarize", json={"text": f"job notes {i}"})
+        submit_s = time.perf_counter() - t
+        if r.status_code == 429:
+            return ("rejected", submit_s, None, None)
+        job_id = r.json()["id"]
+        while True:
+            time.sleep(args.poll_interval)
+            r = client.get(f"/jobs/{job_id}/result")
+            if r.status_code == 200:
+                return ("ok", submit_s, time.perf_counter() - t, time.perf_counter())
+            if r.status_code == 500:
+                return ("failed", submit_s, None, None)
+
+    t0 = time.perf_counter()
+    res, _ = open_loop(args.rate, args.duration, job_call)
+    ok = [r for r in res if r[0] == "ok"]
+    print("job queue /jobs/summarize")
+    print(f"  completed {len(ok)}/{len(res)}  rejected(429) {sum(r[0] == 'rejected' for r in res)}  "
+          f"failed {sum(r[0] == 'failed' for r in res)}")
+    print(f"  submit p50 {pct([r[1] for r in res], .5) * 1000:.0f}ms  p99 {pct([r[1] for r in res], .99) * 1000:.0f}ms  "
+          f"end-to-end p50 {pct([r[2] for r in ok], .5):.1f}s")
+    print(f"  completions/s per 5s window: {completions_per_window([r[3] for r in ok], t0)}")
+
+
+if __name__ == "__main__":
+    main()
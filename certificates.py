@@ -0,0 +1,206 @@
+"""
+Completion certificates rendered in memory.
+
+Single certificates are cached by (user, course, date) so the progress page can
+hand bytes straight to st.download_button. Cohorts are rendered across a
+process pool - one per process, started on first use and shared by every
+request - and streamed out as a zip, one chunk at a time. The admin page renders
+its cohort zip as a "cohort_certificates" background job into CERT_DIR (see
+cohort_zip_job) rather than inside a Streamlit rerun.
+"""
+import functools
+import io
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Iterable, Iterator, List, Tuple
+
+from reportlab.pdfgen import canvas as pdf_canvas
+
+CHUNK_SIZE = 250
+COHORT_MAX_USERS = int(os.environ.get("EDUGENIE_COHORT_MAX_USERS", "5000"))
+CERT_DIR = os.environ.get("EDUGENIE_CERT_DIR", "certificates")
+CERT_ZIP_TTL_S = 24 * 3600     # finished cohort zips are removed this long after they were written
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def shared_pool() -> ProcessPoolExecutor:
+    """The process-wide render pool (spawn-based, so safe to use from Streamlit / server threads)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def today() -> str:
+    return datetime.utcnow().strftime('%Y-%m-%d')
+
+
+def certificate_filename(username: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", username.strip()) or "learner"
+    return f"certificate_{safe}.pdf"
+
+
+def _draw_pdf(username: str, course_name: str, date_str: str) -> bytes:
+    buf = io.BytesIO()
+    # invariant=1 drops timestamps/random ids, so identical inputs give identical bytes
+    c = pdf_canvas.Canvas(buf, pageCompression=1, invariant=1)
+    c.setFont("Helvetica-Bold", 24)
+    c.drawString(100, 700, "Certificate of Completion")
+    c.setFont("Helvetica", 16)
+    c.drawString(100, 650, f"This certifies that {username} has completed:")
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(100, 620, f"{course_name}")
+    c.drawString(100, 560, f"Date: {date_str}")
+    c.save()
+    return buf.getvalue()
+
+
+@functools.lru_cache(maxsize=2048)
+def _render_cached(username: str, course_name: str, date_str: str) -> bytes:
+    return _draw_pdf(username, course_name, date_str)
+
+
+def render_certificate(username: str, course_name: str, date_str: str = None) -> bytes:
+    """PDF bytes for one learner; repeated calls for the same (user, course, date) are free."""
+    return _render_cached(username, course_name, date_str or today())
+
+
+def _render_chunk(args) -> List[Tuple[str, bytes]]:
+    usernames, course_name, date_str = args
+    return [(name, _draw_pdf(name, course_name, date_str)) for name in usernames]
+
+
+def iter_cohort_certificates(usernames: Iterable[str], course_name: str, date_str: str = None,
+                             workers: int = None, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yield (username, pdf_bytes) in input order.
+    Small cohorts render in-process; larger ones are split into chunks and
+    rendered on shared_pool(), or on a pool of their own when `workers` is given.
+    """
+    date_str = date_str or today()
+    names = list(usernames)
+    chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+    cpus = os.cpu_count() or 1
+    if len(chunks) <= 1 or (workers or cpus) <= 1:
+        for chunk in chunks:
+            yield from _render_chunk((chunk, course_name, date_str))
+        return
+    args = [(c, course_name, date_str) for c in chunks]
+    if workers:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            for rendered in pool.map(_render_chunk, args):
+                yield from rendered
+        return
+    try:
+        for rendered in shared_pool().map(_render_chunk, args):
+            yield from rendered
+    except BrokenProcessPool:
+        shutdown_pool()     # a worker died; the next call starts a fresh pool
+        raise
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable buffer that zipfile writes into and we drain between entries."""
+    def __init__(self):
+        self._buf = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._buf += b
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buf)
+        self._buf.clear()
+        return data
+
+
+def cohort_zip_stream(usernames: Iterable[str], course_name: str, date_str: str = None,
+                      workers: int = None, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Stream a zip of certificates without holding the whole archive in memory.
+    PDFs are already compressed, so entries are stored rather than deflated.
+    """
+    sink = _ChunkSink()
+    seen = {}
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for name, pdf in iter_cohort_certificates(usernames, course_name, date_str, workers, chunk_size):
+            fname = certificate_filename(name)
+            n = seen.get(fname, 0)
+            seen[fname] = n + 1
+            if n:
+                fname = fname[:-4] + f"_{n + 1}.pdf"
+            zf.writestr(fname, pdf)
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
+
+
+def write_cohort_zip(usernames: Iterable[str], course_name: str, out, date_str: str = None,
+                     workers: int = None, chunk_size: int = CHUNK_SIZE):
+    """Write the cohort zip to a path or binary file object."""
+    fh = open(out, "wb") if isinstance(out, str) else out
+    try:
+        for data in cohort_zip_stream(usernames, course_name, date_str, workers, chunk_size):
+            fh.write(data)
+    finally:
+        if isinstance(out, str):
+            fh.close()
+    return out
+
+
+def _remove_old_zips(now: float):
+    for entry in os.scandir(CERT_DIR):
+        if entry.name.endswith(".zip") and now - entry.stat().st_mtime > CERT_ZIP_TTL_S:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def cohort_zip_job(payload: dict, progress) -> dict:
+    """
+    job_queue handler for kind "cohort_certificates": every registered user's certificate
+    for payload["course"] (and optional "date") in one zip under CERT_DIR.
+    Returns {"path", "users"}; more than COHORT_MAX_USERS users fails the job.
+    """
+    from resources import get_db
+    names = [u["name"] for u in get_db().get_all_users()]
+    if len(names) > COHORT_MAX_USERS:
+        raise ValueError(f"{len(names)} users; at most {COHORT_MAX_USERS} per cohort")
+    os.makedirs(CERT_DIR, exist_ok=True)
+    _remove_old_zips(time.time())
+    path = os.path.join(CERT_DIR, f"certificates_{uuid.uuid4().hex}.zip")
+    progress(0.0, f"rendering {len(names)} certificates")
+    with open(path + ".part", "wb") as fh:
+        # the stream yields about once per entry
+        for i, data in enumerate(cohort_zip_stream(names, payload["course"], payload.get("date"))):
+            fh.write(data)
+            if i % CHUNK_SIZE == 0:
+                progress(i / max(1, len(names)), f"rendered {min(i, len(names))}/{len(names)}")
+    os.replace(path + ".part", path)
+    return {"path": path, "users": len(names)}
@@ -0,0 +1,232 @@
+"""
+Room chat history: a local SQLite mirror of /messages/{room} plus batched writes.
+
+Opening a room reads the newest page from the mirror and pulls only messages
+newer than the room's cursor from Firebase - re-reading a short trailing window,
+since a key is assigned when a message is sent but written up to a batch
+interval later (and by another client's clock); older pages are fetched on demand
+when the reader scrolls back. Bursts of sends are coalesced into one
+multi-path update per room instead of one push per message.
+"""
+import sqlite3
+import threading
+import time
+from typing import Dict, List
+
+import firebase_utils
+import metrics
+
+SYNC_PAGE = 500
+SYNC_LOOKBACK_S = 5.0    # re-read keys this much older than the cursor: batching delay + client clock skew
+
+
+class ChatMirror:
+    """
+    store: module/object with get_messages(room, since_ts, limit, after_key, before_key)
+    (firebase_utils by default).
+    """
+    def __init__(self, path: str = "chat_mirror.db", store=None, page_size: int = SYNC_PAGE,
+                 lookback: float = SYNC_LOOKBACK_S):
+        self.path = path
+        self.store = store or firebase_utils
+        self.page_size = page_size
+        self.lookback = lookback
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_tables()
+
+    def _ensure_tables(self):
+        with self._lock:
+            self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                room TEXT,
+                id TEXT,
+                user TEXT,
+                message TEXT,
+                ts INTEGER,
+                PRIMARY KEY (room, id)
+            ) WITHOUT ROWID""")
+            # newest: sync cursor; oldest: how far back the mirror reaches; complete: reaches the start
+            self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rooms (
+                room TEXT PRIMARY KEY,
+                newest TEXT,
+                oldest TEXT,
+                complete INTEGER DEFAULT 0,
+                synced REAL
+            )""")
+            self._conn.commit()
+
+    def _room(self, room: str):
+        with self._lock:
+            row = self._conn.execute("SELECT newest, oldest, complete FROM rooms WHERE room = ?", (room,)).fetchone()
+        return row or (None, None, 0)
+
+    def _store_page(self, room: str, msgs: List[dict], newest=None, oldest=None, complete=None) -> int:
+        """Upsert a page (idempotent); returns how many of its messages were new to the mirror."""
+        with self._lock:
+            known = 0
+            if msgs:
+                known = self._conn.execute(
+                    "SELECT COUNT(*) FROM messages WHERE room = ? AND id BETWEEN ? AND ? AND id IN (%s)"
+                    % ",".join("?" * len(msgs)),
+                    (room, msgs[0]["id"], msgs[-1]["id"], *(m["id"] for m in msgs))).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages (room, id, user, message, ts) VALUES (?, ?, ?, ?, ?)",
+                [(room, m["id"], m.get("user"), m.get("message"), m.get("ts")) for m in msgs])
+            cur_newest, cur_oldest, cur_complete = self._room(room)
+            if newest is not None and (cur_newest is None or newest > cur_newest):
+                cur_newest = newest
+            if oldest is not None and (cur_oldest is None or oldest < cur_oldest):
+                cur_oldest = oldest
+            if complete is not None:
+                cur_complete = int(complete or cur_complete)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rooms (room, newest, oldest, complete, synced) VALUES (?, ?, ?, ?, ?)",
+                (room, cur_newest, cur_oldest, cur_complete, time.time()))
+            self._conn.commit()
+        return len(msgs) - known
+
+    def sync(self, room: str) -> int:
+        """
+        Pull messages newer than the room's cursor, starting `lookback` seconds before it
+        so late-written keys aren't skipped; returns how many were new to the mirror.
+        """
+        with metrics.timer("edugenie_chat_sync_seconds"):
+            newest, _, _ = self._room(room)
+            if newest is None:
+                # first open: just the latest page, older ones load on scroll
+                page = self.store.get_messages(room, limit=self.page_size)
+                self._store_page(room, page, newest=page[-1]["id"] if page else None,
+                                 oldest=page[0]["id"] if page else None, complete=len(page) < self.page_size)
+                return len(page)
+            total = 0
+            cursor = firebase_utils.push_id_floor(firebase_utils.push_id_time(newest) - self.lookback)
+            while True:
+                page = self.store.get_messages(room, limit=self.page_size, after_key=cursor)
+                if not page:
+                    break
+                cursor = page[-1]["id"]
+                total += self._store_page(room, page, newest=cursor)
+                if len(page) < self.page_size:
+                    break
+            return total
+
+    def _rows(self, sql: str, args) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [{"id": r[0], "user": r[1], "message": r[2], "ts": r[3]} for r in rows]
+
+    def get_messages(self, room: str, since_ts: float = None, limit: int = 50, sync: bool = True) -> List[dict]:
+        """Latest `limit` messages (or the first `limit` after since_ts), oldest first."""
+        if sync:
+            try:
+                self.sync(room)
+            except Exception as e:
+                print(f"❌ Chat sync failed for room {room}: {e}")
+        if since_ts is not None:
+            return self._rows(
+                "SELECT id, user, message, ts FROM messages WHERE room = ? AND id >= ? ORDER BY id LIMIT ?",
+                (room, firebase_utils.push_id_floor(since_ts), limit))
+        rows = self._rows(
+            "SELECT id, user, message, ts FROM messages WHERE room = ? ORDER BY id DESC LIMIT ?", (room, limit))
+        return rows[::-1]
+
+    def get_older(self, room: str, before_id: str, limit: int = 50) -> List[dict]:
+        """The `limit` messages before `before_id`, backfilling the mirror from Firebase if needed."""
+        rows = self._rows(
+            "SELECT id, user, message, ts FROM messages WHERE room = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (room, before_id, limit))[::-1]
+        _, oldest, complete = self._room(room)
+        if len(rows) < limit and not complete and oldest is not None:
+            try:
+                page = self.store.get_messages(room, limit=self.page_size, before_key=oldest)
+            except Exception as e:
+                print(f"❌ Chat backfill failed for room {room}: {e}")
+                return rows
+            self._store_page(room, page, oldest=page[0]["id"] if page else None,
+                             complete=len(page) < self.page_size)
+            return self.get_older(room, before_id, limit)
+        return rows
+
+    def add_local(self, room: str, msgs: List[dict]):
+        """Record messages we just sent so they show before the next sync."""
+        self._store_page(room, msgs)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ChatBatcher:
+    """
+    Buffers send() calls and writes each room's pending messages with one
+    firebase_utils.push_chat_messages call every `interval` seconds, or as soon
+    as `max_batch` are waiting. Keys are assigned at send() time so callers can
+    show the message (and order it) immediately.
+    """
+    def __init__(self, interval: float = 0.25, max_batch: int = 100, store=None, mirror: ChatMirror = None):
+        self.interval = interval
+        self.max_batch = max_batch
+        self.store = store or firebase_utils
+        self.mirror = mirror
+        self._pending: Dict[str, List[dict]] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+
+    def send(self, room: str, user: str, message: str) -> str:
+        msg = {"id": firebase_utils.new_push_id(), "user": user, "message": message, "ts": int(time.time())}
+        if self.mirror is not None:
+            self.mirror.add_local(room, [msg])
+        with self._cond:
+            self._pending.setdefault(room, []).append(msg)
+            if len(self._pending[room]) >= self.max_batch:
+                self._cond.notify()
+        self.start()
+        return msg["id"]
+
+    def flush(self) -> int:
+        with self._cond:
+            pending, self._pending = self._pending, {}
+        written = 0
+        for room, msgs in pending.items():
+            try:
+                self.store.push_chat_messages(room, msgs)
+                written += len(msgs)
+                metrics.observe("edugenie_chat_batch_size", len(msgs), buckets=metrics.SIZE_BUCKETS)
+            except Exception as e:
+                print(f"❌ Could not write {len(msgs)} chat messages for room {room}: {e}")
+                with self._cond:   # keep them for the next flush, ahead of newer ones
+                    self._pending[room] = msgs + self._pending.get(room, [])
+        return written
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if self._stopping:
+                    break
+                if not any(len(m) >= self.max_batch for m in self._pending.values()):
+                    self._cond.wait(self.interval)
+            self.flush()
+
+    def start(self):
+        if self._thread is None:
+            with self._cond:
+                if self._thread is None:
+                    self._stopping = False
+                    self._thread = threading.Thread(target=self._loop, name="chat-batcher", daemon=True)
+                    self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        self.flush()
@@ -1,49 +1,62 @@
-import sqlite3
 import os
 import json
+import threading
+import zlib
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, NamedTuple, Optional, Tuple
 import time
+import metrics
+from storage import Storage, open_storage
 
+DAY = 24 * 3600
+
+
+class CacheNamespace(NamedTuple):
+    ttl: Optional[int] = None        # seconds; None = never expires
+    max_rows: Optional[int] = None   # LRU-evict beyond this many entries
+    max_bytes: Optional[int] = None  # LRU-evict beyond this many stored bytes
+    compress: bool = False           # zlib values larger than COMPRESS_MIN_BYTES
+
+
+# The namespace is the key prefix before the first ':' ("chat:...", "summary:...").
+CACHE_NAMESPACES = {
+    "chat": CacheNamespace(ttl=7 * DAY, max_rows=20000, max_bytes=64 << 20, compress=True),
+    "context": CacheNamespace(ttl=30 * DAY, max_rows=20000, max_bytes=128 << 20, compress=True),
+    "learning_plan": CacheNamespace(ttl=30 * DAY, max_rows=20000, max_bytes=64 << 20, compress=True),
+    "summary": CacheNamespace(ttl=90 * DAY, max_rows=5000, max_bytes=128 << 20, compress=True),
+    "cohort": CacheNamespace(ttl=None, max_rows=100),
+    "default": CacheNamespace(ttl=None, max_rows=10000, max_bytes=32 << 20),
+}
+COMPRESS_MIN_BYTES = 512
+
+# storage.ReviewRow columns, as dict keys
+REVIEW_FIELDS = ("user", "topic", "ease", "interval", "reps", "lapses", "due", "last")
+# storage.MasteryRow columns
+MASTERY_FIELDS = ("user", "next_topic", "overall", "topics", "computed")
+
+
+@metrics.instrument_methods("edugenie_db_op_seconds")
 class Database:
-    def __init__(self, path="edugenie.db"):
+    """
+    App-facing data API. All persistence goes through a storage backend
+    (see storage.py); by default a single SQLite file at `path`, or
+    EDUGENIE_DB_SHARDS user-sharded files.
+    """
+    def __init__(self, path="edugenie.db", storage: Storage = None, cache_namespaces: Dict[str, CacheNamespace] = None):
         self.path = path
-        self._conn = sqlite3.connect(self.path, check_same_thread=False)
-        self._ensure_tables()
-
-    def _ensure_tables(self):
-        cur = self._conn.cursor()
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user TEXT PRIMARY KEY,
-            xp INTEGER DEFAULT 0,
-            profile JSON
-        )""")
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS cache (
-            key TEXT PRIMARY KEY,
-            value TEXT,
-            ts INTEGER
-        )""")
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS quiz_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user TEXT,
-            topic TEXT,
-            score INTEGER,
-            total INTEGER,
-            ts INTEGER
-        )""")
-        self._conn.commit()
+        self.storage = storage or open_storage(path)
+        self.cache_namespaces = cache_namespaces or CACHE_NAMESPACES
+        self._compactor = None
+        # rows from before namespaces (or before a namespace's TTL) would otherwise never expire
+        self.storage.cache_backfill_expiry({ns: p.ttl for ns, p in self.cache_namespaces.items() if p.ttl})
 
     def get_all_users(self):
         """
         Returns a list of all users with their XP and profile info (if any).
         Each entry: {"name": ..., "xp": ..., "profile": {...}}
         """
-        cur = self._conn.execute("SELECT user, xp, profile FROM users ORDER BY xp DESC")
         users = []
-        for row in cur.fetchall():
+        for row in self.storage.all_users():
             profile_data = {}
             if row[2]:  # profile column might be NULL
                 try:
@@ -59,89 +72,161 @@ class Database:
 
     def ensure_user(self, name, xp=0, profile=None):
         profile_json = json.dumps(profile) if profile else None
-        cur = self._conn.cursor()
-        cur.execute("INSERT OR IGNORE INTO users (user, xp, profile) VALUES (?, ?, ?)", (name, xp, profile_json))
-        self._conn.commit()
-        
+        self.storage.ensure_user(name, xp, profile_json)
+
     # XP / leaderboard
     def add_xp(self, user: str, xp: int):
-        cur = self._conn.cursor()
-        cur.execute("INSERT OR IGNORE INTO users (user, xp) VALUES (?, 0)", (user,))
-        cur.execute("UPDATE users SET xp = xp + ? WHERE user = ?", (xp, user))
-        self._conn.commit()
+        self.storage.add_xp(user, xp)
 
     def get_xp(self, user: str) -> int:
-        cur = self._conn.cursor()
-        cur.execute("SELECT xp FROM users WHERE user = ?", (user,))
-        r = cur.fetchone()
-        return int(r[0]) if r else 0
+        return self.storage.get_xp(user)
 
     def get_leaderboard(self, limit=10) -> List[Dict[str,Any]]:
-        cur = self._conn.cursor()
-        cur.execute("SELECT user, xp FROM users ORDER BY xp DESC LIMIT ?", (limit,))
-        rows = cur.fetchall()
-        return [{"user": r[0], "xp": r[1]} for r in rows]
+        return [{"user": r[0], "xp": r[1]} for r in self.storage.top_users(limit)]
 
     def update_xp(self, name, xp):
-        self._conn.execute("UPDATE users SET xp=? WHERE name=?", (xp, name))
-        self._conn.commit()
+        self.storage.set_xp(name, xp)
 
     def update_profile(self, name, profile: dict):
         """
         Update the JSON profile of a user.
         """
-        profile_json = json.dumps(profile)
-        cur = self._conn.cursor()
-        cur.execute("UPDATE users SET profile=? WHERE user=?", (profile_json, name))
-        self._conn.commit()
-    
+        self.storage.update_profile(name, json.dumps(profile))
+
     # cache
+    def _policy(self, key: str) -> Tuple[str, CacheNamespace]:
+        ns, sep, _ = key.partition(":")
+        if not (sep and ns in self.cache_namespaces):
+            ns = "default"
+        return ns, self.cache_namespaces.get(ns, CacheNamespace())
+
     def cache_set(self, key: str, value: str, ts: int=None):
-        ts = ts or int(time.time())
-        cur = self._conn.cursor()
-        cur.execute("INSERT OR REPLACE INTO cache (key, value, ts) VALUES (?, ?, ?)", (key, value, ts))
-        self._conn.commit()
+        self.cache_set_many({key: value}, ts)
 
     def cache_get(self, key: str):
-        cur = self._conn.cursor()
-        cur.execute("SELECT value FROM cache WHERE key = ?", (key,))
-        r = cur.fetchone()
-        return r[0] if r else None
+        return self.cache_get_many([key]).get(key)
+
+    def cache_set_many(self, items: Dict[str, str], ts: int=None):
+        """Write many entries in a single transaction."""
+        ts = ts or int(time.time())
+        rows = []
+        for key, value in items.items():
+            ns, policy = self._policy(key)
+            data = value.encode("utf-8") if isinstance(value, str) else value
+            stored, codec = value, ""
+            if policy.compress and len(data) >= COMPRESS_MIN_BYTES:
+                packed = zlib.compress(data, 6)
+                if len(packed) < len(data):
+                    stored, codec, data = packed, "zlib", packed
+            expires = ts + policy.ttl if policy.ttl else None
+            rows.append((key, ns, stored, codec, len(data), ts, expires))
+        if rows:
+            self.storage.cache_put_many(rows)
+
+    def cache_get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Fetch many entries in one round trip; missing or expired keys are left out."""
+        keys = list(keys)
+        found = self.storage.cache_get_many(keys, int(time.time())) if keys else {}
+        out = {}
+        for key, (value, codec) in found.items():
+            out[key] = zlib.decompress(value).decode("utf-8") if codec == "zlib" else value
+        hits = len(out)
+        metrics.inc("edugenie_cache_requests_total", hits, result="hit")
+        metrics.inc("edugenie_cache_requests_total", len(keys) - hits, result="miss")
+        return out
+
+    def compact_cache(self) -> Dict[str, int]:
+        """Expire, LRU-evict down to each namespace's caps, and reclaim file space."""
+        limits = {ns: (p.max_rows, p.max_bytes) for ns, p in self.cache_namespaces.items()}
+        stats = self.storage.cache_compact(limits, int(time.time()))
+        metrics.inc("edugenie_cache_evictions_total", stats["expired"], reason="expired")
+        metrics.inc("edugenie_cache_evictions_total", stats["evicted"], reason="lru")
+        return stats
+
+    def start_cache_compactor(self, interval: float = 600):
+        """Run compact_cache every `interval` seconds on a daemon thread (idempotent)."""
+        if self._compactor is not None:
+            return self._compactor
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.compact_cache()
+                except Exception as e:
+                    print(f"❌ Cache compaction failed: {e}")
+
+        self._compactor = threading.Thread(target=loop, name="cache-compactor", daemon=True)
+        self._compactor.start()
+        return self._compactor
 
     # quiz history
     def add_quiz_result(self, user: str, topic: str, score: int, total: int):
-        cur = self._conn.cursor()
-        cur.execute("INSERT INTO quiz_history (user, topic, score, total, ts) VALUES (?, ?, ?, ?, ?)",
-                    (user, topic, score, total, int(time.time())))
-        self._conn.commit()
+        self.storage.add_quiz_result(user, topic, score, total, int(time.time()))
 
     def get_recent_quiz_scores(self, user: str, limit: int=5):
-        cur = self._conn.cursor()
-        cur.execute("SELECT topic, score, total, ts FROM quiz_history WHERE user = ? ORDER BY ts DESC LIMIT ?", (user, limit))
-        rows = cur.fetchall()
-        return [{"topic": r[0], "score": r[1], "total": r[2], "ts": r[3]} for r in rows]
+        rows = self.storage.recent_quiz_scores(user, limit)
+        return [{"topic": r[1], "score": r[2], "total": r[3], "ts": r[4]} for r in rows]
 
     def get_all_quiz_history(self, user: str):
-        cur = self._conn.cursor()
-        cur.execute("SELECT topic, score, total, ts FROM quiz_history WHERE user = ?", (user,))
-        rows = cur.fetchall()
-        return [{"topic": r[0], "score": r[1], "total": r[2], "ts": r[3]} for r in rows]
+        rows = self.storage.quiz_history(user)
+        return [{"topic": r[1], "score": r[2], "total": r[3], "ts": r[4]} for r in rows]
 
     def get_activity_dataframe(self):
-        cur = self._conn.cursor()
-        cur.execute("SELECT user, topic, score, total, ts FROM quiz_history")
-        rows = cur.fetchall()
-        if not rows:
+        frames = [pd.DataFrame(chunk, columns=["user","topic","score","total","ts"])
+                  for chunk in self.storage.iter_quiz_history()]
+        if not frames:
             return pd.DataFrame()
-        df = pd.DataFrame(rows, columns=["user","topic","score","total","ts"])
+        df = pd.concat(frames, ignore_index=True)
         df['ts'] = pd.to_datetime(df['ts'], unit='s')
         return df
 
+    # spaced-repetition schedule (see learning_path.next_review)
+    def get_review(self, user: str, topic: str) -> Optional[Dict[str, Any]]:
+        row = self.storage.review_get(user, topic)
+        return dict(zip(REVIEW_FIELDS, row)) if row else None
+
+    def put_review(self, review: Dict[str, Any]):
+        self.storage.review_put(tuple(review[f] for f in REVIEW_FIELDS))
+
+    def get_due_reviews(self, user: str, until: int = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """The user's topics due for review by `until` (default now), most overdue first."""
+        until = int(time.time()) if until is None else until
+        return [dict(zip(REVIEW_FIELDS, r)) for r in self.storage.reviews_due(user, until, limit)]
+
+    def get_users_due(self, within: int = 3600, now: int = None, limit: int = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        {user: [reviews]} for reviews already overdue or falling due in the next `within`
+        seconds, most overdue user first.
+        """
+        now = int(time.time()) if now is None else now
+        out = {}
+        for r in self.storage.reviews_due_by(now + within, limit):
+            out.setdefault(r[0], []).append(dict(zip(REVIEW_FIELDS, r)))
+        return out
+
+    # cohort mastery (see mastery.py)
+    def put_mastery_many(self, rows: Iterable[tuple]):
+        """rows: storage.MasteryRow tuples, topics already JSON-encoded."""
+        rows = list(rows)
+        if rows:
+            self.storage.mastery_put_many(rows)
+
+    def get_mastery(self, user: str) -> Optional[Dict[str, Any]]:
+        """The user's last recomputed mastery: next_topic, overall and {topic: [mastery, percentile]}."""
+        row = self.storage.mastery_get(user)
+        if not row:
+            return None
+        out = dict(zip(MASTERY_FIELDS, row))
+        out["topics"] = json.loads(out["topics"] or "{}")
+        return out
+
+    def set_cohort_mastery(self, summary: Dict[str, Any]):
+        self.cache_set("cohort:mastery", json.dumps(summary))
+
+    def get_cohort_mastery(self) -> Optional[Dict[str, Any]]:
+        raw = self.cache_get("cohort:mastery")
+        return json.loads(raw) if raw else None
+
     def reset_db(self):
-        cur = self._conn.cursor()
-        cur.execute("DROP TABLE IF EXISTS users")
-        cur.execute("DROP TABLE IF EXISTS cache")
-        cur.execute("DROP TABLE IF EXISTS quiz_history")
-        self._conn.commit()
-        self._ensure_tables()
-        
+        self.storage.reset()
@@ -0,0 +1,286 @@
+"""
+Local stand-ins for external services, used for offline testing and benchmarks.
+"""
+import copy
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class FakeLLMBackend:
+    """
+    Drop-in backend for GeminiClient(backend=...).
+    Injects configurable latency and faults:
+      latency     - base seconds per call
+      jitter      - extra uniform(0, jitter) seconds
+      tail_rate   - fraction of calls that take `tail_latency` instead (slow tail)
+      fail_rate   - fraction of calls that raise `error` (retryable by default)
+      hang_rate   - fraction of calls that block until their timeout (or `hang_for`)
+      max_concurrency - calls beyond this many in flight wait their turn (provider quota)
+      upload_bps  - extra seconds per byte of inline image data (request upload time)
+    Multimodal prompts (lists of text and {"mime_type", "data"} parts) are accepted;
+    `bytes_sent` totals the image bytes received.
+    """
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, tail_rate: float = 0.0,
+                 tail_latency: float = 1.0, fail_rate: float = 0.0, hang_rate: float = 0.0,
+                 hang_for: float = 60.0, error: Callable[[], Exception] = None,
+                 responder: Callable[[str], str] = None, seed: Optional[int] = None,
+                 max_concurrency: int = None, upload_bps: float = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.fail_rate = fail_rate
+        self.hang_rate = hang_rate
+        self.hang_for = hang_for
+        self.error = error or (lambda: ConnectionError("injected upstream failure"))
+        self.responder = responder or _fake_response
+        self.upload_bps = upload_bps
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.calls = 0
+        self.failures = 0
+        self.bytes_sent = 0
+
+    def _roll(self):
+        with self._lock:
+            self.calls += 1
+            return self._rng.random(), self._rng.random(), self._rng.random(), self._rng.random()
+
+    def __call__(self, prompt, temperature: float = 0.3, timeout: float = None) -> str:
+        if self._slots is None:
+            return self._respond(prompt, timeout)
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("upstream concurrency quota exhausted")
+        try:
+            return self._respond(prompt, timeout)
+        finally:
+            self._slots.release()
+
+    def _respond(self, prompt, timeout: float = None) -> str:
+        hang, fail, tail, jit = self._roll()
+        if hang < self.hang_rate:
+            time.sleep(min(self.hang_for, timeout) if timeout else self.hang_for)
+            raise TimeoutError("injected hang")
+        delay = self.tail_latency if tail < self.tail_rate else self.latency + jit * self.jitter
+        if not isinstance(prompt, str):
+            sent = sum(len(p["data"]) for p in prompt if isinstance(p, dict))
+            with self._lock:
+                self.bytes_sent += sent
+            if self.upload_bps:
+                delay += sent / self.upload_bps
+        if delay:
+            time.sleep(delay)
+        if fail < self.fail_rate:
+            with self._lock:
+                self.failures += 1
+            raise self.error()
+        return self.responder(prompt)
+
+
+def _fake_response(prompt) -> str:
+    if isinstance(prompt, str):
+        return f"[FAKE RESPONSE] {prompt[:200]}"
+    parts = [p if isinstance(p, str) else f"<{p['mime_type']} {len(p['data'])} bytes>" for p in prompt]
+    return f"[FAKE RESPONSE] {' '.join(parts)[:200]}"
+
+
+class FakeTTS:
+    """
+    gTTS stand-in for GeminiClient(tts_engine=...): FakeTTS(latency)(text=..., lang=...)
+    returns an object whose save(path) sleeps `latency` (+ `per_char` per character)
+    and writes a tiny placeholder MP3.
+    """
+    def __init__(self, latency: float = 0.0, per_char: float = 0.0):
+        self.latency = latency
+        self.per_char = per_char
+        self.calls = 0
+
+    def __call__(self, text: str, lang: str = "en"):
+        self.calls += 1
+        return _FakeSpeech(self.latency + self.per_char * len(text))
+
+
+class _FakeSpeech:
+    def __init__(self, delay: float):
+        self.delay = delay
+
+    def save(self, path: str):
+        if self.delay:
+            time.sleep(self.delay)
+        with open(path, "wb") as f:
+            f.write(b"ID3\x03\x00\x00\x00\x00\x00\x00")
+
+
+class LocalRealtimeDB:
+    """
+    In-process stand-in for firebase_admin.db, enough for firebase_utils:
+    reference(path) -> ref with get/set/update/push/delete/child and ordered queries
+    (order_by_child/key, start_at, end_at, limit_to_first/last).
+    Install with firebase_utils.use_backend(LocalRealtimeDB()).
+    Counts reads/writes and JSON bytes so benchmarks can compare write volume.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.root = {}
+        self._lock = threading.RLock()
+        self.reads = self.writes = self.bytes_read = self.bytes_written = 0
+
+    def reference(self, path: str = "/"):
+        return _LocalRef(self, _split(path))
+
+    def _account(self, kind: str, value):
+        size = len(json.dumps(value, separators=(",", ":"), default=str)) if value is not None else 0
+        with self._lock:
+            if kind == "read":
+                self.reads += 1
+                self.bytes_read += size
+            else:
+                self.writes += 1
+                self.bytes_written += size
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _get(self, parts):
+        node = self.root
+        for p in parts:
+            if not isinstance(node, dict) or p not in node:
+                return None
+            node = node[p]
+        return node
+
+    def _set(self, parts, value):
+        if not parts:
+            self.root = copy.deepcopy(value) if isinstance(value, dict) else {}
+            return
+        node = self.root
+        for p in parts[:-1]:
+            if not isinstance(node.get(p), dict):
+                node[p] = {}
+            node = node[p]
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = copy.deepcopy(value)
+
+
+def _split(path: str):
+    return [p for p in str(path).split("/") if p]
+
+
+class _LocalRef:
+    def __init__(self, store: LocalRealtimeDB, parts):
+        self._store = store
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return "/" + "/".join(self._parts)
+
+    def child(self, path: str):
+        return _LocalRef(self._store, self._parts + _split(path))
+
+    def get(self):
+        with self._store._lock:
+            value = copy.deepcopy(self._store._get(self._parts))
+        self._store._account("read", value)
+        return value
+
+    def set(self, value):
+        self._store._account("write", value)
+        with self._store._lock:
+            self._store._set(self._parts, value)
+
+    def update(self, value: dict):
+        """Multi-path update: keys may contain '/' and are applied atomically."""
+        self._store._account("write", value)
+        with self._store._lock:
+            for k, v in value.items():
+                self._store._set(self._parts + _split(k), v)
+
+    def push(self, value=""):
+        from firebase_utils import new_push_id
+        ref = self.child(new_push_id())
+        if value != "":
+            ref.set(value)
+        return ref
+
+    def delete(self):
+        self._store._account("write", None)
+        with self._store._lock:
+            self._store._set(self._parts, None)
+
+    def order_by_child(self, path: str):
+        return _LocalQuery(self, lambda k, v: _child_value(v, path))
+
+    def order_by_key(self):
+        return _LocalQuery(self, lambda k, v: k)
+
+    def order_by_value(self):
+        return _LocalQuery(self, lambda k, v: v)
+
+
+def _child_value(v, path):
+    for p in _split(path):
+        v = v.get(p) if isinstance(v, dict) else None
+    return v
+
+
+class _LocalQuery:
+    def __init__(self, ref: _LocalRef, key_fn):
+        self._ref = ref
+        self._key_fn = key_fn
+        self._start = self._end = None
+        self._first = self._last = None
+
+    def start_at(self, value):
+        self._start = value
+        return self
+
+    def end_at(self, value):
+        self._end = value
+        return self
+
+    def equal_to(self, value):
+        self._start = self._end = value
+        return self
+
+    def limit_to_first(self, n: int):
+        self._first = n
+        return self
+
+    def limit_to_last(self, n: int):
+        self._last = n
+        return self
+
+    def get(self):
+        store = self._ref._store
+        with store._lock:
+            data = store._get(self._ref._parts) or {}
+            items = []
+            for k, v in data.items():
+                sort_key = self._key_fn(k, v)
+                if sort_key is None and (self._start is not None or self._end is not None):
+                    continue
+                if self._start is not None and sort_key < self._start:
+                    continue
+                if self._end is not None and sort_key > self._end:
+                    continue
+                items.append((sort_key, k, copy.deepcopy(v)))
+        # Firebase orders nulls first, then by value, ties by key
+        items.sort(key=lambda t: (t[0] is not None, t[0] if t[0] is not None else 0, t[1]))
+        if self._first is not None:
+            items = items[:self._first]
+        if self._last is not None:
+            items = items[-self._last:] if self._last else []
+        result = OrderedDict((k, v) for _, k, v in items)
+        store._account("read", result)
+        return result
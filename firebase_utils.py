@@ -1,9 +1,79 @@
 import os, json, time
-import firebase_admin
-from firebase_admin import credentials, db
+import threading
 from typing import Optional
 
+try:
+    import firebase_admin
+    from firebase_admin import credentials, db
+    HAS_FIREBASE = True
+except Exception:
+    HAS_FIREBASE = False
+
+# Anything with .reference(path) — firebase_admin.db by default, or a local stand-in
+# such as fakes.LocalRealtimeDB for tests and benchmarks (see use_backend).
+_backend = None
+
+def use_backend(backend):
+    """Route every call in this module to `backend` (None restores real Firebase)."""
+    global _backend
+    _backend = backend
+
+def _ref(path: str):
+    if _backend is not None:
+        return _backend.reference(path)
+    init_firebase()
+    return db.reference(path)
+
+_PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+_push_state = {"ts": 0, "rand": [0] * 12}
+_push_lock = threading.Lock()
+
+def new_push_id() -> str:
+    """
+    Firebase-style push key generated locally: 8 chars of millisecond timestamp + 12
+    random chars, lexicographically ordered by creation time (monotonic within a process).
+    """
+    import random
+    with _push_lock:
+        now = int(time.time() * 1000)
+        if now == _push_state["ts"]:
+            rand = _push_state["rand"]
+            i = 11
+            while i >= 0 and rand[i] == 63:
+                rand[i] = 0
+                i -= 1
+            rand[i] += 1
+        else:
+            _push_state["ts"] = now
+            _push_state["rand"] = rand = [random.randrange(64) for _ in range(12)]
+        rand = list(rand)
+    ts_chars = []
+    for _ in range(8):
+        ts_chars.append(_PUSH_CHARS[now % 64])
+        now //= 64
+    return "".join(reversed(ts_chars)) + "".join(_PUSH_CHARS[r] for r in rand)
+
+def push_id_floor(ts: float) -> str:
+    """Smallest push key created after `ts` (epoch seconds): a start_at() bound for order_by_key."""
+    now = int(ts * 1000) + 1
+    chars = []
+    for _ in range(8):
+        chars.append(_PUSH_CHARS[now % 64])
+        now //= 64
+    return "".join(reversed(chars))
+
+def push_id_time(key: str) -> float:
+    """Creation time (epoch seconds) encoded in a push key's first 8 chars."""
+    ms = 0
+    for c in key[:8]:
+        ms = ms * 64 + _PUSH_CHARS.index(c)
+    return ms / 1000
+
 def init_firebase():
+    if _backend is not None:
+        return True
+    if not HAS_FIREBASE:
+        raise RuntimeError("firebase-admin is not installed")
     # read service account JSON from secrets (string)
     svc_json = os.environ.get("FIREBASE_SERVICE_ACCOUNT")
     db_url = os.environ.get("FIREBASE_DB_URL")
@@ -16,30 +86,81 @@ def init_firebase():
     return True
 
 def push_session(user: str, payload: dict):
-    init_firebase()
-    ref = db.reference(f"/sessions/{user}")
+    ref = _ref(f"/sessions/{user}")
     key = ref.push(payload)
     return key.key
 
 def save_room_metadata(room_id: str, payload: dict):
-    init_firebase()
-    ref = db.reference(f"/rooms/{room_id}")
+    ref = _ref(f"/rooms/{room_id}")
     ref.update(payload)
 
 def get_room_metadata(room_id: str) -> Optional[dict]:
-    init_firebase()
-    ref = db.reference(f"/rooms/{room_id}")
+    ref = _ref(f"/rooms/{room_id}")
     return ref.get()
 
+def save_room_snapshot(room_id: str, snapshot: dict):
+    """
+    One compact write of a room's notes + strokes (see room_sync). Kept outside
+    /rooms/{room} so reading the room's metadata doesn't download the document.
+    """
+    _ref(f"/room_snapshots/{room_id}").set(snapshot)
+
+def get_room_snapshot(room_id: str) -> Optional[dict]:
+    snap = _ref(f"/room_snapshots/{room_id}").get()
+    if snap is None:
+        # written under the room's metadata before; move it on first read
+        legacy = _ref(f"/rooms/{room_id}/snapshot")
+        snap = legacy.get()
+        if snap is not None:
+            save_room_snapshot(room_id, snap)
+            legacy.delete()
+    return snap
+
 def push_chat_message(room_id: str, user: str, message: str):
-    init_firebase()
-    ref = db.reference(f"/messages/{room_id}")
+    ref = _ref(f"/messages/{room_id}")
     payload = {'user': user, 'message': message, 'ts': int(time.time())}
     return ref.push(payload).key
 
+def push_chat_messages(room_id: str, messages: list) -> list:
+    """
+    Write many messages in one multi-path update. Each item is {'user', 'message'[, 'ts', 'id']};
+    keys are generated locally (same ordering as push) unless given. Returns the keys.
+    """
+    updates = {}
+    for m in messages:
+        key = m.get('id') or new_push_id()
+        updates[key] = {'user': m['user'], 'message': m['message'], 'ts': m.get('ts', int(time.time()))}
+    if updates:
+        _ref(f"/messages/{room_id}").update(updates)
+    return list(updates)
+
+def get_messages(room_id: str, since_ts: float = None, limit: int = 50,
+                 after_key: str = None, before_key: str = None) -> list:
+    """
+    One page of a room's chat, oldest first, each message with its key as 'id'.
+      since_ts   - only messages sent after this time (epoch seconds)
+      after_key  - only messages after this key (cursor for incremental sync)
+      before_key - the `limit` messages just before this key (scrolling back)
+      none       - the latest `limit` messages
+    Queries order by push key, which is chronological and needs no .indexOn rule,
+    so the server only ever sends the requested page.
+    """
+    query = _ref(f"/messages/{room_id}").order_by_key()
+    if before_key is not None:
+        data = query.end_at(before_key).limit_to_last(limit + 1).get()
+        items = [(k, v) for k, v in (data or {}).items() if k != before_key][-limit:]
+    elif after_key is not None or since_ts is not None:
+        start = after_key if after_key is not None else push_id_floor(since_ts)
+        data = query.start_at(start).limit_to_first(limit + 1).get()
+        items = [(k, v) for k, v in (data or {}).items() if k != after_key][:limit]
+    else:
+        data = query.limit_to_last(limit).get()
+        items = list((data or {}).items())
+    items.sort(key=lambda kv: kv[0])
+    return [{'id': k, 'user': v.get('user'), 'message': v.get('message'), 'ts': v.get('ts')} for k, v in items]
+
 def get_leaderboard(limit=10):
-    init_firebase()
-    ref = db.reference('/leaderboard')
+    ref = _ref('/leaderboard')
     data = ref.order_by_child('xp').limit_to_last(limit).get()
     # transform to list
     res = []
@@ -50,8 +171,7 @@ def get_leaderboard(limit=10):
     return res
 
 def update_leaderboard(name: str, xp: int):
-    init_firebase()
-    ref = db.reference('/leaderboard')
+    ref = _ref('/leaderboard')
     # set or update
     # simple set by name key
     ref.child(name).set({'name': name, 'xp': xp})
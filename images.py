@@ -0,0 +1,211 @@
+"""
+Image preparation for multimodal Gemini calls.
+
+Canvas sketches (RGBA arrays) and uploaded photos are flattened onto white,
+downscaled so the long side is at most MAX_SIDE and re-encoded - palette PNG
+for drawings with few colours, JPEG for everything else - so a request carries
+a few KB to tens of KB instead of a raw pixel array or a multi-MB photo.
+
+Each prepared image also carries a 256-bit difference hash (dHash) and a tiny
+greyscale thumbnail, both taken from the inked region only (a sketch is mostly
+empty canvas; hashing the whole frame made "E=mc^2" and "F=ma" identical).
+Visually near-identical images land a few bits apart, which PerceptualCache
+uses to reuse explanations for sketches that differ by a stray pixel; the
+thumbnails are compared before a near match is trusted.
+"""
+import io
+import threading
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+MAX_SIDE = 768
+JPEG_QUALITY = 80
+PALETTE_COLORS = 256         # drawings with at most this many colours go out as palette PNG
+INK_TOLERANCE = 24           # grey levels away from the background that count as ink
+MIN_INK_PIXELS = 20          # fewer ink pixels than this (after downscaling) = blank canvas
+HASH_SIZE = 16               # dHash grid: 16x16 = 256 bits
+THUMB_SIZE = 16              # side of the greyscale thumbnail kept for match confirmation
+THUMB_MAX_DIFF = 8.0         # mean grey-level difference above which two thumbnails are different images
+INK_TRIM = 1.0               # percent of ink trimmed off each edge of the crop box (stray dots)
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    size: Tuple[int, int]
+    dhash: int
+    thumb: bytes             # THUMB_SIZE x THUMB_SIZE greyscale of the inked region
+    blank: bool
+    source_bytes: int        # what we were handed: encoded file size, or raw array size
+
+
+def load_image(src) -> Tuple[Image.Image, int]:
+    """(image, source size in bytes) from a PIL image, numpy array, bytes or file-like (e.g. UploadedFile)."""
+    if isinstance(src, Image.Image):
+        return src, len(src.tobytes())
+    if hasattr(src, "__array_interface__"):     # canvas_result.image_data
+        import numpy as np
+        arr = np.asarray(src)
+        if arr.dtype != np.uint8:
+            arr = np.clip(arr, 0, 255).astype(np.uint8)
+        return Image.fromarray(arr), arr.nbytes
+    if hasattr(src, "getvalue"):
+        src = src.getvalue()
+    elif hasattr(src, "read"):
+        src = src.read()
+    img = Image.open(io.BytesIO(src))
+    img.load()
+    return img, len(src)
+
+
+def flatten(img: Image.Image, background=(255, 255, 255)) -> Image.Image:
+    """RGB with any transparency composited onto `background` (canvas strokes sit on a transparent layer)."""
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        base = Image.new("RGB", img.size, background)
+        base.paste(img, mask=img.getchannel("A"))
+        return base
+    return img.convert("RGB")
+
+
+def _background(grey: Image.Image) -> int:
+    hist = grey.histogram()
+    return max(range(256), key=hist.__getitem__)
+
+
+def ink_box(img: Image.Image, trim: float = INK_TRIM) -> Tuple[int, int, int, int]:
+    """Crop box around the pixels that differ from the background, ignoring the outermost `trim` percent."""
+    import numpy as np
+    grey = img.convert("L")
+    px = np.asarray(grey, dtype=np.int16)
+    ys, xs = np.nonzero(np.abs(px - _background(grey)) > INK_TOLERANCE)
+    if len(xs) == 0:
+        return (0, 0) + img.size
+    x0, x1 = np.percentile(xs, [trim, 100 - trim])
+    y0, y1 = np.percentile(ys, [trim, 100 - trim])
+    return (max(0, int(x0) - 2), max(0, int(y0) - 2),
+            min(img.size[0], int(x1) + 3), min(img.size[1], int(y1) + 3))
+
+
+def thumbnail(img: Image.Image, size: int = THUMB_SIZE) -> bytes:
+    return img.convert("L").resize((size, size), Image.Resampling.BOX).tobytes()
+
+
+def thumb_diff(a: bytes, b: bytes) -> float:
+    """Mean absolute grey-level difference between two thumbnails of the same size."""
+    return sum(abs(x - y) for x, y in zip(a, b)) / max(1, len(a))
+
+
+def dhash(img: Image.Image, size: int = HASH_SIZE) -> int:
+    """Difference hash: one bit per horizontally adjacent pair of a (size+1) x size greyscale thumbnail."""
+    import numpy as np
+    px = np.asarray(img.convert("L").resize((size + 1, size), Image.Resampling.BOX), dtype=np.int16)
+    bits = (px[:, :-1] < px[:, 1:]).ravel()     # row-major, first pair is the most significant bit
+    return int.from_bytes(np.packbits(bits).tobytes(), "big") >> (-bits.size % 8)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def is_blank(img: Image.Image) -> bool:
+    """True when (almost) every pixel is within INK_TOLERANCE of the most common grey level."""
+    hist = img.convert("L").histogram()
+    bg = max(range(256), key=hist.__getitem__)
+    ink = sum(hist[:max(0, bg - INK_TOLERANCE)]) + sum(hist[bg + INK_TOLERANCE + 1:])
+    return ink < MIN_INK_PIXELS
+
+
+def encode(img: Image.Image, quality: int = JPEG_QUALITY) -> Tuple[bytes, str]:
+    buf = io.BytesIO()
+    colors = img.getcolors(PALETTE_COLORS)
+    if colors is not None:
+        img.quantize(len(colors)).save(buf, format="PNG", optimize=True)
+        return buf.getvalue(), "image/png"
+    img.save(buf, format="JPEG", quality=quality, optimize=True)
+    return buf.getvalue(), "image/jpeg"
+
+
+def prepare_image(src, max_side: int = MAX_SIDE, quality: int = JPEG_QUALITY, canvas: bool = False) -> PreparedImage:
+    """`canvas=True` for drawing-canvas input: an (almost) empty one comes back blank with no data."""
+    img, source_bytes = load_image(src)
+    img = flatten(img)
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    inked = img.crop(ink_box(img))
+    h, thumb = dhash(inked), thumbnail(inked)
+    if canvas and is_blank(img):
+        return PreparedImage(b"", "", img.size, h, thumb, True, source_bytes)
+    data, mime = encode(img, quality)
+    return PreparedImage(data, mime, img.size, h, thumb, False, source_bytes)
+
+
+class PerceptualCache:
+    """
+    LRU of values keyed by (scope, dhash), where get() also matches any stored hash
+    within `max_distance` bits in the same scope. Hashes are split into
+    max_distance + 1 bands; two hashes that close must agree on at least one band,
+    so a lookup only compares against entries sharing a band.
+
+    When a thumbnail is given, each candidate (nearest first, exact hash included)
+    must also be within `max_thumb_diff` of the thumbnail stored with it.
+    """
+    def __init__(self, max_entries: int = 2048, max_distance: int = 8, bits: int = HASH_SIZE * HASH_SIZE,
+                 max_thumb_diff: float = THUMB_MAX_DIFF):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_thumb_diff = max_thumb_diff
+        n = max_distance + 1
+        widths = [bits // n + (1 if i < bits % n else 0) for i in range(n)]
+        self._bands = []     # (shift, mask)
+        shift = bits
+        for w in widths:
+            shift -= w
+            self._bands.append((shift, (1 << w) - 1))
+        self._entries = OrderedDict()   # (scope, hash) -> (value, thumb)
+        self._index = {}                # (scope, band no, band value) -> {hash}
+        self._lock = threading.Lock()
+
+    def _band_keys(self, scope, h):
+        return [(scope, i, (h >> shift) & mask) for i, (shift, mask) in enumerate(self._bands)]
+
+    def get(self, scope: Hashable, h: int, thumb: bytes = None) -> Optional[object]:
+        with self._lock:
+            candidates = {}
+            for bk in self._band_keys(scope, h):
+                for other in self._index.get(bk, ()):
+                    if other not in candidates:
+                        d = hamming(h, other)
+                        if d <= self.max_distance:
+                            candidates[other] = d
+            for other in sorted(candidates, key=candidates.get):
+                key = (scope, other)
+                value, stored = self._entries[key]
+                if thumb is not None and stored is not None and thumb_diff(thumb, stored) > self.max_thumb_diff:
+                    continue
+                self._entries.move_to_end(key)
+                return value
+            return None
+
+    def put(self, scope: Hashable, h: int, value, thumb: bytes = None):
+        with self._lock:
+            key = (scope, h)
+            if key not in self._entries:
+                for bk in self._band_keys(scope, h):
+                    self._index.setdefault(bk, set()).add(h)
+            self._entries[key] = (value, thumb)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                (old_scope, old), _ = self._entries.popitem(last=False)
+                for bk in self._band_keys(old_scope, old):
+                    hashes = self._index.get(bk)
+                    if hashes is not None:
+                        hashes.discard(old)
+                        if not hashes:
+                            del self._index[bk]
+
+    def __len__(self):
+        return len(self._entries)
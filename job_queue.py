@@ -0,0 +1,294 @@
+"""
+Durable background job queue backed by SQLite.
+
+Jobs survive restarts: a worker holds a lease on the job it is running, which
+its process renews every lease_seconds / 3. A job whose lease has lapsed (the
+process died) is put back to 'queued' on start() and by the renewal thread of
+any process sharing the file; jobs other live processes are running are left
+alone. Identical inputs (same kind + payload) share one
+job - a finished one only for dedupe_seconds. Finished and failed jobs, with
+their payloads and results, are deleted retention_seconds after they ended.
+Workers are a fixed pool of threads, so upstream concurrency is bounded no
+matter how many requests arrive; when the backlog is full, submit() raises
+QueueFull instead of letting requests pile up.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+import metrics
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class QueueFull(Exception):
+    pass
+
+
+def input_hash(kind: str, payload: dict) -> str:
+    blob = json.dumps([kind, payload], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class JobQueue:
+    """
+    handlers: {kind: fn(payload, progress) -> result}, where progress(fraction, message)
+    records how far along the job is and result is any JSON-serialisable value.
+    """
+    def __init__(self, path: str = "jobs.db", handlers: Dict[str, Callable] = None, workers: int = 4,
+                 max_pending: int = 1000, max_attempts: int = 3, poll_interval: float = 1.0,
+                 lease_seconds: float = 60.0, dedupe_seconds: float = 3600.0,
+                 retention_seconds: float = 7 * 24 * 3600.0):
+        self.path = path
+        self.handlers = dict(handlers or {})
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.dedupe_seconds = dedupe_seconds
+        self.retention_seconds = retention_seconds
+        self.owner = uuid.uuid4().hex       # this process's claim on running jobs
+        self._running = set()               # ids our workers are executing right now
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._stopping = threading.Event()
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._ensure_tables()
+
+    def _ensure_tables(self):
+        with self._lock:
+            self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT,
+                input_hash TEXT,
+                payload TEXT,
+                status TEXT,
+                progress REAL DEFAULT 0,
+                message TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                created REAL,
+                updated REAL,
+                owner TEXT,
+                lease_until REAL
+            )""")
+            cols = {r[1] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+            for col, decl in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if col not in cols:    # jobs.db from before leases
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {col} {decl}")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_hash ON jobs (input_hash)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_updated ON jobs (status, updated)")
+
+    # ---- client side
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+
+    def submit(self, kind: str, payload: dict) -> Dict[str, Any]:
+        """
+        Queue a job, or return the existing one for an identical input: one still queued or
+        running, or one that finished less than dedupe_seconds ago.
+        Returns {"id", "status", "deduplicated"}. Raises QueueFull when the backlog is at capacity.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"unknown job kind: {kind}")
+        h = input_hash(kind, payload)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, status FROM jobs WHERE input_hash = ? AND (status IN (?, ?) OR "
+                    "(status = ? AND updated >= ?)) ORDER BY created DESC LIMIT 1",
+                    (h, QUEUED, RUNNING, DONE, now - self.dedupe_seconds)).fetchone()
+                if row:
+                    self._conn.execute("COMMIT")
+                    metrics.inc("edugenie_jobs_submitted_total", kind=kind, result="deduplicated")
+                    return {"id": row[0], "status": row[1], "deduplicated": True}
+                pending = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
+                if pending >= self.max_pending:
+                    self._conn.execute("COMMIT")
+                    metrics.inc("edugenie_jobs_submitted_total", kind=kind, result="rejected")
+                    raise QueueFull(f"{pending} jobs pending")
+                job_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO jobs (id, kind, input_hash, payload, status, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, h, json.dumps(payload), QUEUED, now, now))
+                self._conn.execute("COMMIT")
+            except QueueFull:
+                raise
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        metrics.inc("edugenie_jobs_submitted_total", kind=kind, result="queued")
+        with self._wakeup:
+            self._wakeup.notify()
+        return {"id": job_id, "status": QUEUED, "deduplicated": False}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, progress, message, result, error, attempts, created, updated "
+                "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            "id": row[0], "kind": row[1], "status": row[2], "progress": row[3], "message": row[4],
+            "result": json.loads(row[5]) if row[5] is not None else None,
+            "error": row[6], "attempts": row[7], "created": row[8], "updated": row[9],
+        }
+
+    def wait(self, job_id: str, timeout: float = None, interval: float = 0.2) -> Optional[Dict[str, Any]]:
+        """Block until the job finishes (or timeout); returns its latest state."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (DONE, FAILED):
+                return job
+            if end is not None and time.monotonic() >= end:
+                return job
+            time.sleep(interval)
+
+    # ---- worker side
+    def _claim(self) -> Optional[tuple]:
+        # only kinds we have handlers for: other processes sharing the file may run other kinds
+        kinds = list(self.handlers)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT id, kind, payload, attempts FROM jobs WHERE status = ? AND kind IN ({','.join('?' * len(kinds))}) "
+                    "ORDER BY created LIMIT 1", (QUEUED, *kinds)).fetchone()
+                if row:
+                    now = time.time()
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, updated = ?, owner = ?, lease_until = ? "
+                        "WHERE id = ?", (RUNNING, now, self.owner, now + self.lease_seconds, row[0]))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _update(self, job_id: str, **fields):
+        fields["updated"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def _run(self, job_id: str, kind: str, payload: str, attempts: int):
+        def progress(fraction: float, message: str = None):
+            self._update(job_id, progress=max(0.0, min(1.0, fraction)), message=message)
+
+        start = time.perf_counter()
+        try:
+            result = self.handlers[kind](json.loads(payload), progress)
+        except Exception as e:
+            if attempts + 1 < self.max_attempts:
+                self._update(job_id, status=QUEUED, error=str(e))
+                outcome = "retry"
+            else:
+                self._update(job_id, status=FAILED, error=str(e) or type(e).__name__)
+                outcome = "failed"
+        else:
+            self._update(job_id, status=DONE, progress=1.0, result=json.dumps(result), error=None)
+            outcome = "done"
+        metrics.observe_duration("edugenie_job_seconds", time.perf_counter() - start, kind=kind, outcome=outcome)
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+                if job is None:
+                    with self._wakeup:
+                        self._wakeup.wait(self.poll_interval)
+                    continue
+                with self._lock:
+                    self._running.add(job[0])
+                try:
+                    self._run(*job)
+                finally:
+                    with self._lock:
+                        self._running.discard(job[0])
+            except Exception as e:
+                # e.g. "database is locked" from another process; the job (if any) is
+                # re-queued once its lease lapses, the worker keeps going
+                metrics.inc("edugenie_job_worker_errors_total")
+                print(f"❌ Job worker error: {e}")
+                self._stopping.wait(self.poll_interval)
+
+    def _keep_leases(self):
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self.renew()
+                self.recover()
+                self.cleanup()
+            except Exception as e:
+                metrics.inc("edugenie_job_worker_errors_total")
+                print(f"❌ Job lease renewal error: {e}")
+
+    def renew(self) -> int:
+        """Extend the lease on every job this process's workers are executing."""
+        with self._lock:
+            if not self._running:
+                return 0
+            ids = list(self._running)
+            cur = self._conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ? AND id IN ({','.join('?' * len(ids))})",
+                (time.time() + self.lease_seconds, self.owner, RUNNING, *ids))
+            return cur.rowcount
+
+    def recover(self) -> int:
+        """Re-queue 'running' jobs whose lease lapsed, i.e. whose process crashed or was restarted."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, updated = ? "
+                "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                (QUEUED, now, RUNNING, now))
+            return cur.rowcount
+
+    def cleanup(self, now: float = None) -> int:
+        """Delete done / failed jobs that ended more than retention_seconds ago."""
+        cutoff = (time.time() if now is None else now) - self.retention_seconds
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, cutoff))
+        if cur.rowcount:
+            metrics.inc("edugenie_jobs_deleted_total", cur.rowcount)
+        return cur.rowcount
+
+    def start(self):
+        if self._threads:
+            return self
+        self.recover()
+        self.cleanup()
+        self._stopping.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._keep_leases, name="job-leases", daemon=True)
+        t.start()
+        self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
@@ -3,6 +3,34 @@ import sqlite3
 import statistics
 import time
 
+from mastery import difficulty_thresholds
+
+DAY = 24 * 3600
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+def review_quality(score: int, total: int) -> int:
+    """Quiz result as an SM-2 recall grade, 0 (blackout) .. 5 (perfect)."""
+    return int(round(5 * score / max(1, total)))
+
+def next_review(prev: Optional[dict], user: str, topic: str, quality: int, now: int) -> dict:
+    """
+    SM-2: a passing grade (>= 3) grows the interval 1 -> 6 days -> interval * ease;
+    a failing one starts the topic over from 1 day. Ease moves with each grade.
+    """
+    ease = prev["ease"] if prev else DEFAULT_EASE
+    interval = prev["interval"] if prev else 0.0
+    reps = prev["reps"] if prev else 0
+    lapses = prev["lapses"] if prev else 0
+    if quality < 3:
+        reps, interval, lapses = 0, 1.0, lapses + 1
+    else:
+        reps += 1
+        interval = 1.0 if reps == 1 else 6.0 if reps == 2 else round(interval * ease, 2)
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return {"user": user, "topic": topic, "ease": round(ease, 3), "interval": interval, "reps": reps,
+            "lapses": lapses, "due": int(now + interval * DAY), "last": int(now)}
+
 class LearningPath:
     """
     Simple learning path manager that records quiz results and suggests next topics / difficulty
@@ -14,7 +42,25 @@ class LearningPath:
     def record_quiz_result(self, user: str, topic: str, score: int, total: int):
         # store simple record in DB wrapper
         if self.db:
+            prev = self.db.get_review(user, topic)
+            if prev is None:
+                prev = self._replay_history(user, topic)
             self.db.add_quiz_result(user, topic, score, total)
+            self.db.put_review(next_review(prev, user, topic, review_quality(score, total), int(time.time())))
+
+    def _replay_history(self, user: str, topic: str) -> Optional[dict]:
+        """Schedule state from results recorded before reviews were tracked."""
+        review = None
+        hist = sorted((r for r in self.db.get_all_quiz_history(user) if r['topic'] == topic), key=lambda r: r['ts'])
+        for r in hist:
+            review = next_review(review, user, topic, review_quality(r['score'], r['total']), r['ts'])
+        return review
+
+    def due_reviews(self, user: str, within: int = 0, limit: int = 5) -> list:
+        """Topics due for review now (or within `within` seconds), most overdue first."""
+        if not self.db:
+            return []
+        return self.db.get_due_reviews(user, until=int(time.time()) + within, limit=limit)
 
     def adapt_difficulty(self, user: str, requested_level: str) -> str:
         # Basic heuristic: if user is performing well, bump difficulty, else lower
@@ -22,19 +68,29 @@ class LearningPath:
         if not recent:
             return requested_level
         avg = sum([r['score']/max(1,r['total']) for r in recent]) / len(recent)
-        if avg > 0.85:
+        # cohort quartiles from the nightly mastery recompute, fixed cut-offs before the first one
+        easy_below, hard_above = difficulty_thresholds(self.db) or (0.5, 0.85)
+        if avg > hard_above:
             # increase requested one level
             if requested_level == "Easy": return "Medium"
             if requested_level == "Medium": return "Hard"
             return "Hard"
-        elif avg < 0.5:
+        elif avg < easy_below:
             if requested_level == "Hard": return "Medium"
             if requested_level == "Medium": return "Easy"
             return "Easy"
         return requested_level
 
     def suggest_next_topic(self, user: str) -> Optional[str]:
-        # Very simple: look at weakest topic from history
+        # the most overdue review first
+        due = self.due_reviews(user, limit=1)
+        if due:
+            return due[0]['topic']
+        # then the weakest topic relative to the cohort, as of the last recompute
+        mastery = self.db.get_mastery(user) if self.db else None
+        if mastery and mastery['next_topic']:
+            return mastery['next_topic']
+        # otherwise the weakest topic from history
         hist = self.db.get_all_quiz_history(user) if self.db else []
         if not hist:
             return None
@@ -0,0 +1,242 @@
+"""
+Cohort-wide mastery recompute.
+
+Streams quiz_history in chunks into sparse (user, topic) cells of recency-weighted
+correct / attempted counts (a result `half_life_days` old counts half as much
+as one from today), then answers the cohort questions in one vectorized pass:
+
+  - per-topic mastery percentiles across the cohort (which topics a class is weakest in)
+  - each user's percentile rank per topic, and their weakest topic relative to the cohort
+  - difficulty thresholds recalibrated from the cohort's overall mastery
+    (bottom quartile -> Easy, top quartile -> Hard)
+
+Per-user results go to storage (db.get_mastery is a primary-key lookup) and the
+cohort summary to the "cohort:mastery" cache key. Meant to run nightly:
+
+  python mastery.py [--half-life 30] [--chunk-size 50000]
+
+or on demand as a "mastery_recompute" background job (see recompute_job).
+"""
+import json
+import time
+from typing import Iterable, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+import metrics
+
+DAY = 24 * 3600
+HALF_LIFE_DAYS = 30.0
+PERCENTILES = (10, 25, 50, 75, 90)
+WRITE_BATCH = 50000
+MERGE_MIN_CELLS = 1 << 20   # buffer at least this many per-chunk cells before merging
+
+
+class MasteryCells(NamedTuple):
+    """
+    Sparse user x topic counts: one cell per (user, topic) pair with any quiz results,
+    sorted by user then topic. Topics are free text, so a dense users x topics array
+    would be mostly empty and wouldn't fit at a million learners.
+    """
+    users: List[str]
+    topics: List[str]
+    user: np.ndarray       # int32 [cells], index into users
+    topic: np.ndarray      # int32 [cells], index into topics
+    correct: np.ndarray    # float32 [cells], recency-weighted questions answered correctly
+    attempted: np.ndarray  # float32 [cells], recency-weighted questions attempted
+
+    @property
+    def mastery(self) -> np.ndarray:
+        """correct / attempted per cell, NaN where nothing was attempted (total 0)."""
+        out = np.full(self.correct.shape, np.nan, dtype=np.float32)
+        np.divide(self.correct, self.attempted, out=out, where=self.attempted > 0)
+        return out
+
+
+def _codes(values, index: dict) -> np.ndarray:
+    """Stable integer ids across chunks; only each chunk's distinct values touch the dict."""
+    codes, uniques = pd.factorize(values)
+    ids = np.fromiter((index.setdefault(v, len(index)) for v in uniques), np.int64, len(uniques))
+    return ids[codes]
+
+
+def _reduce(parts) -> tuple:
+    """Sum (cell key, correct, attempted) parts into one part with unique, sorted keys."""
+    keys = np.concatenate([p[0] for p in parts])
+    cells, inverse = np.unique(keys, return_inverse=True)
+    return (cells,
+            np.bincount(inverse, weights=np.concatenate([p[1] for p in parts])).astype(np.float32),
+            np.bincount(inverse, weights=np.concatenate([p[2] for p in parts])).astype(np.float32))
+
+
+def build_cells(chunks: Iterable[list], now: float = None, half_life_days: float = HALF_LIFE_DAYS) -> MasteryCells:
+    """chunks: lists of storage.QuizRow, e.g. Storage.iter_quiz_history()."""
+    now = time.time() if now is None else now
+    users, topics = {}, {}
+    merged = (np.empty(0, np.int64), np.empty(0, np.float32), np.empty(0, np.float32))
+    pending, pending_cells = [], 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        df = pd.DataFrame(chunk, columns=["user", "topic", "score", "total", "ts"])
+        keys = (_codes(df["user"], users) << 32) | _codes(df["topic"], topics)
+        age = np.maximum(now - df["ts"].to_numpy(np.float64), 0)
+        weight = np.exp2(-age / (half_life_days * DAY))
+        pending.append(_reduce([(keys, weight * df["score"].to_numpy(np.float64),
+                                 weight * df["total"].to_numpy(np.float64))]))
+        pending_cells += len(pending[-1][0])
+        # fold chunk sums in once they outgrow what's merged, so each cell is re-sorted O(log chunks) times
+        if pending_cells >= max(len(merged[0]), MERGE_MIN_CELLS):
+            merged, pending, pending_cells = _reduce([merged] + pending), [], 0
+    keys, correct, attempted = _reduce([merged] + pending) if pending else merged
+    return MasteryCells(list(users), list(topics), (keys >> 32).astype(np.int32),
+                        (keys & 0xFFFFFFFF).astype(np.int32), correct, attempted)
+
+
+def summarize(c: MasteryCells, now: float = None) -> dict:
+    """
+    The whole cohort at once. Returns the cohort summary plus per-cell mastery and
+    percentile (rank within the cell's topic among learners who attempted it, 0..1)
+    and per-user next_topic (topic index, -1 if nothing attempted) and overall.
+    """
+    n = len(c.users)
+    mastery = c.mastery
+    by_topic = pd.Series(mastery, copy=False).groupby(c.topic, sort=False)
+    # rounded so equal scores tie no matter in which order their float32 sums were accumulated
+    percentile = (pd.Series(np.round(mastery, 6), copy=False).groupby(c.topic, sort=False)
+                  .rank(pct=True).to_numpy(np.float32))
+
+    # weakest topic relative to the cohort: per user, the lowest percentile (then lowest topic index)
+    next_topic = np.full(n, -1, dtype=np.int64)
+    ranked = ~np.isnan(percentile)
+    user, topic = c.user[ranked], c.topic[ranked]
+    order = np.lexsort((topic, percentile[ranked], user))
+    user, topic = user[order], topic[order]
+    first = np.ones(len(user), dtype=bool)
+    first[1:] = user[1:] != user[:-1]
+    next_topic[user[first]] = topic[first]
+
+    attempted_total = np.bincount(c.user, weights=c.attempted, minlength=n)
+    overall = np.full(n, np.nan, dtype=np.float32)
+    np.divide(np.bincount(c.user, weights=c.correct, minlength=n), attempted_total, out=overall,
+              where=attempted_total > 0)
+
+    # adapt_difficulty compares a learner's recent scores against these
+    easy_below, hard_above = (np.nanpercentile(overall, [25, 75]) if n else (0.5, 0.85))
+
+    learners = np.bincount(c.topic[c.attempted > 0], minlength=len(c.topics))
+    stats = (by_topic.quantile([p / 100 for p in PERCENTILES]).unstack()
+             .reindex(index=range(len(c.topics)), columns=[p / 100 for p in PERCENTILES]).to_numpy()
+             if len(c.user) else np.zeros((len(c.topics), len(PERCENTILES))))
+    topics = {
+        topic: dict({"learners": int(learners[j])},
+                    **{f"p{p}": round(float(stats[j, i]), 4) for i, p in enumerate(PERCENTILES)})
+        for j, topic in enumerate(c.topics)
+    }
+    cohort = {
+        "computed": int(time.time() if now is None else now),
+        "users": n,
+        "topics": topics,
+        "weakest": sorted(topics, key=lambda t: topics[t]["p50"]),
+        "difficulty": {"easy_below": round(float(easy_below), 4), "hard_above": round(float(hard_above), 4)},
+    }
+    return {"cohort": cohort, "mastery": mastery, "percentile": percentile,
+            "next_topic": next_topic, "overall": overall}
+
+
+def mastery_rows(c: MasteryCells, result: dict, computed: int, batch: int = WRITE_BATCH):
+    """storage.MasteryRow tuples in batches of `batch` users, topics as {topic: [mastery, percentile]}."""
+    topics = c.topics
+    bounds = np.searchsorted(c.user, np.arange(len(c.users) + 1))   # cells of user i: bounds[i]:bounds[i + 1]
+    for start in range(0, len(c.users), batch):
+        end = min(start + batch, len(c.users))
+        lo, hi = bounds[start], bounds[end]
+        cell_topic = c.topic[lo:hi].tolist()
+        mastery = np.round(result["mastery"][lo:hi].astype(np.float64), 3).tolist()
+        pct = np.round(result["percentile"][lo:hi].astype(np.float64), 3).tolist()
+        rows = []
+        for i, (user, nt, overall) in enumerate(zip(
+                c.users[start:end], result["next_topic"][start:end].tolist(),
+                result["overall"][start:end].tolist()), start):
+            cells = range(bounds[i] - lo, bounds[i + 1] - lo)
+            per_topic = {topics[cell_topic[k]]: [mastery[k], pct[k]] for k in cells if mastery[k] == mastery[k]}
+            rows.append((user, topics[nt] if nt >= 0 else None,
+                         round(overall, 4) if overall == overall else 0.0,
+                         json.dumps(per_topic, separators=(",", ":")), computed))
+        yield rows
+
+
+def recompute(db, chunks: Iterable[list] = None, now: float = None, half_life_days: float = HALF_LIFE_DAYS,
+              chunk_size: int = 50000, progress=None) -> dict:
+    """
+    Full recompute from db's quiz history (or `chunks`); persists and returns the cohort summary.
+    progress(fraction, message), if given, is called as each phase starts (job_queue style).
+    """
+    now = time.time() if now is None else now
+    progress = progress or (lambda fraction, message=None: None)
+    timings = {}
+    progress(0.0, "reading quiz history")
+    start = time.perf_counter()
+    with metrics.timer("edugenie_mastery_recompute_seconds", phase="cells"):
+        m = build_cells(chunks if chunks is not None else db.storage.iter_quiz_history(chunk_size),
+                        now, half_life_days)
+    timings["cells"] = time.perf_counter() - start
+
+    progress(0.6, f"ranking {len(m.users)} learners")
+    start = time.perf_counter()
+    with metrics.timer("edugenie_mastery_recompute_seconds", phase="summarize"):
+        result = summarize(m, now)
+    timings["summarize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with metrics.timer("edugenie_mastery_recompute_seconds", phase="persist"):
+        saved = 0
+        for rows in mastery_rows(m, result, int(now)):
+            progress(0.7 + 0.3 * saved / max(1, len(m.users)), "saving")
+            db.put_mastery_many(rows)
+            saved += len(rows)
+        cohort = result["cohort"]
+        cohort["half_life_days"] = half_life_days
+        db.set_cohort_mastery(cohort)
+    timings["persist"] = time.perf_counter() - start
+    cohort["seconds"] = {k: round(v, 3) for k, v in timings.items()}
+    return cohort
+
+
+def recompute_job(payload: dict, progress) -> dict:
+    """
+    job_queue handler for kind "mastery_recompute"; payload may set half_life_days, and
+    `after`: the "computed" time of the summary the requester saw. If a recompute has
+    finished since then, that summary is returned instead of running another one.
+    """
+    from resources import get_db
+    db = get_db()
+    latest = db.get_cohort_mastery()
+    if latest and "after" in payload and latest["computed"] > payload["after"]:
+        progress(1.0, "already recomputed")
+        return latest
+    return recompute(db, half_life_days=payload.get("half_life_days", HALF_LIFE_DAYS), progress=progress)
+
+
+def difficulty_thresholds(db) -> Optional[tuple]:
+    """(easy_below, hard_above) from the last recompute, or None before the first one."""
+    cohort = db.get_cohort_mastery() if db else None
+    if not cohort:
+        return None
+    d = cohort["difficulty"]
+    return d["easy_below"], d["hard_above"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from resources import get_db
+
+    ap = argparse.ArgumentParser(description="Recompute cohort mastery from quiz history.")
+    ap.add_argument("--half-life", type=float, default=HALF_LIFE_DAYS, help="recency half-life in days")
+    ap.add_argument("--chunk-size", type=int, default=50000)
+    args = ap.parse_args()
+    summary = recompute(get_db(), half_life_days=args.half_life, chunk_size=args.chunk_size)
+    print(f"{summary['users']} users, {len(summary['topics'])} topics in {summary['seconds']}")
+    print("weakest topics:", ", ".join(summary["weakest"][:5]))
@@ -0,0 +1,212 @@
+"""
+Lightweight in-process metrics: counters, histograms and timers, exported in
+Prometheus text format, plus a slow-operation log.
+
+Disable with EDUGENIE_METRICS=0; decorators then return the original function
+and timers become a shared no-op context manager, so the overhead is nil.
+"""
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENABLED = os.environ.get("EDUGENIE_METRICS", "1") != "0"
+SLOW_OP_SECONDS = float(os.environ.get("EDUGENIE_SLOW_MS", "500")) / 1000.0
+
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+slow_log = logging.getLogger("edugenie.slow")
+_NOOP = nullcontext()
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=TIME_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(h["buckets"]):
+                if value <= bound:
+                    h["counts"][i] += 1
+                    break
+            h["sum"] += value
+            h["count"] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> dict:
+        """Plain-dict view, handy for benchmarks and debugging pages."""
+        with self._lock:
+            out = {}
+            for (name, labels), v in self._counters.items():
+                out[(name, labels)] = v
+            for (name, labels), h in self._histograms.items():
+                out[(name + "_count", labels)] = h["count"]
+                out[(name + "_sum", labels)] = h["sum"]
+            return out
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                (k, dict(h, counts=list(h["counts"]))) for k, h in self._histograms.items()
+            )
+        lines = []
+        seen = set()
+        for (name, labels), v in counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_fmt_labels(labels)} {_fmt_num(v)}")
+        for (name, labels), h in histograms:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, n in zip(h["buckets"], h["counts"]):
+                cumulative += n
+                lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', _fmt_num(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {h['count']}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_num(h['sum'])}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {h['count']}")
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_labels(labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels:
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt_num(v) -> str:
+    return repr(float(v)) if isinstance(v, float) and not float(v).is_integer() else str(int(v))
+
+
+REGISTRY = Registry()
+
+
+def inc(name: str, value: float = 1, **labels):
+    if ENABLED:
+        REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, buckets=TIME_BUCKETS, **labels):
+    if ENABLED:
+        REGISTRY.observe(name, value, buckets=buckets, **labels)
+
+
+def observe_duration(name: str, seconds: float, **labels):
+    """Record a timing and log it if it crossed the slow-operation threshold."""
+    if not ENABLED:
+        return
+    REGISTRY.observe(name, seconds, **labels)
+    if seconds >= SLOW_OP_SECONDS:
+        slow_log.warning("slow %s %s took %.1f ms", name, labels, seconds * 1000)
+
+
+@contextmanager
+def _timer(name, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_duration(name, time.perf_counter() - start, **labels)
+
+
+def timer(name: str, **labels):
+    """`with metrics.timer("edugenie_x_seconds", op="y"): ...`"""
+    if not ENABLED:
+        return _NOOP
+    return _timer(name, labels)
+
+
+def timed(name: str, **labels):
+    """Decorator form of `timer`. Returns the function untouched when metrics are disabled."""
+    def deco(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe_duration(name, time.perf_counter() - start, **labels)
+        return wrapper
+    return deco
+
+
+def instrument_methods(name: str, exclude=()):
+    """
+    Class decorator: time every public method as `name{method="..."}`.
+    """
+    def deco(cls):
+        if not ENABLED:
+            return cls
+        for attr, fn in list(vars(cls).items()):
+            if attr.startswith("_") or attr in exclude or not callable(fn):
+                continue
+            setattr(cls, attr, timed(name, method=attr)(fn))
+        return cls
+    return deco
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
+
+
+# ---- optional standalone exporter (for processes without a web framework, e.g. Streamlit) ----
+_server = None
+_server_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "0.0.0.0"):
+    """Serve /metrics from a daemon thread. Safe to call on every Streamlit rerun."""
+    global _server
+    with _server_lock:
+        if _server is None and ENABLED:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+    return _server
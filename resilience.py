@@ -0,0 +1,270 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Optional
+
+import metrics
+
+# HTTP status codes / SDK exception names that are worth retrying
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_NAMES = {
+    "DeadlineExceeded", "ServiceUnavailable", "ResourceExhausted", "TooManyRequests",
+    "InternalServerError", "GatewayTimeout", "BadGateway", "RetryError",
+}
+
+
+class LLMError(Exception):
+    """Base error raised by the resilient call path."""
+    retryable = False
+
+
+class DeadlineExceeded(LLMError):
+    retryable = True
+
+
+class CircuitOpenError(LLMError):
+    pass
+
+
+class QueueTimeout(LLMError):
+    """No local call slot freed up in time. Says nothing about the upstream's health."""
+    retryable = False
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Decide whether an exception from a backend call is transient.
+    Works without importing google.api_core: we look at the class name and status code.
+    """
+    if isinstance(exc, LLMError):
+        return exc.retryable
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    if type(exc).__name__ in RETRYABLE_NAMES:
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    try:
+        return int(code) in RETRYABLE_STATUS
+    except (TypeError, ValueError):
+        return False
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: sleep = uniform(0, min(max_delay, base_delay * 2**attempt)).
+    """
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0, rng=None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        return self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker.
+    After `failure_threshold` consecutive failures calls fail fast for `reset_timeout` seconds,
+    then a single trial call is let through; success closes the circuit again.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                # let exactly one trial request through
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+class LatencyTracker:
+    """Rolling window of recent successful call latencies, used to pick the hedge delay."""
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            data = sorted(self._samples)
+        if not data:
+            return None
+        idx = min(len(data) - 1, int(round(q * (len(data) - 1))))
+        return data[idx]
+
+
+class ResilientCaller:
+    """
+    Wraps a blocking backend `fn(prompt, temperature=..., timeout=...) -> str` with:
+      - at most `max_workers` backend requests in flight per caller; callers queue
+        for a slot (up to `queue_timeout`, default `deadline`) before the clock starts,
+      - an overall deadline per call (each attempt gets the remaining budget),
+      - jittered retries for retryable errors,
+      - a circuit breaker that fails fast while the upstream is unhealthy,
+      - optional hedging: a second request fires after the observed p95 latency
+        and whichever finishes first wins.
+    """
+    def __init__(self, backend: Callable[..., str], deadline: float = 30.0, retry: RetryPolicy = None,
+                 breaker: CircuitBreaker = None, hedge: bool = False, hedge_quantile: float = 0.95,
+                 hedge_min_samples: int = 20, max_workers: int = 8, queue_timeout: float = None,
+                 sleep=time.sleep, clock=time.monotonic):
+        self.backend = backend
+        self.deadline = deadline
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.max_workers = max_workers
+        self.queue_timeout = deadline if queue_timeout is None else queue_timeout
+        self.latency = LatencyTracker()
+        self._sleep = sleep
+        self._clock = clock
+        # daemon-style pool: a hung upstream call keeps its worker, never the caller.
+        # A slot is held from submit until the backend returns, so a submitted request
+        # always finds a free worker and never sits in the pool's own queue.
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-call")
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_quantile)
+
+    def _acquire_slot(self, timeout: float):
+        start = self._clock()
+        if not self._slots.acquire(timeout=max(0.0, timeout)):
+            metrics.inc("edugenie_llm_queue_timeouts_total")
+            raise QueueTimeout(f"no free LLM call slot within {timeout:.1f}s ({self.max_workers} in flight)")
+        metrics.observe("edugenie_llm_queue_wait_seconds", self._clock() - start)
+
+    def _run(self, prompt, temperature: float, timeout: float) -> str:
+        try:
+            return self.backend(prompt, temperature=temperature, timeout=timeout)
+        finally:
+            self._slots.release()
+
+    def _cancel(self, futures):
+        for fut in futures:
+            if fut.cancel():   # never started, so _run won't release its slot
+                self._slots.release()
+
+    def _attempt(self, prompt: str, temperature: float, timeout: float) -> str:
+        """One attempt, hedged if enabled. The caller already holds a slot for the first request."""
+        start = self._clock()
+        first = self._pool.submit(self._run, prompt, temperature, timeout)
+        pending = {first}
+        delay = self.hedge_delay()
+        if delay is not None and delay < timeout:
+            done, _ = wait(pending, timeout=delay)
+            # hedge only with a spare slot; never queue behind other callers for it
+            if not done and self._slots.acquire(blocking=False):
+                remaining = max(0.0, timeout - (self._clock() - start))
+                pending.add(self._pool.submit(self._run, prompt, temperature, remaining))
+                metrics.inc("edugenie_llm_hedged_requests_total")
+        last_exc = None
+        while pending:
+            remaining = timeout - (self._clock() - start)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in done:
+                exc = fut.exception()
+                if exc is None:
+                    self._cancel(pending)
+                    self.latency.add(self._clock() - start)
+                    return fut.result()
+                last_exc = exc
+        self._cancel(pending)
+        if last_exc is not None and not pending:
+            raise last_exc
+        raise DeadlineExceeded(f"LLM call exceeded {timeout:.1f}s deadline")
+
+    def __call__(self, prompt: str, temperature: float = 0.3) -> str:
+        end = None
+        last_exc = None
+        if self.breaker.state == CircuitBreaker.OPEN:
+            # don't queue for a slot just to be turned away
+            metrics.inc("edugenie_llm_circuit_rejections_total")
+            raise CircuitOpenError("LLM circuit open; failing fast")
+        for attempt in range(self.retry.max_attempts):
+            if end is None:
+                # waiting for a local slot is queueing, not upstream latency:
+                # the deadline starts once we hold one
+                self._acquire_slot(self.queue_timeout)
+                end = self._clock() + self.deadline
+            else:
+                try:
+                    self._acquire_slot(end - self._clock())
+                except QueueTimeout:
+                    break   # report the upstream error that caused the retry
+            # the slot is taken first so a half-open trial always gets to run
+            if not self.breaker.allow():
+                self._slots.release()
+                metrics.inc("edugenie_llm_circuit_rejections_total")
+                raise CircuitOpenError("LLM circuit open; failing fast") from last_exc
+            remaining = end - self._clock()
+            if remaining <= 0:
+                self._slots.release()
+                break
+            try:
+                text = self._attempt(prompt, temperature, remaining)
+            except Exception as e:
+                last_exc = e
+                if not is_retryable(e):
+                    # the upstream answered (e.g. a bad request); that says nothing about its health
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                pause = self.retry.backoff(attempt)
+                if attempt + 1 >= self.retry.max_attempts or self._clock() + pause >= end:
+                    break
+                metrics.inc("edugenie_llm_retries_total")
+                self._sleep(pause)
+                continue
+            self.breaker.record_success()
+            return text
+        if last_exc is not None:
+            raise last_exc
+        raise DeadlineExceeded(f"LLM call exceeded {self.deadline:.1f}s deadline")
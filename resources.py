@@ -0,0 +1,120 @@
+"""
+Process-wide shared resources.
+
+Streamlit re-executes app.py on every interaction and runs each session in its own
+thread; everything here is built once per process and shared across sessions.
+api_server uses the same accessors (get_gemini, get_jobs, and get_db through the
+mastery job). Modules are imported inside the factories, so importing this file
+doesn't pull in pandas, numpy, firebase_admin or the Gemini SDK before a page needs them.
+"""
+import json
+import os
+import threading
+from typing import Callable, Dict
+
+DB_PATH = os.environ.get("EDUGENIE_DB_PATH", "edugenie.db")
+CHAT_DB_PATH = os.environ.get("EDUGENIE_CHAT_DB", "chat_mirror.db")
+JOBS_DB_PATH = os.environ.get("EDUGENIE_JOBS_DB", "jobs.db")
+
+_lock = threading.RLock()   # factories may call other accessors
+_instances = {}
+_job_handlers: Dict[str, Callable] = {}   # extra kinds from register_job_handler
+
+
+def _singleton(key, factory):
+    inst = _instances.get(key)
+    if inst is None:
+        with _lock:
+            inst = _instances.get(key)
+            if inst is None:
+                inst = _instances[key] = factory()
+    return inst
+
+
+def get_db() -> "Database":
+    def build():
+        from db import Database
+        db = Database(DB_PATH)
+        db.start_cache_compactor(float(os.environ.get("EDUGENIE_CACHE_COMPACT_S", "600")))
+        return db
+    return _singleton("db", build)
+
+
+def get_gemini() -> "GeminiClient":
+    def build():
+        from utils import GeminiClient
+        return GeminiClient(api_key=os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY"))
+    return _singleton("gemini", build)
+
+
+def get_learning_path() -> "LearningPath":
+    def build():
+        from learning_path import LearningPath
+        return LearningPath(db=get_db())
+    return _singleton("learning_path", build)
+
+
+def get_chat_mirror() -> "ChatMirror":
+    def build():
+        from chat_history import ChatMirror
+        return ChatMirror(CHAT_DB_PATH)
+    return _singleton("chat_mirror", build)
+
+
+def get_chat_batcher() -> "ChatBatcher":
+    def build():
+        from chat_history import ChatBatcher
+        return ChatBatcher(mirror=get_chat_mirror())
+    return _singleton("chat_batcher", build)
+
+
+def register_job_handler(kind: str, fn: Callable):
+    """Add a job kind this process runs (e.g. api_server's "summarize"), before or after get_jobs()."""
+    with _lock:
+        _job_handlers[kind] = fn
+        jobs = _instances.get("jobs")
+        if jobs is not None:
+            jobs.handlers[kind] = fn
+
+
+def get_jobs() -> "JobQueue":
+    """
+    The process's background job queue, started on first use: the admin's mastery recompute
+    and cohort certificates, plus kinds added with register_job_handler.
+    EDUGENIE_JOB_WORKERS (default 4) workers, at most EDUGENIE_JOB_MAX_PENDING queued;
+    finished jobs are reused for EDUGENIE_JOB_DEDUPE_S and kept for EDUGENIE_JOB_RETENTION_S.
+    """
+    def build():
+        import certificates
+        import mastery
+        from job_queue import JobQueue
+        handlers = {"mastery_recompute": mastery.recompute_job,
+                    "cohort_certificates": certificates.cohort_zip_job, **_job_handlers}
+        return JobQueue(JOBS_DB_PATH, handlers=handlers,
+                        workers=int(os.environ.get("EDUGENIE_JOB_WORKERS", "4")),
+                        max_pending=int(os.environ.get("EDUGENIE_JOB_MAX_PENDING", "1000")),
+                        dedupe_seconds=float(os.environ.get("EDUGENIE_JOB_DEDUPE_S", "3600")),
+                        retention_seconds=float(os.environ.get("EDUGENIE_JOB_RETENTION_S", str(7 * 24 * 3600)))).start()
+    return _singleton("jobs", build)
+
+
+def get_assets() -> dict:
+    def load():
+        try:
+            with open("assets/config.json", "r") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+    return _singleton("assets", load)
+
+
+def override(**instances):
+    """Pre-seed accessors with stand-ins, e.g. override(gemini=GeminiClient(backend=...)) (load tests)."""
+    with _lock:
+        _instances.update(instances)
+
+
+def reset():
+    """Drop all cached instances (tests / benchmarks)."""
+    with _lock:
+        _instances.clear()
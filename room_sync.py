@@ -0,0 +1,274 @@
+"""
+Peer room sync relay.
+
+Clients send small operations instead of whole documents:
+  text:   {"type": "text", "pos": p, "del": n, "ins": "abc"}   (delete n chars at p, then insert)
+  stroke: {"type": "stroke", "id": sid, "color": c, "width": w, "points": [[x, y], ...]}
+          (the first delta for an id starts the stroke, later ones append points)
+  clear:  {"type": "clear"}
+
+The relay orders ops into a per-room version sequence, rebases text ops sent
+against an older version over everything applied since, fans them out to
+subscribers and periodically persists one compact snapshot through
+firebase_utils instead of a Firebase write per keystroke / mouseup. Rooms nobody
+has used for `idle_evict_s` are dropped from memory once their snapshot is saved,
+and reloaded from it on the next open.
+"""
+import math
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import metrics
+
+LOG_SIZE = 2000
+
+
+def _map_pos(pos: int, op: dict, is_end: bool) -> int:
+    """Where `pos` ends up after `op` is applied (inserts at the same spot go first)."""
+    start, end, n_ins = op["pos"], op["pos"] + op.get("del", 0), len(op.get("ins", ""))
+    if pos < start or (is_end and pos == start):
+        return pos
+    if pos > end or start == end:
+        return pos - (end - start) + n_ins
+    # touching the deleted range: keep the other side's inserted text out of our range
+    return start if is_end else start + n_ins
+
+
+def rebase_text_op(op: dict, applied: dict) -> dict:
+    """
+    Transform text `op` so it applies after concurrent text op `applied`.
+    Ops are single ranges, so when `op` deletes a range strictly around `applied`'s,
+    the text `applied` inserted there goes with it; everything else from both sides survives.
+    """
+    start = _map_pos(op["pos"], applied, False)
+    end = _map_pos(op["pos"] + op.get("del", 0), applied, True)
+    return {**op, "pos": start, "del": max(0, end - start)}
+
+
+def stroke_points(points) -> List[list]:
+    """Copy of a stroke's [[x, y], ...] with finite numbers only; anything else raises ValueError before it reaches a snapshot."""
+    if not isinstance(points, list):
+        raise ValueError("stroke points must be a list of [x, y] pairs")
+    out = []
+    for p in points:
+        if (not isinstance(p, (list, tuple)) or len(p) != 2 or
+                not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in p)):
+            raise ValueError(f"bad stroke point: {p!r}")
+        out.append([p[0], p[1]])
+    return out
+
+
+def apply_text_op(text: str, op: dict) -> str:
+    pos = max(0, min(len(text), op["pos"]))
+    return text[:pos] + op.get("ins", "") + text[pos + op.get("del", 0):]
+
+
+class Room:
+    def __init__(self, name: str, snapshot: dict = None):
+        snapshot = snapshot or {}
+        self.name = name
+        self.version = int(snapshot.get("version", 0))
+        self.text = snapshot.get("text", "")
+        self.strokes = {s["id"]: s for s in snapshot.get("strokes", []) or []}
+        self.log = deque(maxlen=LOG_SIZE)   # (version, client_id, op)
+        self.subscribers: List[queue.Queue] = []
+        self.lock = threading.Lock()
+        self.dirty_ops = 0
+        self.persisted_at = self.last_used = time.monotonic()
+        self.evicted = False
+
+    def snapshot(self) -> dict:
+        strokes = [{**s, "points": list(s["points"])} for s in self.strokes.values()]
+        return {"version": self.version, "text": self.text, "strokes": strokes}
+
+
+class RoomSyncService:
+    """
+    store: module/object with get_room_snapshot(room) and save_room_snapshot(room, snapshot)
+    (firebase_utils by default). Snapshots are written after `snapshot_every` ops or
+    `snapshot_interval` seconds, whichever comes first, and on flush(). evict_idle()
+    (run by the flusher) drops rooms with no subscribers and no use for `idle_evict_s`.
+    """
+    def __init__(self, store=None, snapshot_every: int = 200, snapshot_interval: float = 10.0,
+                 idle_evict_s: float = 600.0):
+        if store is None:
+            import firebase_utils as store
+        self.store = store
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval = snapshot_interval
+        self.idle_evict_s = idle_evict_s
+        self._rooms: Dict[str, Room] = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def room(self, name: str) -> Room:
+        room = self._rooms.get(name)
+        if room is not None:
+            return room
+        # load outside the lock: a slow snapshot read must not stall every other room.
+        # Two first opens may both load; the first one in wins.
+        try:
+            snap = self.store.get_room_snapshot(name)
+        except Exception as e:
+            print(f"❌ Could not load snapshot for room {name}: {e}")
+            snap = None
+        with self._lock:
+            return self._rooms.setdefault(name, Room(name, snap))
+
+    @contextmanager
+    def _locked(self, name: str):
+        """The room, locked and marked as used; a room evicted meanwhile is reopened."""
+        while True:
+            room = self.room(name)
+            with room.lock:
+                if room.evicted:
+                    continue
+                room.last_used = time.monotonic()
+                yield room
+                return
+
+    def snapshot(self, name: str) -> dict:
+        with self._locked(name) as room:
+            return room.snapshot()
+
+    def submit(self, name: str, client_id: str, op: dict, base_version: int = None) -> dict:
+        """Apply one op; returns {"version", "op"} with the op as actually applied."""
+        with self._locked(name) as room:
+            kind = op.get("type")
+            if kind == "text":
+                op = {"type": "text", "pos": int(op.get("pos", 0)), "del": int(op.get("del", 0)),
+                      "ins": str(op.get("ins", ""))}
+                if base_version is not None and base_version != room.version:
+                    oldest = room.log[0][0] - 1 if room.log else room.version
+                    if not oldest <= base_version <= room.version:
+                        raise ValueError("base version out of range; reload the snapshot")
+                    for version, _, applied in room.log:
+                        if version > base_version and applied["type"] == "text":
+                            op = rebase_text_op(op, applied)
+                pos = max(0, min(len(room.text), op["pos"]))
+                op = {**op, "pos": pos, "del": max(0, min(len(room.text) - pos, op["del"]))}
+                room.text = apply_text_op(room.text, op)
+            elif kind == "stroke":
+                if not isinstance(op.get("id"), (str, int)) or isinstance(op.get("id"), bool):
+                    raise ValueError("stroke op needs an id")
+                points = stroke_points(op.get("points", []))
+                stroke = room.strokes.get(op["id"])
+                if stroke is None:
+                    stroke = room.strokes[op["id"]] = {"id": op["id"], "color": op.get("color", "#000"),
+                                                       "width": op.get("width", 2), "points": []}
+                stroke["points"].extend(points)
+                op = {"type": "stroke", "id": op["id"], "color": stroke["color"], "width": stroke["width"],
+                      "points": points}
+            elif kind == "clear":
+                room.strokes.clear()
+                op = {"type": "clear"}
+            else:
+                raise ValueError(f"unknown op type: {kind}")
+            room.version += 1
+            event = {"version": room.version, "client_id": client_id, "op": op}
+            room.log.append((room.version, client_id, op))
+            room.dirty_ops += 1
+            for q in list(room.subscribers):
+                q.put(event)
+            due = (room.dirty_ops >= self.snapshot_every or
+                   time.monotonic() - room.persisted_at >= self.snapshot_interval)
+        metrics.inc("edugenie_room_ops_total", type=kind)
+        if due:
+            self.persist(name)
+        return {"version": event["version"], "op": op}
+
+    def ops_since(self, name: str, version: int) -> Optional[List[dict]]:
+        """Ops after `version`, or None when the log no longer reaches back that far."""
+        with self._locked(name) as room:
+            if version == room.version:
+                return []
+            if version > room.version:   # relay restarted from an older snapshot
+                return None
+            if not room.log or room.log[0][0] > version + 1:
+                return None
+            return [{"version": v, "client_id": c, "op": o} for v, c, o in room.log if v > version]
+
+    def subscribe(self, name: str) -> queue.Queue:
+        q = queue.Queue()
+        with self._locked(name) as room:
+            room.subscribers.append(q)
+        return q
+
+    def unsubscribe(self, name: str, q: queue.Queue):
+        with self._lock:
+            room = self._rooms.get(name)
+        if room is None:
+            return
+        with room.lock:
+            if q in room.subscribers:
+                room.subscribers.remove(q)
+            room.last_used = time.monotonic()
+
+    def persist(self, name: str):
+        with self._lock:
+            room = self._rooms.get(name)
+        if room is None:
+            return
+        with room.lock:
+            if not room.dirty_ops:
+                return
+            snap = room.snapshot()
+            snap["ts"] = int(time.time())
+            saved_ops, room.dirty_ops = room.dirty_ops, 0
+            room.persisted_at = time.monotonic()
+        try:
+            self.store.save_room_snapshot(name, snap)
+            metrics.inc("edugenie_room_snapshots_total")
+        except Exception as e:
+            print(f"❌ Could not persist snapshot for room {name}: {e}")
+            with room.lock:
+                room.dirty_ops += saved_ops     # try again next time; the room can't be evicted meanwhile
+
+    def flush(self):
+        with self._lock:
+            names = list(self._rooms)
+        for name in names:
+            self.persist(name)
+
+    def evict_idle(self) -> int:
+        """Save and drop rooms with no subscribers that nobody has used for idle_evict_s; returns how many."""
+        def idle(room):
+            return not room.subscribers and time.monotonic() - room.last_used >= self.idle_evict_s
+
+        with self._lock:
+            names = [n for n, r in self._rooms.items() if idle(r)]
+        evicted = 0
+        for name in names:
+            self.persist(name)
+            with self._lock:
+                room = self._rooms.get(name)
+                if room is None:
+                    continue
+                with room.lock:
+                    if room.dirty_ops or not idle(room):
+                        continue
+                    room.evicted = True
+                    del self._rooms[name]
+            evicted += 1
+        if evicted:
+            metrics.inc("edugenie_room_evictions_total", evicted)
+        return evicted
+
+    def start_flusher(self):
+        """Persist idle-but-dirty rooms every snapshot_interval seconds (idempotent)."""
+        if self._flusher is not None:
+            return self._flusher
+
+        def loop():
+            while True:
+                time.sleep(self.snapshot_interval)
+                self.flush()
+                self.evict_idle()
+
+        self._flusher = threading.Thread(target=loop, name="room-sync-flusher", daemon=True)
+        self._flusher.start()
+        return self._flusher
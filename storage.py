@@ -0,0 +1,904 @@
+"""
+Storage backends behind db.Database.
+
+Every backend implements the same small interface (see `Storage`). Rows are plain
+tuples; db.Database turns them into the dicts the pages use.
+
+  MemoryStorage         - dicts, for tests and benchmarks
+  SQLiteStorage         - one SQLite file (the original edugenie.db layout)
+  ShardedSQLiteStorage  - N SQLite files, users routed by a stable hash, so writes
+                          for different users land on different writer locks
+
+Changing the layout (edugenie.db -> N shards, or N -> M shards) moves users between
+files, so opening a layout that doesn't match the data on disk raises
+StorageLayoutError; move the data first with `python storage.py reshard --shards M`.
+"""
+import abc
+import argparse
+import bisect
+import glob
+import heapq
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import metrics
+
+# (user, xp, profile_json)
+UserRow = Tuple[str, int, Optional[str]]
+# (user, topic, score, total, ts)
+QuizRow = Tuple[str, str, int, int, int]
+# (key, namespace, value, codec, size, ts, expires)
+CacheRow = Tuple[str, str, object, str, int, int, Optional[int]]
+# (user, topic, ease, interval_days, reps, lapses, due, last) - spaced-repetition state
+ReviewRow = Tuple[str, str, float, float, int, int, int, int]
+# (user, next_topic, overall, topics_json, computed) - from the nightly mastery recompute
+MasteryRow = Tuple[str, Optional[str], float, str, int]
+
+RECLAIM_BATCH_PAGES = 2000   # pages handed back per incremental_vacuum statement
+
+
+class Storage(abc.ABC):
+    """Interface shared by all backends."""
+
+    # users / XP
+    @abc.abstractmethod
+    def ensure_user(self, user: str, xp: int = 0, profile_json: str = None):
+        ...
+
+    @abc.abstractmethod
+    def add_xp(self, user: str, xp: int):
+        ...
+
+    @abc.abstractmethod
+    def set_xp(self, user: str, xp: int):
+        ...
+
+    @abc.abstractmethod
+    def get_xp(self, user: str) -> int:
+        ...
+
+    @abc.abstractmethod
+    def update_profile(self, user: str, profile_json: str):
+        ...
+
+    @abc.abstractmethod
+    def all_users(self) -> List[UserRow]:
+        """All users, highest XP first."""
+
+    @abc.abstractmethod
+    def top_users(self, limit: int) -> List[Tuple[str, int]]:
+        """(user, xp) for the `limit` highest-XP users, highest first."""
+
+    # key/value cache; rows are CacheRow, policy lives in db.Database
+    @abc.abstractmethod
+    def cache_put_many(self, rows: List["CacheRow"]):
+        """Insert or replace all rows in one transaction."""
+
+    @abc.abstractmethod
+    def cache_get_many(self, keys: List[str], now: int) -> Dict[str, Tuple[object, str]]:
+        """{key: (value, codec)} for keys that exist and have not expired."""
+
+    @abc.abstractmethod
+    def cache_compact(self, limits: Dict[str, Tuple[Optional[int], Optional[int]]], now: int) -> Dict[str, int]:
+        """
+        Drop expired rows, then evict least-recently-used rows per namespace until
+        each is within its (max_rows, max_bytes) limit, and reclaim the space.
+        Returns counts: {"expired": n, "evicted": n}.
+        """
+
+    @abc.abstractmethod
+    def cache_backfill_expiry(self, ttls: Dict[str, int]) -> int:
+        """
+        Give rows in namespaces that have a TTL but no expiry one (expires = ts + ttl):
+        rows migrated from the pre-namespace cache, or written before their namespace
+        got a TTL. Returns the number of rows updated.
+        """
+
+    # quiz history
+    @abc.abstractmethod
+    def add_quiz_result(self, user: str, topic: str, score: int, total: int, ts: int):
+        ...
+
+    @abc.abstractmethod
+    def recent_quiz_scores(self, user: str, limit: int) -> List[QuizRow]:
+        ...
+
+    @abc.abstractmethod
+    def quiz_history(self, user: str) -> List[QuizRow]:
+        ...
+
+    @abc.abstractmethod
+    def iter_quiz_history(self, chunk_size: int = 50000) -> Iterator[List[QuizRow]]:
+        """Every quiz result, in chunks, without loading the whole table."""
+
+    # spaced-repetition schedule, one ReviewRow per (user, topic), indexed by due time
+    @abc.abstractmethod
+    def review_get(self, user: str, topic: str) -> Optional[ReviewRow]:
+        ...
+
+    @abc.abstractmethod
+    def review_put(self, row: ReviewRow):
+        """Insert or replace the row for (user, topic)."""
+
+    @abc.abstractmethod
+    def reviews_due(self, user: str, until: int, limit: int) -> List[ReviewRow]:
+        """The user's reviews with due <= until, earliest first."""
+
+    @abc.abstractmethod
+    def reviews_due_by(self, until: int, limit: int = None) -> List[ReviewRow]:
+        """Every user's reviews with due <= until (overdue ones included), earliest first."""
+
+    # per-user results of the cohort mastery recompute (see mastery.py)
+    @abc.abstractmethod
+    def mastery_put_many(self, rows: List[MasteryRow]):
+        """Insert or replace all rows in one transaction."""
+
+    @abc.abstractmethod
+    def mastery_get(self, user: str) -> Optional[MasteryRow]:
+        ...
+
+    @abc.abstractmethod
+    def reset(self):
+        ...
+
+    def close(self):
+        pass
+
+
+_waits = threading.local()
+
+
+class TimedLock:
+    """
+    Re-entrant lock that measures contention: time spent waiting to acquire it goes
+    to edugenie_db_lock_wait_seconds and to the calling thread's running total
+    (lock_wait_seconds()), so callers can attribute waits to what they were doing.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        if not self._lock.acquire(blocking=False):
+            start = time.perf_counter()
+            self._lock.acquire()
+            waited = time.perf_counter() - start
+            _waits.total = getattr(_waits, "total", 0.0) + waited
+            metrics.observe("edugenie_db_lock_wait_seconds", waited)
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def lock_wait_seconds() -> float:
+    """Seconds the current thread has spent waiting on storage locks so far."""
+    return getattr(_waits, "total", 0.0)
+
+
+def _chunks(items, n=500):
+    # stay well below SQLite's bound-variable limit
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+
+def shard_for(key: str, n: int) -> int:
+    """Stable across processes and restarts (unlike hash())."""
+    return zlib.crc32(key.encode("utf-8")) % n
+
+
+class StorageLayoutError(RuntimeError):
+    """The files on disk were written with a different shard count than the one requested."""
+
+
+# table -> routing column; cache rows are routed by key like in ShardedSQLiteStorage
+SHARDED_TABLES = {"users": "user", "quiz_history": "user", "reviews": "user", "mastery": "user", "cache": "key"}
+USER_TABLES = ("users", "quiz_history", "reviews", "mastery")
+
+
+def shard_paths(path: str, shards: int) -> List[str]:
+    base, ext = os.path.splitext(path)
+    return [f"{base}.shard{i}{ext or '.db'}" for i in range(shards)]
+
+
+def existing_shards(path: str) -> Dict[int, str]:
+    """{index: file} for every `<base>.shard<i>.db` next to `path`, whatever the shard count."""
+    base, ext = os.path.splitext(path)
+    ext = ext or ".db"
+    pattern = re.compile(re.escape(os.path.basename(base)) + r"\.shard(\d+)" + re.escape(ext) + "$")
+    out = {}
+    for f in glob.glob(f"{glob.escape(base)}.shard*{ext}"):
+        m = pattern.match(os.path.basename(f))
+        if m:
+            out[int(m.group(1))] = f
+    return out
+
+
+def _layout(path: str) -> Tuple[bool, int]:
+    """(holds user data, shard count stamped in user_version - 0 when unstamped) for an existing file."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        has_data = any(conn.execute(f"SELECT 1 FROM {t} LIMIT 1").fetchone() for t in USER_TABLES if t in tables)
+        return has_data, conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def check_layout(path: str, shards: int):
+    """Raise StorageLayoutError if opening `path` with `shards` shards would hide or mis-route existing users."""
+    if path == ":memory:":
+        return
+    fix = f"stop the app and run `python storage.py reshard --path {path} --shards {shards}`"
+    found = {i: f for i, f in existing_shards(path).items() if _layout(f)[0]}
+    if shards <= 1:
+        if found:
+            raise StorageLayoutError(f"{len(found)} shard file(s) next to {path} hold data; {fix}")
+        return
+    if os.path.exists(path) and _layout(path)[0]:
+        raise StorageLayoutError(f"{path} holds data from the unsharded layout; {fix}")
+    for i, f in found.items():
+        stamped = _layout(f)[1]
+        if i >= shards or stamped not in (0, shards):
+            raise StorageLayoutError(
+                f"{f} was written with {stamped or 'more than ' + str(shards)} shards, not {shards}; {fix}")
+
+
+class MemoryStorage(Storage):
+    def __init__(self):
+        self._lock = TimedLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._users = {}      # user -> [xp, profile_json]
+            self._cache = {}      # key -> [ns, value, codec, size, expires, atime, ts]
+            self._quiz = []       # QuizRow, insertion order
+            self._reviews = {}    # user -> {topic: ReviewRow}
+            self._due = []        # sorted (due, user, topic): the due-time index
+            self._mastery = {}    # user -> MasteryRow
+
+    def ensure_user(self, user, xp=0, profile_json=None):
+        with self._lock:
+            self._users.setdefault(user, [xp, profile_json])
+
+    def add_xp(self, user, xp):
+        with self._lock:
+            self._users.setdefault(user, [0, None])[0] += xp
+
+    def set_xp(self, user, xp):
+        with self._lock:
+            if user in self._users:
+                self._users[user][0] = xp
+
+    def get_xp(self, user):
+        with self._lock:
+            u = self._users.get(user)
+            return int(u[0]) if u else 0
+
+    def update_profile(self, user, profile_json):
+        with self._lock:
+            if user in self._users:
+                self._users[user][1] = profile_json
+
+    def all_users(self):
+        with self._lock:
+            rows = [(u, v[0], v[1]) for u, v in self._users.items()]
+        rows.sort(key=lambda r: r[1], reverse=True)
+        return rows
+
+    def top_users(self, limit):
+        with self._lock:
+            return heapq.nlargest(limit, ((u, v[0]) for u, v in self._users.items()), key=lambda r: r[1])
+
+    def cache_put_many(self, rows):
+        with self._lock:
+            for key, ns, value, codec, size, ts, expires in rows:
+                self._cache[key] = [ns, value, codec, size, expires, ts, ts]
+
+    def cache_get_many(self, keys, now):
+        out = {}
+        with self._lock:
+            for key in keys:
+                e = self._cache.get(key)
+                if e is None or (e[4] is not None and e[4] <= now):
+                    continue
+                e[5] = now
+                out[key] = (e[1], e[2])
+        return out
+
+    def cache_compact(self, limits, now):
+        stats = {"expired": 0, "evicted": 0}
+        with self._lock:
+            for key in [k for k, e in self._cache.items() if e[4] is not None and e[4] <= now]:
+                del self._cache[key]
+                stats["expired"] += 1
+            by_ns = {}
+            for key, e in self._cache.items():
+                by_ns.setdefault(e[0], []).append((e[5], key, e[3]))
+            for ns, entries in by_ns.items():
+                max_rows, max_bytes = limits.get(ns, (None, None))
+                entries.sort(reverse=True)  # most recently used first
+                kept = total = 0
+                for atime, key, size in entries:
+                    kept += 1
+                    total += size
+                    if (max_rows is not None and kept > max_rows) or (max_bytes is not None and total > max_bytes):
+                        del self._cache[key]
+                        stats["evicted"] += 1
+        return stats
+
+    def cache_backfill_expiry(self, ttls):
+        n = 0
+        with self._lock:
+            for key, e in self._cache.items():
+                if e[4] is None and ttls.get(e[0]):
+                    e[4] = e[6] + ttls[e[0]]
+                    n += 1
+        return n
+
+    def add_quiz_result(self, user, topic, score, total, ts):
+        with self._lock:
+            self._quiz.append((user, topic, score, total, ts))
+
+    def recent_quiz_scores(self, user, limit):
+        with self._lock:
+            rows = [r for r in self._quiz if r[0] == user]
+        return heapq.nlargest(limit, rows, key=lambda r: r[4])
+
+    def quiz_history(self, user):
+        with self._lock:
+            return [r for r in self._quiz if r[0] == user]
+
+    def iter_quiz_history(self, chunk_size=50000):
+        with self._lock:
+            rows = list(self._quiz)
+        for i in range(0, len(rows), chunk_size):
+            yield rows[i:i + chunk_size]
+
+    def review_get(self, user, topic):
+        with self._lock:
+            return self._reviews.get(user, {}).get(topic)
+
+    def review_put(self, row):
+        user, topic, due = row[0], row[1], row[6]
+        with self._lock:
+            old = self._reviews.setdefault(user, {}).get(topic)
+            if old is not None:
+                i = bisect.bisect_left(self._due, (old[6], user, topic))
+                if i < len(self._due) and self._due[i] == (old[6], user, topic):
+                    del self._due[i]
+            self._reviews[user][topic] = tuple(row)
+            bisect.insort(self._due, (due, user, topic))
+
+    def reviews_due(self, user, until, limit):
+        with self._lock:
+            rows = [r for r in self._reviews.get(user, {}).values() if r[6] <= until]
+        return heapq.nsmallest(limit, rows, key=lambda r: (r[6], r[1]))
+
+    def reviews_due_by(self, until, limit=None):
+        with self._lock:
+            hi = bisect.bisect_left(self._due, (until + 1,))
+            keys = self._due[:hi] if limit is None else self._due[:min(hi, limit)]
+            return [self._reviews[u][t] for _, u, t in keys]
+
+    def mastery_put_many(self, rows):
+        with self._lock:
+            self._mastery.update((r[0], tuple(r)) for r in rows)
+
+    def mastery_get(self, user):
+        with self._lock:
+            return self._mastery.get(user)
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path: str = "edugenie.db"):
+        self.path = path
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # one connection is shared by every Streamlit session thread (see resources.py)
+        self._lock = TimedLock()
+        self._touched = {}
+        if path != ":memory:":
+            # must precede table creation to take effect on a new file
+            self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            # WAL lets readers proceed during a write; NORMAL skips the fsync per commit
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_tables()
+
+    def _ensure_tables(self):
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user TEXT PRIMARY KEY,
+                xp INTEGER DEFAULT 0,
+                profile JSON
+            )""")
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT,
+                ts INTEGER,
+                ns TEXT DEFAULT 'default',
+                codec TEXT DEFAULT '',
+                size INTEGER DEFAULT 0,
+                atime INTEGER DEFAULT 0,
+                expires INTEGER
+            )""")
+            self._migrate_cache(cur)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS quiz_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user TEXT,
+                topic TEXT,
+                score INTEGER,
+                total INTEGER,
+                ts INTEGER
+            )""")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_cache_ns_atime ON cache (ns, atime)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_users_xp ON users (xp DESC)")
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS reviews (
+                user TEXT,
+                topic TEXT,
+                ease REAL,
+                interval REAL,
+                reps INTEGER,
+                lapses INTEGER,
+                due INTEGER,
+                last INTEGER,
+                PRIMARY KEY (user, topic)
+            )""")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_quiz_user_ts ON quiz_history (user, ts)")
+            # "due now for this user" and "due in the next hour for anyone" are both index range scans
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_reviews_user_due ON reviews (user, due, topic)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_reviews_due ON reviews (due, user, topic)")
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS mastery (
+                user TEXT PRIMARY KEY,
+                next_topic TEXT,
+                overall REAL,
+                topics JSON,
+                computed INTEGER
+            )""")
+            self._conn.commit()
+
+    def _migrate_cache(self, cur):
+        """Databases created before cache namespaces only have (key, value, ts); Database backfills expiry."""
+        cols = {r[1] for r in cur.execute("PRAGMA table_info(cache)")}
+        if "ns" in cols:
+            return
+        cur.execute("ALTER TABLE cache ADD COLUMN ns TEXT DEFAULT 'default'")
+        cur.execute("ALTER TABLE cache ADD COLUMN codec TEXT DEFAULT ''")
+        cur.execute("ALTER TABLE cache ADD COLUMN size INTEGER DEFAULT 0")
+        cur.execute("ALTER TABLE cache ADD COLUMN atime INTEGER DEFAULT 0")
+        cur.execute("ALTER TABLE cache ADD COLUMN expires INTEGER")
+        cur.execute("""
+        UPDATE cache SET
+            ns = CASE WHEN instr(key, ':') > 0 THEN substr(key, 1, instr(key, ':') - 1) ELSE 'default' END,
+            size = length(CAST(value AS BLOB)),
+            atime = ts
+        """)
+
+    def ensure_user(self, user, xp=0, profile_json=None):
+        with self._lock:
+            self._conn.execute("INSERT OR IGNORE INTO users (user, xp, profile) VALUES (?, ?, ?)", (user, xp, profile_json))
+            self._conn.commit()
+
+    def add_xp(self, user, xp):
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("INSERT OR IGNORE INTO users (user, xp) VALUES (?, 0)", (user,))
+            cur.execute("UPDATE users SET xp = xp + ? WHERE user = ?", (xp, user))
+            self._conn.commit()
+
+    def set_xp(self, user, xp):
+        with self._lock:
+            self._conn.execute("UPDATE users SET xp = ? WHERE user = ?", (xp, user))
+            self._conn.commit()
+
+    def get_xp(self, user):
+        with self._lock:
+            r = self._conn.execute("SELECT xp FROM users WHERE user = ?", (user,)).fetchone()
+            return int(r[0]) if r else 0
+
+    def update_profile(self, user, profile_json):
+        with self._lock:
+            self._conn.execute("UPDATE users SET profile = ? WHERE user = ?", (profile_json, user))
+            self._conn.commit()
+
+    def all_users(self):
+        with self._lock:
+            return self._conn.execute("SELECT user, xp, profile FROM users ORDER BY xp DESC").fetchall()
+
+    def top_users(self, limit):
+        with self._lock:
+            return self._conn.execute("SELECT user, xp FROM users ORDER BY xp DESC LIMIT ?", (limit,)).fetchall()
+
+    def cache_put_many(self, rows):
+        with self._lock:
+            self._flush_touched()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, ns, value, codec, size, ts, expires, atime) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [r + (r[5],) for r in rows])
+            self._conn.commit()
+
+    def cache_get_many(self, keys, now):
+        out = {}
+        with self._lock:
+            for chunk in _chunks(list(keys)):
+                marks = ",".join("?" * len(chunk))
+                for key, value, codec in self._conn.execute(
+                        f"SELECT key, value, codec FROM cache WHERE key IN ({marks}) "
+                        f"AND (expires IS NULL OR expires > ?)", (*chunk, now)):
+                    out[key] = (value, codec)
+            # access times are buffered and written by the next put/compaction, so a
+            # read never opens a write transaction of its own
+            for key in out:
+                self._touched[key] = now
+            if len(self._touched) > 5000:
+                self._flush_touched()
+                self._conn.commit()
+        return out
+
+    def _flush_touched(self):
+        if self._touched:
+            self._conn.executemany("UPDATE cache SET atime = ? WHERE key = ?",
+                                   [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+
+    def cache_compact(self, limits, now):
+        stats = {"expired": 0, "evicted": 0}
+        with self._lock:
+            cur = self._conn.cursor()
+            self._flush_touched()
+            cur.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?", (now,))
+            stats["expired"] = cur.rowcount
+            for ns, (max_rows, max_bytes) in limits.items():
+                if max_rows is not None:
+                    cur.execute("""
+                    DELETE FROM cache WHERE key IN (
+                        SELECT key FROM cache WHERE ns = ? ORDER BY atime DESC LIMIT -1 OFFSET ?
+                    )""", (ns, max_rows))
+                    stats["evicted"] += cur.rowcount
+                if max_bytes is not None:
+                    cur.execute("""
+                    DELETE FROM cache WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY atime DESC, key) AS running
+                            FROM cache WHERE ns = ?
+                        ) WHERE running > ?
+                    )""", (ns, max_bytes))
+                    stats["evicted"] += cur.rowcount
+            self._conn.commit()
+            if stats["expired"] or stats["evicted"]:
+                self._reclaim()
+        return stats
+
+    def cache_backfill_expiry(self, ttls):
+        n = 0
+        with self._lock:
+            for ns, ttl in ttls.items():
+                if ttl:
+                    n += self._conn.execute("UPDATE cache SET expires = ts + ? WHERE expires IS NULL AND ns = ?",
+                                            (ttl, ns)).rowcount
+            self._conn.commit()
+        return n
+
+    def _reclaim(self):
+        """Return freed pages to the filesystem."""
+        if self.path == ":memory:":
+            return
+        if self._conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            # incremental_vacuum frees one page per step of its statement: step it to
+            # completion, a bounded batch at a time
+            free = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            while free:
+                self._conn.execute(f"PRAGMA incremental_vacuum({min(free, RECLAIM_BATCH_PAGES)})").fetchall()
+                left = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if left >= free:
+                    break
+                free = left
+            return
+        free = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        pages = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        if pages and free / pages > 0.25:
+            # one full VACUUM also switches older files over to incremental mode
+            self._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            self._conn.execute("VACUUM")
+
+    def add_quiz_result(self, user, topic, score, total, ts):
+        with self._lock:
+            self._conn.execute("INSERT INTO quiz_history (user, topic, score, total, ts) VALUES (?, ?, ?, ?, ?)",
+                               (user, topic, score, total, ts))
+            self._conn.commit()
+
+    def recent_quiz_scores(self, user, limit):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT user, topic, score, total, ts FROM quiz_history WHERE user = ? ORDER BY ts DESC LIMIT ?",
+                (user, limit)).fetchall()
+
+    def quiz_history(self, user):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT user, topic, score, total, ts FROM quiz_history WHERE user = ?", (user,)).fetchall()
+
+    def iter_quiz_history(self, chunk_size=50000):
+        # keyset pagination on the rowid so each chunk is one short, lock-friendly query
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT id, user, topic, score, total, ts FROM quiz_history WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, chunk_size)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [r[1:] for r in rows]
+
+    def review_get(self, user, topic):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT user, topic, ease, interval, reps, lapses, due, last FROM reviews WHERE user = ? AND topic = ?",
+                (user, topic)).fetchone()
+
+    def review_put(self, row):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reviews (user, topic, ease, interval, reps, lapses, due, last) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", tuple(row))
+            self._conn.commit()
+
+    def reviews_due(self, user, until, limit):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT user, topic, ease, interval, reps, lapses, due, last FROM reviews "
+                "WHERE user = ? AND due <= ? ORDER BY due, topic LIMIT ?", (user, until, limit)).fetchall()
+
+    def reviews_due_by(self, until, limit=None):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT user, topic, ease, interval, reps, lapses, due, last FROM reviews "
+                "WHERE due <= ? ORDER BY due, user, topic LIMIT ?",
+                (until, -1 if limit is None else limit)).fetchall()
+
+    def mastery_put_many(self, rows):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO mastery (user, next_topic, overall, topics, computed) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def mastery_get(self, user):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT user, next_topic, overall, topics, computed FROM mastery WHERE user = ?",
+                (user,)).fetchone()
+
+    def reset(self):
+        with self._lock:
+            self._touched.clear()
+            cur = self._conn.cursor()
+            cur.execute("DROP TABLE IF EXISTS users")
+            cur.execute("DROP TABLE IF EXISTS cache")
+            cur.execute("DROP TABLE IF EXISTS quiz_history")
+            cur.execute("DROP TABLE IF EXISTS reviews")
+            cur.execute("DROP TABLE IF EXISTS mastery")
+            self._conn.commit()
+            self._ensure_tables()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ShardedSQLiteStorage(Storage):
+    """
+    Users (and cache keys) are routed by crc32 across `shards` SQLite files named
+    `<base>.shard<i>.db`. Per-user calls touch exactly one shard; global reads
+    fan out in parallel and merge the per-shard results (each already sorted).
+    """
+    def __init__(self, path: str = "edugenie.db", shards: int = 4, check: bool = True):
+        if check:
+            check_layout(path, shards)
+        self.paths = shard_paths(path, shards)
+        self.shards = [SQLiteStorage(p) for p in self.paths]
+        for s in self.shards:
+            # stamp the shard count so a later open with a different count is caught
+            s._conn.execute(f"PRAGMA user_version = {shards}")
+        self._pool = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="shard")
+
+    def _shard(self, key: str) -> SQLiteStorage:
+        return self.shards[shard_for(key, len(self.shards))]
+
+    def _fan_out(self, fn):
+        return list(self._pool.map(fn, self.shards))
+
+    def ensure_user(self, user, xp=0, profile_json=None):
+        self._shard(user).ensure_user(user, xp, profile_json)
+
+    def add_xp(self, user, xp):
+        self._shard(user).add_xp(user, xp)
+
+    def set_xp(self, user, xp):
+        self._shard(user).set_xp(user, xp)
+
+    def get_xp(self, user):
+        return self._shard(user).get_xp(user)
+
+    def update_profile(self, user, profile_json):
+        self._shard(user).update_profile(user, profile_json)
+
+    def all_users(self):
+        parts = self._fan_out(lambda s: s.all_users())
+        return list(heapq.merge(*parts, key=lambda r: r[1], reverse=True))
+
+    def top_users(self, limit):
+        # each shard returns its own top-`limit`; the global top-`limit` is among them
+        parts = self._fan_out(lambda s: s.top_users(limit))
+        return list(itertools.islice(heapq.merge(*parts, key=lambda r: r[1], reverse=True), limit))
+
+    def _group(self, items, key=lambda x: x):
+        groups = {}
+        for item in items:
+            groups.setdefault(shard_for(key(item), len(self.shards)), []).append(item)
+        return groups
+
+    def cache_put_many(self, rows):
+        for i, part in self._group(rows, key=lambda r: r[0]).items():
+            self.shards[i].cache_put_many(part)
+
+    def cache_get_many(self, keys, now):
+        out = {}
+        for i, part in self._group(keys).items():
+            out.update(self.shards[i].cache_get_many(part, now))
+        return out
+
+    def cache_compact(self, limits, now):
+        # limits are global per namespace; split them evenly, keys hash uniformly
+        n = len(self.shards)
+        per_shard = {ns: (None if r is None else -(-r // n), None if b is None else -(-b // n))
+                     for ns, (r, b) in limits.items()}
+        stats = {"expired": 0, "evicted": 0}
+        for part in self._fan_out(lambda s: s.cache_compact(per_shard, now)):
+            for k in stats:
+                stats[k] += part[k]
+        return stats
+
+    def cache_backfill_expiry(self, ttls):
+        return sum(self._fan_out(lambda s: s.cache_backfill_expiry(ttls)))
+
+    def add_quiz_result(self, user, topic, score, total, ts):
+        self._shard(user).add_quiz_result(user, topic, score, total, ts)
+
+    def recent_quiz_scores(self, user, limit):
+        return self._shard(user).recent_quiz_scores(user, limit)
+
+    def quiz_history(self, user):
+        return self._shard(user).quiz_history(user)
+
+    def iter_quiz_history(self, chunk_size=50000):
+        # next chunk of every shard read in parallel; each shard's generator is only
+        # ever advanced by one pool thread at a time
+        live = [s.iter_quiz_history(chunk_size) for s in self.shards]
+        while live:
+            chunks = list(self._pool.map(lambda it: next(it, None), live))
+            live = [it for it, chunk in zip(live, chunks) if chunk is not None]
+            for chunk in chunks:
+                if chunk is not None:
+                    yield chunk
+
+    def review_get(self, user, topic):
+        return self._shard(user).review_get(user, topic)
+
+    def review_put(self, row):
+        self._shard(row[0]).review_put(row)
+
+    def reviews_due(self, user, until, limit):
+        return self._shard(user).reviews_due(user, until, limit)
+
+    def reviews_due_by(self, until, limit=None):
+        parts = self._fan_out(lambda s: s.reviews_due_by(until, limit))
+        merged = heapq.merge(*parts, key=lambda r: (r[6], r[0], r[1]))
+        return list(merged if limit is None else itertools.islice(merged, limit))
+
+    def mastery_put_many(self, rows):
+        # one transaction per shard, written in parallel
+        groups = self._group(rows, key=lambda r: r[0])
+        list(self._pool.map(lambda g: self.shards[g[0]].mastery_put_many(g[1]), groups.items()))
+
+    def mastery_get(self, user):
+        return self._shard(user).mastery_get(user)
+
+    def reset(self):
+        self._fan_out(lambda s: s.reset())
+
+    def close(self):
+        self._fan_out(lambda s: s.close())
+        self._pool.shutdown(wait=False)
+
+
+def open_storage(path: str = "edugenie.db", shards: int = None) -> Storage:
+    """Pick a backend from the path / EDUGENIE_DB_SHARDS. Raises StorageLayoutError on a layout mismatch."""
+    if path == ":memory:" and shards is None:
+        return SQLiteStorage(path)
+    if shards is None:
+        shards = int(os.environ.get("EDUGENIE_DB_SHARDS", "1"))
+    if shards > 1:
+        return ShardedSQLiteStorage(path, shards=shards)
+    check_layout(path, 1)
+    return SQLiteStorage(path)
+
+
+def reshard(path: str, shards: int, batch: int = 50000) -> Dict[str, int]:
+    """
+    Move every row from whatever is on disk (edugenie.db and/or any shard files) into
+    the `shards`-file layout (`shards=1`: back into `path`). Run with the app stopped.
+    New files are built next to the old ones and swapped in at the end; the old files
+    are kept as `<name>.bak`. Returns rows copied per table.
+    """
+    sources = [f for i, f in sorted(existing_shards(path).items())]
+    if os.path.exists(path):
+        sources.insert(0, path)
+    targets = [path] if shards <= 1 else shard_paths(path, shards)
+    tmp = [f"{t}.reshard" for t in targets]
+    for f in tmp:
+        if os.path.exists(f):
+            os.remove(f)
+    out = [SQLiteStorage(f) for f in tmp]
+    copied = {t: 0 for t in SHARDED_TABLES}
+    for src_path in sources:
+        src = SQLiteStorage(src_path)    # also brings old cache tables up to date
+        for table, key in SHARDED_TABLES.items():
+            # columns both sides have (older files can carry columns that were since dropped)
+            want = {r[1] for r in out[0]._conn.execute(f"PRAGMA table_info({table})")}
+            cols = [r[1] for r in src._conn.execute(f"PRAGMA table_info({table})") if r[1] != "id" and r[1] in want]
+            insert = f"INSERT OR REPLACE INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+            k = cols.index(key)
+            cur = src._conn.execute(f"SELECT {', '.join(cols)} FROM {table}"
+                                    + (" ORDER BY id" if table == "quiz_history" else ""))
+            while True:
+                rows = cur.fetchmany(batch)
+                if not rows:
+                    break
+                groups = {}
+                for r in rows:
+                    groups.setdefault(shard_for(r[k], len(out)), []).append(r)
+                for i, part in groups.items():
+                    out[i]._conn.executemany(insert, part)
+                copied[table] += len(rows)
+        src.close()
+    for s in out:
+        if shards > 1:
+            s._conn.execute(f"PRAGMA user_version = {shards}")
+        s._conn.commit()
+        s.close()
+    for f in sources:
+        os.replace(f, f + ".bak")
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(f + suffix):
+                os.remove(f + suffix)
+    for t, f in zip(targets, tmp):
+        os.replace(f, t)
+    return copied
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Move EduGenie data to a different number of SQLite shards.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rs = sub.add_parser("reshard", help="rewrite the data on disk for --shards files (1 = a single edugenie.db)")
+    rs.add_argument("--path", default=os.environ.get("EDUGENIE_DB_PATH", "edugenie.db"))
+    rs.add_argument("--shards", type=int, required=True)
+    args = ap.parse_args()
+    counts = reshard(args.path, args.shards)
+    print(", ".join(f"{n} {t}" for t, n in counts.items()), f"-> {args.shards} shard(s); old files kept as *.bak")
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# the app is flat top-level modules run from the repo root; make them importable from here
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# api_server opens its job queue at import time; keep that database out of the working tree
+os.environ.setdefault("EDUGENIE_JOBS_DB", os.path.join(tempfile.mkdtemp(), "jobs.db"))
@@ -0,0 +1,31 @@
+import io
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv("EDUGENIE_ADMIN_TOKEN", "s3cret")
+    return TestClient(api_server.app)
+
+
+def test_cohort_certificates_need_the_admin_token(client, monkeypatch):
+    body = {"course": "Algebra", "users": ["ann", "bo"]}
+    assert client.post("/certificates/cohort", json=body).status_code == 401
+    assert client.post("/certificates/cohort", json=body, headers={"X-Admin-Token": "nope"}).status_code == 401
+    monkeypatch.delenv("EDUGENIE_ADMIN_TOKEN")
+    assert client.post("/certificates/cohort", json=body, headers={"X-Admin-Token": "s3cret"}).status_code == 403
+
+
+def test_cohort_certificates_cap_and_stream(client, monkeypatch):
+    monkeypatch.setattr(api_server, "COHORT_MAX_USERS", 3)
+    headers = {"X-Admin-Token": "s3cret"}
+    too_many = {"course": "Algebra", "users": ["a", "b", "c", "d"]}
+    assert client.post("/certificates/cohort", json=too_many, headers=headers).status_code == 413
+    r = client.post("/certificates/cohort", json={"course": "Algebra", "users": ["ann", "bo"]}, headers=headers)
+    assert r.status_code == 200
+    assert sorted(zipfile.ZipFile(io.BytesIO(r.content)).namelist()) == ["certificate_ann.pdf", "certificate_bo.pdf"]
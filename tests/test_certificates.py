@@ -0,0 +1,60 @@
+import os
+import zipfile
+
+import pytest
+
+import certificates
+import resources
+from db import Database
+from storage import MemoryStorage
+
+
+def test_cohorts_share_one_process_pool(monkeypatch):
+    monkeypatch.setattr(certificates.os, "cpu_count", lambda: 2)
+    names = [f"learner{i}" for i in range(5)]
+    try:
+        first = [n for n, _ in certificates.iter_cohort_certificates(names, "Algebra", "2026-01-01", chunk_size=2)]
+        pool = certificates.shared_pool()
+        again = list(certificates.iter_cohort_certificates(names, "Algebra", "2026-01-01", chunk_size=2))
+        assert certificates.shared_pool() is pool
+    finally:
+        certificates.shutdown_pool()
+    assert first == names
+    assert [n for n, _ in again] == names
+    assert again[0][1] == certificates.render_certificate("learner0", "Algebra", "2026-01-01")
+
+
+def _users_db(n):
+    db = Database(storage=MemoryStorage())
+    for i in range(n):
+        db.ensure_user(f"learner{i}")
+    return db
+
+
+def test_cohort_zip_job_writes_the_zip_to_cert_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(certificates, "CERT_DIR", str(tmp_path))
+    stale = tmp_path / "certificates_old.zip"
+    stale.write_bytes(b"old")
+    os.utime(stale, (0, 0))
+    resources.override(db=_users_db(3))
+    seen = []
+    try:
+        result = certificates.cohort_zip_job({"course": "Algebra", "date": "2026-01-01"},
+                                             lambda fraction, message=None: seen.append(fraction))
+    finally:
+        resources.reset()
+    assert result["users"] == 3 and seen[0] == 0.0
+    assert sorted(zipfile.ZipFile(result["path"]).namelist()) == [f"certificate_learner{i}.pdf" for i in range(3)]
+    assert os.listdir(tmp_path) == [os.path.basename(result["path"])]    # stale zip and .part are gone
+
+
+def test_cohort_zip_job_refuses_more_than_the_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(certificates, "CERT_DIR", str(tmp_path))
+    monkeypatch.setattr(certificates, "COHORT_MAX_USERS", 2)
+    resources.override(db=_users_db(3))
+    try:
+        with pytest.raises(ValueError):
+            certificates.cohort_zip_job({"course": "Algebra"}, lambda fraction, message=None: None)
+    finally:
+        resources.reset()
+    assert os.listdir(tmp_path) == []
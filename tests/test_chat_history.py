@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pytest
+
+import firebase_utils
+from chat_history import ChatMirror
+from fakes import LocalRealtimeDB
+
+
+@pytest.fixture
+def rtdb():
+    db = LocalRealtimeDB()
+    firebase_utils.use_backend(db)
+    yield db
+    firebase_utils.use_backend(None)
+
+
+def test_push_ids_unique_across_threads():
+    ids, lock = [], threading.Lock()
+
+    def make():
+        batch = [firebase_utils.new_push_id() for _ in range(2000)]
+        with lock:
+            ids.extend(batch)
+
+    threads = [threading.Thread(target=make) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(ids)) == len(ids)
+
+
+def test_push_id_time_round_trips():
+    before = time.time()
+    key = firebase_utils.new_push_id()
+    assert before - 0.001 <= firebase_utils.push_id_time(key) <= time.time()
+
+
+def test_sync_picks_up_a_key_written_after_a_newer_one(rtdb, tmp_path):
+    mirror = ChatMirror(str(tmp_path / "chat.db"))
+    late_key = firebase_utils.new_push_id()            # assigned at send(), still in a batcher
+    time.sleep(0.002)
+    firebase_utils.push_chat_messages("r", [{"user": "b", "message": "first"}])
+    assert mirror.sync("r") == 1                        # cursor is now past late_key
+
+    firebase_utils.push_chat_messages("r", [{"id": late_key, "user": "a", "message": "late"}])
+    assert mirror.sync("r") == 1
+    assert [m["message"] for m in mirror.get_messages("r", sync=False)] == ["late", "first"]
+    assert mirror.sync("r") == 0                        # re-reading the window is idempotent
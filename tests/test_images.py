@@ -0,0 +1,43 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+from images import PerceptualCache, prepare_image
+
+
+def canvas(text=None, dx=0, stray_dot=False):
+    img = Image.new("RGBA", (350, 250), (0, 0, 0, 0))
+    d = ImageDraw.Draw(img)
+    if text:
+        d.text((40 + dx, 20), text, fill=(0, 0, 0, 255))
+    else:
+        d.line([(30 + dx, 200), (170 + dx, 40), (320 + dx, 200)], fill=(0, 0, 0, 255), width=2)
+        d.ellipse([150 + dx, 120, 200 + dx, 170], outline=(0, 0, 0, 255), width=2)
+    if stray_dot:
+        d.point([(10, 10)], fill=(0, 0, 0, 255))
+    return np.array(img)
+
+
+def test_sparse_formulas_do_not_share_a_cache_entry():
+    cache = PerceptualCache()
+    first = prepare_image(canvas("E=mc^2"), canvas=True)
+    cache.put("p", first.dhash, "energy", first.thumb)
+    for other in ("F=ma", "x + y"):
+        p = prepare_image(canvas(other), canvas=True)
+        assert cache.get("p", p.dhash, p.thumb) is None
+
+
+def test_near_identical_sketches_hit():
+    cache = PerceptualCache()
+    first = prepare_image(canvas(), canvas=True)
+    cache.put("p", first.dhash, "a triangle", first.thumb)
+    for variant in (canvas(stray_dot=True), canvas(dx=2)):
+        p = prepare_image(variant, canvas=True)
+        assert cache.get("p", p.dhash, p.thumb) == "a triangle"
+    assert cache.get("other prompt", first.dhash, first.thumb) is None
+
+
+def test_blank_only_applies_to_canvas_input():
+    empty = np.full((250, 350, 4), 255, np.uint8)
+    assert prepare_image(empty, canvas=True).blank
+    upload = prepare_image(Image.new("RGB", (640, 480), "white"))
+    assert not upload.blank and upload.data
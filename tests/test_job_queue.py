@@ -0,0 +1,95 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import api_server
+import resources
+from fakes import FakeLLMBackend
+from job_queue import DONE, QUEUED, RUNNING, JobQueue
+from utils import GeminiClient
+
+
+def test_worker_survives_claim_errors(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"), handlers={"echo": lambda p, progress: p}, workers=1, poll_interval=0.05)
+    real_claim, failures = q._claim, []
+
+    def flaky_claim():
+        if len(failures) < 2:
+            failures.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return real_claim()
+
+    q._claim = flaky_claim
+    q.start()
+    try:
+        job = q.submit("echo", {"x": 1})
+        assert q.wait(job["id"], timeout=5)["status"] == DONE
+    finally:
+        q.stop()
+
+
+def test_recover_leaves_other_live_processes_jobs_alone(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    a = JobQueue(path, handlers={"echo": lambda p, progress: p}, lease_seconds=60)
+    b = JobQueue(path, handlers={"echo": lambda p, progress: p}, lease_seconds=60)
+    job = a.submit("echo", {"x": 1})
+    assert a._claim()[0] == job["id"]
+    assert b.recover() == 0
+    assert b.get(job["id"])["status"] == RUNNING
+
+    # a dies: nobody renews, the lease lapses
+    a._conn.execute("UPDATE jobs SET lease_until = ?", (time.time() - 1,))
+    assert b.recover() == 1
+    assert b.get(job["id"])["status"] == QUEUED
+
+
+def test_summarize_job_uses_every_chunk():
+    def responder(prompt):
+        # chunk summaries echo the chunk's marker; merges echo every marker they were given
+        return " ".join(re.findall(r"<\d+>", prompt))
+
+    resources.override(gemini=GeminiClient(backend=FakeLLMBackend(responder=responder)))
+    n = 70    # > SUMMARY_FAN_IN ** 2 chunks: three rounds of merging
+    text = "".join(f"<{i}>".ljust(api_server.SUMMARY_CHUNK_CHARS, ".") for i in range(n))
+    seen = []
+    try:
+        result = api_server.summarize_job({"text": text}, lambda fraction, message=None: seen.append(fraction))
+    finally:
+        resources.reset()
+    assert result["summary"].split() == [f"<{i}>" for i in range(n)]
+    assert seen == sorted(seen) and seen[-1] < 1
+
+
+def test_finished_jobs_are_reused_for_dedupe_seconds_then_deleted(tmp_path):
+    q = JobQueue(str(tmp_path / "jobs.db"), handlers={"echo": lambda p, progress: p}, dedupe_seconds=60,
+                 retention_seconds=3600)
+    first = q.submit("echo", {"x": 1})
+    q._run(*q._claim())
+    assert q.submit("echo", {"x": 1}) == {"id": first["id"], "status": DONE, "deduplicated": True}
+
+    q._conn.execute("UPDATE jobs SET updated = updated - 120")
+    second = q.submit("echo", {"x": 1})                 # the old result is too old to hand out
+    assert not second["deduplicated"]
+    running = q.submit("echo", {"x": 2})
+    q._claim()
+    q._claim()                                          # both new jobs running, neither finished
+
+    assert q.cleanup(now=time.time() + 3600 - 180) == 0   # first ended ~120s ago
+    assert q.cleanup(now=time.time() + 3600 + 60) == 1  # only the finished one ages out
+    assert q.get(first["id"]) is None
+    assert q.get(second["id"])["status"] == RUNNING and q.get(running["id"])["status"] == RUNNING
+
+
+def test_job_events_end_when_the_job_is_deleted():
+    jobs = resources.get_jobs()
+    job = jobs.submit("summarize", {"text": "never runs"})
+    jobs._conn.execute("UPDATE jobs SET status = ?, lease_until = ? WHERE id = ?",
+                       (RUNNING, time.time() + 3600, job["id"]))
+    threading.Timer(0.2, lambda: jobs._conn.execute("DELETE FROM jobs WHERE id = ?", (job["id"],))).start()
+    with TestClient(api_server.app).stream("GET", f"/jobs/{job['id']}/events") as r:
+        events = [json.loads(line[len("data: "):]) for line in r.iter_lines() if line]
+    assert [e["status"] for e in events] == [RUNNING, "gone"]
@@ -0,0 +1,75 @@
+import pytest
+
+from db import Database
+from learning_path import DAY, DEFAULT_EASE, MIN_EASE, LearningPath, next_review, review_quality
+from storage import MemoryStorage
+
+NOW = 1_700_000_000
+
+
+@pytest.fixture
+def db():
+    return Database(storage=MemoryStorage())
+
+
+def test_passing_grades_grow_the_interval_1_6_then_by_ease():
+    r = next_review(None, "ann", "algebra", 5, NOW)
+    assert (r["reps"], r["interval"], r["ease"]) == (1, 1.0, 2.6)
+    assert r["due"] == NOW + DAY
+    r = next_review(r, "ann", "algebra", 5, r["due"])
+    assert (r["reps"], r["interval"], r["ease"]) == (2, 6.0, 2.7)
+    r = next_review(r, "ann", "algebra", 4, r["due"])
+    assert r["interval"] == round(6.0 * 2.7, 2)
+    assert r["ease"] == 2.7                 # a 4 leaves ease where it was
+    assert r["lapses"] == 0
+
+
+def test_a_failing_grade_is_a_lapse_back_to_one_day():
+    r = next_review(None, "ann", "algebra", 5, NOW)
+    r = next_review(r, "ann", "algebra", 5, NOW)
+    r = next_review(r, "ann", "algebra", 2, NOW)
+    assert (r["reps"], r["interval"], r["lapses"]) == (0, 1.0, 1)
+    assert r["ease"] == pytest.approx(2.7 - 0.32)
+    for _ in range(10):
+        r = next_review(r, "ann", "algebra", 0, NOW)
+    assert r["ease"] == MIN_EASE
+    assert r["lapses"] == 11
+
+
+def test_review_quality_scales_score_to_0_5():
+    assert [review_quality(s, 5) for s in range(6)] == [0, 1, 2, 3, 4, 5]
+    assert review_quality(0, 0) == 0
+
+
+def test_replay_history_rebuilds_the_schedule_in_time_order(db):
+    db.storage.add_quiz_result("ann", "algebra", 5, 5, NOW + 2 * DAY)
+    db.storage.add_quiz_result("ann", "algebra", 4, 5, NOW)
+    db.storage.add_quiz_result("ann", "geometry", 0, 5, NOW + DAY)
+    lp = LearningPath(db=db)
+
+    r = lp._replay_history("ann", "algebra")
+    assert (r["reps"], r["interval"], r["last"]) == (2, 6.0, NOW + 2 * DAY)
+    assert r["ease"] == pytest.approx(DEFAULT_EASE + 0.1)
+    assert lp._replay_history("ann", "calculus") is None
+
+
+def test_record_quiz_result_continues_from_replayed_history(db):
+    db.storage.add_quiz_result("ann", "algebra", 5, 5, NOW)
+    lp = LearningPath(db=db)
+    lp.record_quiz_result("ann", "algebra", 5, 5)
+    assert db.get_review("ann", "algebra")["reps"] == 2
+
+
+def test_suggest_next_topic_prefers_due_then_mastery_then_history(db):
+    lp = LearningPath(db=db)
+    assert lp.suggest_next_topic("ann") is None
+
+    db.storage.add_quiz_result("ann", "algebra", 1, 5, NOW)
+    db.storage.add_quiz_result("ann", "geometry", 4, 5, NOW)
+    assert lp.suggest_next_topic("ann") == "algebra"            # weakest from history
+
+    db.put_mastery_many([("ann", "geometry", 0.5, "{}", NOW)])
+    assert lp.suggest_next_topic("ann") == "geometry"           # cohort-relative weakest wins
+
+    db.put_review(next_review(None, "ann", "calculus", 5, NOW - 2 * DAY))
+    assert lp.suggest_next_topic("ann") == "calculus"           # an overdue review wins over both
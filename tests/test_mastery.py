@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import mastery
+import resources
+from db import Database
+from job_queue import DONE, JobQueue
+from mastery import DAY
+from storage import MemoryStorage
+
+
+def test_recompute_runs_as_a_job(tmp_path):
+    db = Database(storage=MemoryStorage())
+    now = 1_700_000_000
+    for user, scores in (("ann", (5, 4)), ("bo", (1, 1)), ("cy", (3, 2))):
+        for topic, score in zip(("algebra", "geometry"), scores):
+            db.storage.add_quiz_result(user, topic, score, 5, now)
+    resources.override(db=db)
+    jobs = JobQueue(str(tmp_path / "jobs.db"), handlers={"mastery_recompute": mastery.recompute_job},
+                    workers=1, poll_interval=0.05).start()
+    try:
+        job = jobs.wait(jobs.submit("mastery_recompute", {"after": 0})["id"], timeout=30)
+    finally:
+        jobs.stop()
+        resources.reset()
+    assert job["status"] == DONE and job["progress"] == 1.0
+    assert job["result"]["users"] == 3
+    assert db.get_cohort_mastery()["weakest"] == ["geometry", "algebra"]
+    bo = db.get_mastery("bo")
+    assert set(bo) == {"user", "next_topic", "overall", "topics", "computed"}
+    assert bo["overall"] == 0.2
+
+
+def test_recency_weighting_halves_per_half_life():
+    now = 100 * DAY
+    c = mastery.build_cells([[("ann", "algebra", 0, 5, now - 30 * DAY), ("ann", "algebra", 5, 5, now)],
+                             [("ann", "geometry", 5, 5, now - 60 * DAY)]], now=now, half_life_days=30)
+    cells = {(c.users[u], c.topics[t]): (cor, att) for u, t, cor, att in zip(c.user, c.topic, c.correct, c.attempted)}
+    # the 0/5 from one half-life ago weighs half of today's 5/5
+    assert cells["ann", "algebra"] == pytest.approx((5.0, 7.5))
+    assert cells["ann", "geometry"] == pytest.approx((1.25, 1.25))
+    assert mastery.summarize(c, now)["overall"][0] == pytest.approx(6.25 / 8.75)
+
+
+def test_percentiles_rank_within_each_topic():
+    rows = [("ann", "algebra", 5, 5, 0), ("bo", "algebra", 1, 5, 0), ("cy", "algebra", 3, 5, 0),
+            ("dee", "algebra", 3, 5, 0), ("ann", "geometry", 1, 5, 0), ("bo", "geometry", 4, 5, 0),
+            ("ed", "poetry", 0, 0, 0)]
+    c = mastery.build_cells([rows[:3], rows[3:]], now=0)
+    result = mastery.summarize(c, now=0)
+    pct = {(c.users[u], c.topics[t]): p for u, t, p in zip(c.user, c.topic, result["percentile"])}
+    assert pct["bo", "algebra"] == 0.25
+    assert pct["cy", "algebra"] == pct["dee", "algebra"] == 0.625     # ties share the average rank
+    assert pct["ann", "algebra"] == 1.0
+    assert (pct["ann", "geometry"], pct["bo", "geometry"]) == (0.5, 1.0)
+    assert np.isnan(pct["ed", "poetry"])                              # nothing attempted, not ranked
+
+    next_topic = {u: (c.topics[t] if t >= 0 else None) for u, t in zip(c.users, result["next_topic"])}
+    assert next_topic == {"ann": "geometry", "bo": "algebra", "cy": "algebra", "dee": "algebra", "ed": None}
+    cohort = result["cohort"]
+    assert cohort["topics"]["algebra"] == {"learners": 4, "p10": 0.32, "p25": 0.5, "p50": 0.6, "p75": 0.7,
+                                           "p90": 0.88}
+    assert cohort["topics"]["poetry"]["learners"] == 0
+    assert cohort["weakest"][:2] == ["geometry", "algebra"]
+
+
+def test_a_job_queued_before_a_newer_recompute_reuses_it(monkeypatch):
+    db = Database(storage=MemoryStorage())
+    db.storage.add_quiz_result("ann", "algebra", 5, 5, 1_700_000_000)
+    mastery.recompute(db, now=1_700_000_100)
+    resources.override(db=db)
+    monkeypatch.setattr(mastery, "recompute", lambda *a, **k: pytest.fail("recomputed again"))
+    try:
+        cohort = mastery.recompute_job({"after": 1_700_000_000}, lambda fraction, message=None: None)
+    finally:
+        resources.reset()
+    assert cohort["computed"] == 1_700_000_100
@@ -0,0 +1,78 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api_server
+import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    reg = metrics.Registry()
+    monkeypatch.setattr(metrics, "REGISTRY", reg)
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    return reg
+
+
+def test_counters_render_one_type_line_per_family(registry):
+    metrics.inc("edugenie_hits_total", kind="a")
+    metrics.inc("edugenie_hits_total", 2, kind="b")
+    metrics.inc("edugenie_hits_total", kind="a")
+    metrics.inc("edugenie_misses_total", 0.5)
+    assert metrics.render_prometheus().splitlines() == [
+        "# TYPE edugenie_hits_total counter",
+        'edugenie_hits_total{kind="a"} 2',
+        'edugenie_hits_total{kind="b"} 2',
+        "# TYPE edugenie_misses_total counter",
+        "edugenie_misses_total 0.5",
+    ]
+
+
+def test_histograms_render_cumulative_buckets_sum_and_count(registry):
+    for v in (0.5, 2, 3, 100):
+        metrics.observe("edugenie_op_seconds", v, buckets=(1, 5), op="x")
+    assert metrics.render_prometheus().splitlines() == [
+        "# TYPE edugenie_op_seconds histogram",
+        'edugenie_op_seconds_bucket{op="x",le="1"} 1',
+        'edugenie_op_seconds_bucket{op="x",le="5"} 3',
+        'edugenie_op_seconds_bucket{op="x",le="+Inf"} 4',
+        'edugenie_op_seconds_sum{op="x"} 105.5',
+        'edugenie_op_seconds_count{op="x"} 4',
+    ]
+    assert registry.snapshot()[("edugenie_op_seconds_count", (("op", "x"),))] == 4
+
+
+def test_label_values_are_escaped(registry):
+    metrics.inc("edugenie_errors_total", where='C:\\tmp "quoted"\nnext line')
+    assert metrics.render_prometheus().splitlines()[1] == \
+        'edugenie_errors_total{where="C:\\\\tmp \\"quoted\\"\\nnext line"} 1'
+
+
+def test_disabled_metrics_record_nothing_and_leave_code_untouched(registry, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+
+    def fn():
+        return 42
+
+    class Thing:
+        def work(self):
+            return 1
+
+    metrics.inc("edugenie_hits_total")
+    metrics.observe("edugenie_op_seconds", 1.0)
+    metrics.observe_duration("edugenie_op_seconds", 10.0)
+    with metrics.timer("edugenie_op_seconds", op="x"):
+        pass
+    assert metrics.timer("edugenie_op_seconds") is metrics._NOOP
+    assert metrics.timed("edugenie_op_seconds")(fn) is fn
+    work = Thing.work
+    assert metrics.instrument_methods("edugenie_thing_seconds")(Thing).work is work
+    assert metrics.render_prometheus() == "\n"
+    assert registry.snapshot() == {}
+
+
+def test_metrics_endpoint_serves_the_registry(registry):
+    metrics.inc("edugenie_hits_total", kind="a")
+    r = TestClient(api_server.app).get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert r.text == '# TYPE edugenie_hits_total counter\nedugenie_hits_total{kind="a"} 1\n'
@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+
+import pytest
+
+from fakes import FakeLLMBackend
+from resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, QueueTimeout, ResilientCaller, RetryPolicy,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_deadline_exceeded_on_hung_backend():
+    def backend(prompt, temperature=0.3, timeout=None):
+        time.sleep(2.0)     # ignores its timeout, like a stuck connection
+        return "late"
+
+    caller = ResilientCaller(backend, deadline=0.2, retry=RetryPolicy(max_attempts=1))
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        caller("hi")
+    assert time.monotonic() - start < 1.0
+
+
+def test_backoff_is_full_jitter_within_cap():
+    policy = RetryPolicy(base_delay=0.25, max_delay=1.0, rng=random.Random(7))
+    for attempt in range(6):
+        cap = min(1.0, 0.25 * 2 ** attempt)
+        samples = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0 <= s <= cap for s in samples)
+        assert max(samples) > cap / 2   # spread over the range, not a fixed delay
+
+
+def test_retry_then_succeed():
+    outcomes = [ConnectionError("reset"), ConnectionError("reset"), "ok"]
+    pauses = []
+
+    def backend(prompt, temperature=0.3, timeout=None):
+        out = outcomes.pop(0)
+        if isinstance(out, Exception):
+            raise out
+        return out
+
+    caller = ResilientCaller(backend, deadline=5.0, retry=RetryPolicy(max_attempts=3, rng=random.Random(1)),
+                             sleep=pauses.append)
+    assert caller("hi") == "ok"
+    assert len(pauses) == 2
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_non_retryable_error_is_not_retried():
+    calls = []
+
+    def backend(prompt, temperature=0.3, timeout=None):
+        calls.append(prompt)
+        raise ValueError("bad request")
+
+    caller = ResilientCaller(backend, retry=RetryPolicy(max_attempts=3), sleep=lambda s: None)
+    with pytest.raises(ValueError):
+        caller("hi")
+    assert len(calls) == 1
+
+
+def test_breaker_open_half_open_close():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=clock)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock.now = 10.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()          # the one trial call
+    assert not breaker.allow()      # everyone else still fails fast
+    breaker.record_failure()        # trial failed: open again
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_open_circuit_fails_fast():
+    backend = FakeLLMBackend()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60.0)
+    breaker.record_failure()
+    caller = ResilientCaller(backend, breaker=breaker)
+    with pytest.raises(CircuitOpenError):
+        caller("hi")
+    assert backend.calls == 0
+
+
+def test_hedge_wins_over_slow_first_request():
+    lock = threading.Lock()
+    seen = []
+
+    def backend(prompt, temperature=0.3, timeout=None):
+        with lock:
+            seen.append(prompt)
+            first = len(seen) == 1
+        time.sleep(1.0 if first else 0.01)
+        return "slow" if first else "fast"
+
+    caller = ResilientCaller(backend, deadline=5.0, hedge=True, hedge_min_samples=1)
+    caller.latency.add(0.05)
+    start = time.monotonic()
+    assert caller("hi") == "fast"
+    assert time.monotonic() - start < 0.5
+    assert len(seen) == 2
+
+
+def test_queueing_for_a_slot_does_not_burn_the_deadline_or_trip_the_breaker():
+    # 24 callers, 2 slots, 0.1s per call: the last caller waits ~1.1s for a slot,
+    # far past the 0.3s deadline, but the upstream itself is healthy
+    backend = FakeLLMBackend(latency=0.1)
+    caller = ResilientCaller(backend, deadline=0.3, max_workers=2, queue_timeout=10.0,
+                             retry=RetryPolicy(max_attempts=1))
+    errors = []
+
+    def call():
+        try:
+            caller("hi")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(24)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert backend.calls == 24
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_queue_timeout_is_local_and_not_a_breaker_failure():
+    release = threading.Event()
+
+    def backend(prompt, temperature=0.3, timeout=None):
+        release.wait(5)
+        return "ok"
+
+    caller = ResilientCaller(backend, deadline=5.0, max_workers=1, queue_timeout=0.05,
+                             breaker=CircuitBreaker(failure_threshold=1))
+    busy = threading.Thread(target=caller, args=("first",))
+    busy.start()
+    time.sleep(0.05)
+    with pytest.raises(QueueTimeout):
+        caller("second")
+    assert caller.breaker.state == CircuitBreaker.CLOSED
+    release.set()
+    busy.join()
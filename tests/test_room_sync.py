@@ -0,0 +1,159 @@
+import threading
+import time
+
+import pytest
+
+import firebase_utils
+from fakes import LocalRealtimeDB
+from room_sync import RoomSyncService
+
+
+class MemoryStore:
+    def __init__(self, delay=0.0):
+        self.snapshots, self.saves, self.delay = {}, [], delay
+
+    def get_room_snapshot(self, room):
+        time.sleep(self.delay)
+        return self.snapshots.get(room)
+
+    def save_room_snapshot(self, room, snap):
+        self.saves.append(room)
+        self.snapshots[room] = snap
+
+
+@pytest.fixture
+def rtdb():
+    db = LocalRealtimeDB()
+    firebase_utils.use_backend(db)
+    yield db
+    firebase_utils.use_backend(None)
+
+
+def text(pos, ins="", delete=0):
+    return {"type": "text", "pos": pos, "del": delete, "ins": ins}
+
+
+@pytest.fixture
+def sync():
+    s = RoomSyncService(store=MemoryStore(), snapshot_every=1000, snapshot_interval=3600)
+    s.submit("r", "seed", text(0, "hello world"))
+    return s
+
+
+def test_concurrent_insert_and_delete_rebase(sync):
+    base = sync.snapshot("r")["version"]
+    sync.submit("r", "a", text(5, ","), base)                    # "hello, world"
+    out = sync.submit("r", "b", text(6, "", delete=5), base)     # b meant to delete "world"
+    assert out["op"] == {"type": "text", "pos": 7, "del": 5, "ins": ""}
+    assert sync.snapshot("r")["text"] == "hello, "
+
+
+def test_delete_around_a_concurrent_insert_takes_it_along(sync):
+    base = sync.snapshot("r")["version"]
+    sync.submit("r", "a", text(8, "XX"), base)                   # inside "world"
+    sync.submit("r", "b", text(6, "", delete=5), base)
+    assert sync.snapshot("r")["text"] == "hello "
+
+
+def test_inserts_at_the_same_spot_keep_arrival_order(sync):
+    base = sync.snapshot("r")["version"]
+    sync.submit("r", "a", text(5, "A"), base)
+    sync.submit("r", "b", text(5, "B"), base)
+    assert sync.snapshot("r")["text"] == "helloAB world"
+
+
+def test_concurrent_clients_converge(sync):
+    # every client types its letter at the front against a stale base version
+    base = sync.snapshot("r")["version"]
+    threads = [threading.Thread(target=sync.submit, args=("r", c, text(0, c), base)) for c in "abcdefgh"]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    snap = sync.snapshot("r")
+    assert snap["version"] == base + 8
+    assert sorted(snap["text"][:8]) == list("abcdefgh") and snap["text"][8:] == "hello world"
+    replay = ""
+    for event in sync.ops_since("r", 0):
+        op = event["op"]
+        replay = replay[:op["pos"]] + op["ins"] + replay[op["pos"] + op["del"]:]
+    assert replay == snap["text"]
+
+
+@pytest.mark.parametrize("points", [[[1, 2, 3]], [["1", 2]], [[1, float("nan")]], [[True, 1]], "12", [1, 2]])
+def test_bad_stroke_points_are_rejected(sync, points):
+    with pytest.raises(ValueError):
+        sync.submit("r", "a", {"type": "stroke", "id": "s1", "points": points})
+    assert sync.snapshot("r")["strokes"] == []
+
+
+def test_snapshot_compaction_and_restart():
+    store = MemoryStore()
+    sync = RoomSyncService(store=store, snapshot_every=50, snapshot_interval=3600)
+    for i in range(49):
+        sync.submit("r", "a", text(i, "x"))
+    for i in range(50):
+        sync.submit("r", "b", {"type": "stroke", "id": "s1", "points": [[i, i]]})
+    assert store.saves == ["r"]          # 99 ops, one compact write at op 50
+    sync.flush()
+    assert store.saves == ["r", "r"]
+    snap = store.snapshots["r"]
+    assert snap["version"] == 99 and snap["text"] == "x" * 49
+    assert len(snap["strokes"]) == 1 and len(snap["strokes"][0]["points"]) == 50
+
+    restarted = RoomSyncService(store=store)
+    assert restarted.snapshot("r")["text"] == "x" * 49
+    assert restarted.ops_since("r", 99) == []
+    assert restarted.ops_since("r", 10) is None     # log is gone: client reloads the snapshot
+    out = restarted.submit("r", "a", text(0, "y"), 99)
+    assert out["version"] == 100
+
+
+def test_slow_snapshot_load_does_not_block_other_rooms():
+    store = MemoryStore(delay=0.5)
+    sync = RoomSyncService(store=store)
+    slow = threading.Thread(target=sync.room, args=("slow",))
+    slow.start()
+    time.sleep(0.05)
+    store.delay = 0.0
+    start = time.monotonic()
+    sync.room("fast")
+    assert time.monotonic() - start < 0.2
+    slow.join()
+    assert sync.room("slow") is sync.room("slow")
+
+
+def test_idle_rooms_are_saved_then_evicted_and_reload():
+    store = MemoryStore()
+    s = RoomSyncService(store=store, snapshot_every=1000, snapshot_interval=3600, idle_evict_s=0)
+    s.submit("idle", "a", text(0, "notes"))
+    q = s.subscribe("busy")
+    assert s.evict_idle() == 1                       # "busy" has a subscriber
+    assert set(s._rooms) == {"busy"}
+    assert store.snapshots["idle"]["text"] == "notes"
+
+    s.unsubscribe("busy", q)
+    assert s.evict_idle() == 1
+    out = s.submit("idle", "a", text(5, "!"))        # reopened from its snapshot
+    assert out["version"] == 2 and s.snapshot("idle")["text"] == "notes!"
+
+
+def test_recently_used_or_unsaved_rooms_stay():
+    class FailingStore(MemoryStore):
+        def save_room_snapshot(self, room, snap):
+            raise ConnectionError("offline")
+
+    s = RoomSyncService(store=FailingStore(), snapshot_every=1000, snapshot_interval=3600, idle_evict_s=3600)
+    s.submit("r", "a", text(0, "hi"))
+    assert s.evict_idle() == 0                       # used just now
+
+    s.idle_evict_s = 0
+    assert s.evict_idle() == 0                       # the save failed: keep it, still dirty
+    assert s._rooms["r"].dirty_ops == 1
+
+
+def test_legacy_snapshots_move_out_of_the_room_metadata(rtdb):
+    rtdb.reference("/rooms/r").set({"owner": "ann", "snapshot": {"version": 3, "text": "old"}})
+    assert firebase_utils.get_room_snapshot("r") == {"version": 3, "text": "old"}
+    assert firebase_utils.get_room_metadata("r") == {"owner": "ann"}
+    assert rtdb.reference("/room_snapshots/r").get() == {"version": 3, "text": "old"}
@@ -0,0 +1,148 @@
+import sqlite3
+import time
+
+import pytest
+
+from db import DAY, CacheNamespace, Database
+from storage import MemoryStorage, SQLiteStorage, Storage, StorageLayoutError, open_storage, reshard
+
+
+def test_cache_compaction_returns_every_free_page(tmp_path):
+    s = SQLiteStorage(str(tmp_path / "cache.db"))
+    s._conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    s._conn.execute("VACUUM")
+    rows = [(f"k{i}", "quiz", "x" * 4000, "raw", 4000, 0, 1) for i in range(2000)]
+    s.cache_put_many(rows)
+    pages = s._conn.execute("PRAGMA page_count").fetchone()[0]
+    assert s.cache_compact({}, now=10)["expired"] == 2000
+    assert s._conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert s._conn.execute("PRAGMA page_count").fetchone()[0] < pages / 10
+
+
+def test_a_backend_missing_a_method_cannot_be_created():
+    class Partial(Storage):
+        def get_xp(self, user):
+            return 0
+
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
+
+
+def _fill(storage, users=200):
+    for i in range(users):
+        storage.add_xp(f"user{i}", i)
+        storage.add_quiz_result(f"user{i}", "algebra", i % 5, 5, 1000 + i)
+    storage.review_put(("user7", "algebra", 2.5, 1.0, 1, 0, 500, 400))
+
+
+def _snapshot(storage):
+    return (sorted(storage.all_users()), sorted(r for c in storage.iter_quiz_history(37) for r in c),
+            storage.review_get("user7", "algebra"))
+
+
+def test_open_refuses_a_layout_that_does_not_match_the_files(tmp_path):
+    path = str(tmp_path / "edugenie.db")
+    legacy = open_storage(path, shards=1)
+    _fill(legacy)
+    before = _snapshot(legacy)
+    legacy.close()
+    with pytest.raises(StorageLayoutError):
+        open_storage(path, shards=4)
+
+    reshard(path, 4)
+    assert _snapshot(open_storage(path, shards=4)) == before
+    with pytest.raises(StorageLayoutError):
+        open_storage(path, shards=2)
+    with pytest.raises(StorageLayoutError):
+        open_storage(path, shards=8)
+    with pytest.raises(StorageLayoutError):
+        open_storage(path, shards=1)
+
+
+def test_reshard_keeps_every_row(tmp_path):
+    path = str(tmp_path / "edugenie.db")
+    legacy = open_storage(path, shards=1)
+    _fill(legacy)
+    before = _snapshot(legacy)
+    legacy.close()
+
+    for n in (4, 3, 1):
+        reshard(path, n)
+        s = open_storage(path, shards=n)
+        assert _snapshot(s) == before
+        for i in range(200):   # every user is where routing looks for it
+            assert s.get_xp(f"user{i}") == i
+        s.close()
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "sharded"])
+def test_users_due_includes_overdue_reviews(kind, tmp_path):
+    storage = {"memory": lambda: MemoryStorage(),
+               "sqlite": lambda: open_storage(str(tmp_path / "due.db"), shards=1),
+               "sharded": lambda: open_storage(str(tmp_path / "due.db"), shards=3)}[kind]()
+    db = Database(storage=storage)
+    now = 100000
+    for user, due in (("overdue", now - 86400), ("soon", now + 600), ("later", now + 7200), ("due_now", now)):
+        storage.review_put((user, "algebra", 2.5, 1.0, 1, 0, due, due - 86400))
+    assert list(db.get_users_due(within=3600, now=now)) == ["overdue", "due_now", "soon"]
+    assert list(db.get_users_due(within=3600, now=now, limit=1)) == ["overdue"]
+
+
+def _storage(kind, tmp_path):
+    return {"memory": lambda: MemoryStorage(),
+            "sqlite": lambda: open_storage(str(tmp_path / "cache.db"), shards=1),
+            "sharded": lambda: open_storage(str(tmp_path / "cache.db"), shards=3)}[kind]()
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "sharded"])
+def test_cache_ttl_is_per_namespace(kind, tmp_path):
+    db = Database(storage=_storage(kind, tmp_path))
+    old = int(time.time()) - 8 * DAY
+    db.cache_set_many({"chat:q": "a", "context:ann": "b", "cohort:mastery": "c", "plain": "d"}, ts=old)
+    # chat keeps 7 days, context 30; cohort and un-namespaced keys never expire
+    assert db.cache_get_many(["chat:q", "context:ann", "cohort:mastery", "plain"]) == {
+        "context:ann": "b", "cohort:mastery": "c", "plain": "d"}
+    assert db.compact_cache()["expired"] == 1
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])   # shards split the caps, so only roughly there
+def test_cache_evicts_least_recently_used_over_the_caps(kind, tmp_path):
+    limits = {"rows": CacheNamespace(max_rows=3), "bytes": CacheNamespace(max_bytes=250),
+              "default": CacheNamespace()}
+    db = Database(storage=_storage(kind, tmp_path), cache_namespaces=limits)
+    for i in range(6):
+        db.cache_set_many({f"rows:{i}": "x", f"bytes:{i}": "y" * 100}, ts=1000 + i)
+    db.cache_get_many(["rows:0", "bytes:1"])      # recently read, so kept
+    stats = db.compact_cache()
+    assert stats == {"expired": 0, "evicted": 3 + 4}
+    assert set(db.cache_get_many([f"rows:{i}" for i in range(6)])) == {"rows:0", "rows:5", "rows:4"}
+    assert set(db.cache_get_many([f"bytes:{i}" for i in range(6)])) == {"bytes:1", "bytes:5"}
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "sharded"])
+def test_cache_compresses_large_values_and_round_trips(kind, tmp_path):
+    db = Database(storage=_storage(kind, tmp_path))
+    big, small = "Fourier series, step by step. " * 200, "short answer"
+    items = {"chat:big": big, "chat:small": small, "plain:big": big, "chat:ünï": "ωμέγα " * 200}
+    db.cache_set_many(items)
+    assert db.cache_get_many(list(items) + ["chat:missing"]) == items
+    raw = db.storage.cache_get_many(["chat:big", "chat:small", "plain:big"], int(time.time()))
+    assert raw["chat:big"][1] == "zlib" and len(raw["chat:big"][0]) < len(big) / 10
+    assert raw["chat:small"] == (small, "")      # below COMPRESS_MIN_BYTES
+    assert raw["plain:big"] == (big, "")         # namespace doesn't compress
+
+
+def test_legacy_cache_rows_get_their_namespace_ttl(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    now = int(time.time())
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE cache (key TEXT PRIMARY KEY, value TEXT, ts INTEGER)")
+    conn.executemany("INSERT INTO cache VALUES (?, ?, ?)",
+                     [("chat:old", "a", now - 8 * DAY), ("chat:new", "b", now - DAY), ("plain", "c", 0)])
+    conn.commit()
+    conn.close()
+
+    db = Database(storage=SQLiteStorage(path))
+    assert db.cache_get_many(["chat:old", "chat:new", "plain"]) == {"chat:new": "b", "plain": "c"}
+    expires = dict(db.storage._conn.execute("SELECT key, expires FROM cache"))
+    assert expires == {"chat:old": now - DAY, "chat:new": now + 6 * DAY, "plain": None}
@@ -1,10 +1,39 @@
 # token_server.py
-from flask import Flask, request, jsonify
-import threading, os, jwt, time
+from flask import Flask, request, jsonify, Response
+import threading, os, jwt, time, json, queue
 from firebase_utils import get_room_metadata
+from room_sync import RoomSyncService
 
 app = Flask(__name__)
 JWT_SECRET = os.environ.get("JWT_SECRET") or os.environ.get("JWT_SECRET_KEY")
+sync = RoomSyncService(
+    snapshot_every=int(os.environ.get("ROOM_SNAPSHOT_EVERY", "200")),
+    snapshot_interval=float(os.environ.get("ROOM_SNAPSHOT_INTERVAL_S", "10")),
+    idle_evict_s=float(os.environ.get("ROOM_IDLE_EVICT_S", "600")),
+)
+
+@app.after_request
+def allow_cross_origin(resp):
+    # peer_room.html runs inside the Streamlit component iframe, on another origin
+    resp.headers['Access-Control-Allow-Origin'] = '*'
+    resp.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+    return resp
+
+def _room_token(room):
+    """Decode the room JWT from the Authorization header or ?token=; returns (payload, error_response)."""
+    auth = request.headers.get('Authorization', '')
+    token = auth[7:] if auth.startswith('Bearer ') else request.args.get('token')
+    if not token:
+        return None, (jsonify({'ok': False, 'error': 'missing token'}), 401)
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({'ok': False, 'error': 'expired'}), 403)
+    except Exception as e:
+        return None, (jsonify({'ok': False, 'error': str(e)}), 403)
+    if payload.get('room') != room:
+        return None, (jsonify({'ok': False, 'error': 'token room mismatch'}), 403)
+    return payload, None
 
 @app.route('/validate_token', methods=['POST'])
 def validate_token():
@@ -27,8 +56,68 @@ def validate_token():
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 403
 
+# ---- room sync relay: snapshot on join, small ops in, ops out over SSE
+@app.route('/rooms/<room>/snapshot', methods=['GET'])
+def room_snapshot(room):
+    _, err = _room_token(room)
+    if err:
+        return err
+    return jsonify(sync.snapshot(room))
+
+@app.route('/rooms/<room>/ops', methods=['POST', 'OPTIONS'])
+def room_ops(room):
+    if request.method == 'OPTIONS':
+        return '', 204
+    payload, err = _room_token(room)
+    if err:
+        return err
+    data = request.get_json(silent=True) or {}
+    op = data.get('op')
+    if not isinstance(op, dict):
+        return jsonify({'ok': False, 'error': 'missing op'}), 400
+    client_id = str(data.get('client_id') or payload.get('user') or 'anon')
+    try:
+        applied = sync.submit(room, client_id, op, data.get('base_version'))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({'ok': False, 'error': str(e)}), 409
+    return jsonify({'ok': True, **applied})
+
+@app.route('/rooms/<room>/events', methods=['GET'])
+def room_events(room):
+    _, err = _room_token(room)
+    if err:
+        return err
+    since = request.args.get('since', type=int) or 0
+    q = sync.subscribe(room)
+    backlog = sync.ops_since(room, since)
+
+    def stream():
+        try:
+            last = since
+            if backlog is None:
+                snap = sync.snapshot(room)
+                last = snap['version']
+                yield f"event: reset\ndata: {json.dumps(snap)}\n\n"
+            for event in backlog or []:
+                last = event['version']
+                yield f"data: {json.dumps(event)}\n\n"
+            while True:
+                try:
+                    event = q.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event['version'] > last:
+                    last = event['version']
+                    yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            sync.unsubscribe(room, q)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
 def run_server(port=5001):
-    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)
+    sync.start_flusher()
+    app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False, threaded=True)
 
 def start_in_background(port=5001):
     t = threading.Thread(target=run_server, kwargs={'port':port}, daemon=True)
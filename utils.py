@@ -1,43 +1,118 @@
 import os
 import json
+import hashlib
 import tempfile
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Union
 from gtts import gTTS
 import google.generativeai as genai  # ✅ Correct Gemini SDK import
+import metrics
+from images import PerceptualCache, PreparedImage, prepare_image
+from resilience import ResilientCaller, RetryPolicy, CircuitBreaker, CircuitOpenError, QueueTimeout
 
 
 class GeminiClient:
     """
     Wrapper for Google Gemini API.
     Uses google-generativeai SDK for real AI responses.
+
+    Every call runs under a deadline with jittered retries and a circuit breaker
+    (see resilience.py). Pass `backend=` (e.g. fakes.FakeLLMBackend) and
+    `tts_engine=` (e.g. fakes.FakeTTS) to run offline.
+    Image explanations are cached by perceptual hash (see images.py).
     """
-    def __init__(self, api_key: str = None, model: str = "gemini-1.5-flash"):
+    def __init__(self, api_key: str = None, model: str = "gemini-1.5-flash", backend=None,
+                 deadline: float = None, max_attempts: int = 3, hedge: bool = None, max_concurrency: int = None,
+                 image_cache: PerceptualCache = None, tts_engine=None):
         # Pick API key from parameter or environment
         self.api_key = api_key or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
         self.model = model
-        self.available = bool(self.api_key)
+        self.available = bool(self.api_key) or backend is not None
+        self.image_cache = image_cache if image_cache is not None else PerceptualCache()
+        self.tts_engine = tts_engine or gTTS   # called as tts_engine(text=..., lang=...).save(path)
 
-        if self.available:
+        if self.api_key and backend is None:
             try:
                 genai.configure(api_key=self.api_key)
             except Exception as e:
                 print(f"❌ Gemini configuration failed: {e}")
                 self.available = False
 
-    def chat(self, prompt: str, temperature: float = 0.3) -> Dict[str, Any]:
+        if deadline is None:
+            deadline = float(os.environ.get("GEMINI_DEADLINE_S", "30"))
+        if hedge is None:
+            hedge = os.environ.get("GEMINI_HEDGE", "0") == "1"
+        if max_concurrency is None:
+            max_concurrency = int(os.environ.get("GEMINI_MAX_CONCURRENCY", "32"))
+        self._caller = ResilientCaller(
+            backend or self._genai_backend,
+            deadline=deadline,
+            retry=RetryPolicy(max_attempts=max_attempts),
+            breaker=CircuitBreaker(failure_threshold=5, reset_timeout=30.0),
+            hedge=hedge,
+            max_workers=max_concurrency,
+        )
+
+    def _genai_backend(self, prompt, temperature: float = 0.3, timeout: float = None) -> str:
+        model = genai.GenerativeModel(self.model)
+        request_options = {"timeout": timeout} if timeout else None
+        response = model.generate_content(prompt, request_options=request_options)
+        return response.text
+
+    def chat(self, prompt: Union[str, list], temperature: float = 0.3) -> Dict[str, Any]:
         """
-        Send a chat prompt to Gemini and get back a text response.
-        Returns a dict: {'text': response_text}
+        Send a chat prompt to Gemini and get back a text response. `prompt` may also be
+        a list of parts: strings and {"mime_type": ..., "data": bytes} inline images.
+        Returns a dict: {'text': response_text}, or {'error': message} once retries are
+        exhausted, the deadline passes or the circuit breaker is open.
         """
+        text_prompt = prompt if isinstance(prompt, str) else "\n".join(p for p in prompt if isinstance(p, str))
         if not self.available:
-            return {"mock": True, "text": f"[MOCK RESPONSE] {prompt[:200]}"}
+            return {"mock": True, "text": f"[MOCK RESPONSE] {text_prompt[:200]}"}
 
+        metrics.observe("edugenie_llm_prompt_chars", len(text_prompt), buckets=metrics.SIZE_BUCKETS)
+        start = time.perf_counter()
+        try:
+            text = self._caller(prompt, temperature=temperature)
+            result, outcome = {"text": text}, "ok"
+            metrics.observe("edugenie_llm_response_chars", len(text or ""), buckets=metrics.SIZE_BUCKETS)
+        except CircuitOpenError as e:
+            result, outcome = {"error": str(e), "circuit_open": True}, "circuit_open"
+        except QueueTimeout as e:
+            result, outcome = {"error": str(e), "busy": True}, "queue_timeout"
+        except Exception as e:
+            result, outcome = {"error": str(e) or type(e).__name__}, "error"
+        metrics.observe_duration("edugenie_llm_call_seconds", time.perf_counter() - start, outcome=outcome)
+        return result
+
+    def explain_image(self, image, prompt: str, temperature: float = 0.3, canvas: bool = False) -> Dict[str, Any]:
+        """
+        Send `prompt` together with an image (canvas RGBA array, uploaded file, bytes,
+        PIL image or PreparedImage), downscaled and re-encoded first.
+        Returns chat()'s dict, plus 'cached': True when a perceptually near-identical
+        image was already explained with the same prompt, or {'blank': True, 'text': ''}
+        for an empty drawing when `canvas` is set (nothing is sent).
+        """
         try:
-            model = genai.GenerativeModel(self.model)
-            response = model.generate_content(prompt)
-            return {"text": response.text}
+            with metrics.timer("edugenie_image_prepare_seconds"):
+                prepared = image if isinstance(image, PreparedImage) else prepare_image(image, canvas=canvas)
         except Exception as e:
-            return {"error": str(e)}
+            return {"error": f"Could not read image: {e}"}
+        if prepared.blank:
+            metrics.inc("edugenie_image_requests_total", result="blank")
+            return {"blank": True, "text": ""}
+
+        scope = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:16]
+        hit = self.image_cache.get(scope, prepared.dhash, prepared.thumb)
+        if hit is not None:
+            metrics.inc("edugenie_image_requests_total", result="cache_hit")
+            return {"text": hit, "cached": True}
+        metrics.inc("edugenie_image_requests_total", result="sent")
+        metrics.observe("edugenie_llm_image_bytes", len(prepared.data), buckets=metrics.SIZE_BUCKETS)
+        result = self.chat([prompt, {"mime_type": prepared.mime_type, "data": prepared.data}], temperature)
+        if result.get("text") and not result.get("mock"):
+            self.image_cache.put(scope, prepared.dhash, result["text"], prepared.thumb)
+        return result
 
     def summarize(self, text: str) -> str:
         """
@@ -53,6 +128,24 @@ class GeminiClient:
         result = self.chat(prompt)
         return result.get("text", "")
 
+    def combine_summaries(self, parts: List[str], final: bool = True) -> str:
+        """
+        Merge summaries of consecutive sections of one document. Nothing is truncated:
+        callers keep `parts` small enough to fit (see api_server.summarize_job).
+        `final=False` keeps it to key points for a further round of merging.
+        """
+        if not parts:
+            return ""
+        ask = ("a single concise study summary, then 5 flashcard-style Q&A pairs covering the whole document"
+               if final else "one set of concise key points, keeping every distinct fact")
+        sections = "\n\n".join(f"[Part {i + 1}]\n{p}" for i, p in enumerate(parts))
+        prompt = (
+            f"The following are summaries of consecutive parts of one document, in order. "
+            f"Combine them into {ask}:\n\n{sections}"
+        )
+        result = self.chat(prompt)
+        return result.get("text", "")
+
     def generate_quiz(self, topic: str, difficulty: str = "Medium", n_questions: int = 5) -> List[Dict[str, Any]]:
         """
         Generate a quiz (JSON list of Q&A) for a given topic.
@@ -87,9 +180,10 @@ class GeminiClient:
         Returns path to saved temporary file.
         """
         try:
-            tts = gTTS(text=text, lang=lang)
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-            tts.save(tmp.name)
+            with metrics.timer("edugenie_tts_seconds"):
+                tts = self.tts_engine(text=text, lang=lang)
+                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
+                tts.save(tmp.name)
             tmp.close()
             return tmp.name
         except Exception as e:
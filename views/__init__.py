@@ -0,0 +1,24 @@
+"""
+One module per page, each exposing `render(name)`.
+Pages are imported on first visit, so a rerun only pays for the page being shown
+(plotly, reportlab, webrtc, the drawable canvas etc. stay unloaded until needed).
+"""
+import importlib
+
+PAGES = {
+    "Landing": "views.landing",
+    "AI Tutor": "views.tutor",
+    "AI Learning Planner": "views.planner",
+    "Upload & Summarize": "views.upload",
+    "Quizzes": "views.quiz",
+    "Peer Rooms": "views.peer_rooms",
+    "Live Room": "views.live_room",
+    "Progress & Leaderboard": "views.progress",
+    "Admin Analytics": "views.admin_analytics",
+    "Settings": "views.settings",
+    "Admin Dashboard": "views.admin_dashboard",
+}
+
+
+def load(page: str):
+    return importlib.import_module(PAGES[page])
@@ -0,0 +1,21 @@
+import plotly.express as px
+import streamlit as st
+
+from resources import get_db
+
+
+def render(name: str):
+    db = get_db()
+
+    st.header("📊 Admin Analytics")
+    st.caption("Visualize engagement and learning metrics.")
+    # require a simple admin key (in secrets)
+    if st.sidebar.text_input("Admin Key", type="password") != st.secrets.get("ADMIN_KEY",""):
+        st.warning("Enter admin key to view analytics.")
+    else:
+        df = db.get_activity_dataframe()  # returns pandas DataFrame
+        if df is None or df.empty:
+            st.info("No activity data yet.")
+        else:
+            fig = px.bar(df, x="topic", y="score", color="user", barmode="group")
+            st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,125 @@
+import json
+import os
+
+import streamlit as st
+
+from certificates import COHORT_MAX_USERS, today
+from job_queue import DONE, FAILED, QUEUED, RUNNING
+from resources import get_db, get_jobs
+
+
+def render(name: str):
+    db = get_db()
+    admin_key = st.secrets.get("ADMIN_KEY", "supersecret")
+
+    st.header("🧑‍💼 EduGenie Admin Dashboard")
+    st.caption("Restricted access — for authorized administrators only.")
+
+    entered_key = st.text_input("🔑 Enter Admin Key:", type="password")
+    if entered_key == admin_key:
+        st.success("✅ Admin access granted!")
+
+        tab1, tab2, tab3 = st.tabs(["📊 Analytics", "🧱 Database", "👥 Users"])
+
+        with tab1:
+            st.subheader("Engagement Analytics 📈")
+            data = db.get_leaderboard(limit=50)
+            if data:
+                import pandas as pd
+                df = pd.DataFrame(data)
+                st.bar_chart(df.set_index("user")["xp"])
+                st.write(df)
+            else:
+                st.info("No data available yet.")
+
+            st.markdown("### Reviews Overdue or Due in the Next Hour ⏰")
+            due_users = db.get_users_due(within=3600)
+            st.metric("Learners with reviews due", len(due_users))
+            if due_users:
+                st.write({u: [r["topic"] for r in rs] for u, rs in due_users.items()})
+
+            st.markdown("### Cohort Mastery 🧮")
+            cohort = db.get_cohort_mastery()
+            if st.button("🔁 Recompute cohort mastery"):
+                # runs on the job queue, not in this rerun; clicks before it finishes join the same job
+                job = get_jobs().submit("mastery_recompute", {"after": cohort["computed"] if cohort else 0})
+                st.session_state["mastery_job"] = job["id"]
+            job_id = st.session_state.get("mastery_job")
+            job = get_jobs().get(job_id) if job_id else None
+            if job and job["status"] in (QUEUED, RUNNING):
+                st.progress(job["progress"], text=f"Recomputing: {job['message'] or job['status']} (refresh to update)")
+            elif job and job["status"] == FAILED:
+                st.error(f"Mastery recompute failed: {job['error']}")
+            if cohort:
+                import pandas as pd
+                st.caption(f"{cohort['users']} learners, computed {pd.to_datetime(cohort['computed'], unit='s')} UTC. "
+                           f"Difficulty: Easy below {cohort['difficulty']['easy_below']:.0%}, "
+                           f"Hard above {cohort['difficulty']['hard_above']:.0%} overall mastery.")
+                topics = pd.DataFrame.from_dict(cohort["topics"], orient="index").loc[cohort["weakest"]]
+                st.write("Weakest topics first:")
+                st.dataframe(topics)
+            else:
+                st.info("Cohort mastery hasn't been computed yet (run `python mastery.py` nightly).")
+
+            st.markdown("### Time Spent by Users")
+            st.progress(0.7, text="Average activity level (mock data)")
+
+        with tab2:
+            st.subheader("Database Tools 🧰")
+            if st.button("🗑️ Reset Entire Database"):
+                db.reset_db()
+                st.warning("⚠️ Database has been reset!")
+            st.download_button(
+                "⬇️ Export Leaderboard CSV",
+                data="\n".join(["user,xp"] + [f"{row['user']},{row['xp']}" for row in data]) if data else "",
+                file_name="leaderboard.csv",
+                mime="text/csv"
+            )
+
+        with tab3:
+            st.subheader("User Management 👥")
+            users = db.get_all_users() if hasattr(db, "get_all_users") else []
+            if users:
+                st.table(users)
+            else:
+                st.info("No registered users found.")
+            
+            new_xp_user = st.text_input("User Name to Update XP")
+            new_xp_value = st.number_input("New XP Value", min_value=0)
+            new_profile_data = st.text_area("Profile JSON (optional)")
+            
+            st.markdown("### 🎓 Cohort Certificates")
+            course = st.text_input("Course name", value="EduGenie Quick Course")
+            if st.button("Render certificates for all users") and users:
+                if len(users) > COHORT_MAX_USERS:
+                    st.error(f"{len(users)} users; at most {COHORT_MAX_USERS} per cohort (EDUGENIE_COHORT_MAX_USERS).")
+                else:
+                    # rendered on the job queue; the user count is in the payload so new sign-ups get a new zip
+                    job = get_jobs().submit("cohort_certificates",
+                                            {"course": course, "date": today(), "users": len(users)})
+                    st.session_state["cert_job"] = job["id"]
+            job_id = st.session_state.get("cert_job")
+            job = get_jobs().get(job_id) if job_id else None
+            if job and job["status"] in (QUEUED, RUNNING):
+                st.progress(job["progress"], text=f"{job['message'] or job['status']} (refresh to update)")
+            elif job and job["status"] == FAILED:
+                st.error(f"Rendering certificates failed: {job['error']}")
+            elif job and job["status"] == DONE and os.path.exists(job["result"]["path"]):
+                with open(job["result"]["path"], "rb") as fh:
+                    st.download_button(f"⬇️ Download {job['result']['users']} certificates (zip)", data=fh,
+                                       file_name="certificates.zip", mime="application/zip")
+
+            if st.button("💾 Update User"):
+                if new_xp_user:
+                    db.ensure_user(new_xp_user)  # create if doesn't exist
+                    db.update_xp(new_xp_user, new_xp_value)
+                    if new_profile_data:
+                        try:
+                            profile_dict = json.loads(new_profile_data)
+                            db.update_profile(new_xp_user, profile_dict)
+                        except json.JSONDecodeError:
+                            st.error("Invalid JSON for profile")
+                    st.success(f"Updated XP and profile for {new_xp_user}")
+
+    else:
+        st.warning("🔒 Access denied — invalid admin key.")
@@ -0,0 +1,25 @@
+import streamlit as st
+
+import metrics
+from resources import get_gemini
+
+
+class ChatFailed(Exception):
+    pass
+
+
+@st.cache_data
+def _cached_chat(prompt, model="Gemini"):
+    metrics.inc("edugenie_chat_cache_requests_total", result="miss")
+    response = get_gemini().chat(prompt)
+    if "error" in response:
+        raise ChatFailed(response["error"])   # st.cache_data doesn't memoize exceptions
+    return response.get("text", "")
+
+def cached_chat(prompt, model="Gemini"):
+    metrics.inc("edugenie_chat_cache_requests_total", result="lookup")
+    try:
+        return _cached_chat(prompt, model)
+    except ChatFailed as e:
+        st.error(f"EduGenie couldn't reach the AI service: {e}")
+        return ""
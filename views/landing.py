@@ -0,0 +1,26 @@
+import streamlit as st
+
+from views.common import cached_chat
+
+
+def render(name: str):
+    col1, col2 = st.columns([2,3])
+    with col1:
+        st.title("EduGenie — Personalized AI Learning Companion 📚✨")
+        st.markdown("### 🧠 Personalized | 📊 Gamified | 🎯 Fun Learning Experience")
+        st.markdown("- Chat with AI Tutor (text + voice) 🤖🎤")
+        st.markdown("- Upload notes & get instant summaries 📄💡")
+        st.markdown("- Earn XP, badges & climb the leaderboard 🏆🔥")
+        if st.button("Start Learning! 🚀"):
+            st.balloons()
+            st.success("Welcome aboard, learner! ✨")
+    with col2:
+        st.image("assets/hero.gif", width=320)
+        st.markdown("### 🌟 Features")
+        st.progress(100, text="AI Tutor • Quizzes • Live Peer Rooms • XP Tracker")
+        
+    # Daily challenge
+    if st.button("Show Today's Challenge 🔥"):
+        prompt = "Give one short STEM challenge suitable for a quick study session (one sentence)."
+        challenge = cached_chat(prompt)
+        st.info(f"🔥 Today's Challenge: {challenge}")
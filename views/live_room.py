@@ -0,0 +1,8 @@
+import streamlit as st
+from streamlit_webrtc import webrtc_streamer
+
+
+def render(name: str):
+    st.header("🎥 Live Video Study Room")
+    st.info("Start your camera and mic to join the real-time study session!")
+    webrtc_streamer(key="edu_webrtc")
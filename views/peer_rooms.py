@@ -0,0 +1,58 @@
+import json
+import os
+import time
+
+import jwt
+import streamlit as st
+import streamlit.components.v1 as components
+
+import firebase_utils
+from resources import get_chat_batcher, get_chat_mirror
+
+
+def render(name: str):
+    JWT_SECRET = st.secrets.get("JWT_SECRET", os.environ.get("JWT_SECRET", "supersecret123"))
+    # room sync relay served by token_server.py
+    sync_url = st.secrets.get("ROOM_SYNC_URL", os.environ.get("ROOM_SYNC_URL", "http://localhost:5001"))
+
+    st.header("👥 Peer Study Rooms")
+    st.write("Collaborate in real time with your friends using JWT-secured peer rooms.")
+    room = st.text_input("Room name:", value="demo-room")
+    if room:
+        payload = {"room": room, "user": name, "iat": int(time.time()), "exp": int(time.time()) + 3600}
+        token = jwt.encode(payload, JWT_SECRET, algorithm="HS256")
+        if isinstance(token, bytes): token = token.decode("utf-8")
+    if st.button("Join Peer Room 🔑"):
+        with open("peer_room.html","r",encoding="utf-8") as f:
+            html = f.read()
+        config = json.dumps({"token": token, "room": room, "syncUrl": sync_url.rstrip("/")}).replace("</", "<\\/")
+        html = html.replace("<!--ROOM_CONFIG-->", f"<script>window.roomConfig = {config};</script>")
+        components.html(html, height=600, scrolling=True)
+
+    if room:
+        render_chat(room, name)
+
+
+def render_chat(room: str, name: str):
+    st.subheader("💬 Room Chat")
+    try:
+        firebase_utils.init_firebase()
+    except Exception as e:
+        st.info(f"Room chat needs Firebase ({e}).")
+        return
+    mirror = get_chat_mirror()
+    # "Load older" grows the window; the mirror backfills from Firebase as needed
+    limit_key = f"chat_limit:{room}"
+    limit = st.session_state.get(limit_key, 50)
+    msgs = mirror.get_messages(room, limit=limit)
+    if len(msgs) >= limit and st.button("Load older messages"):
+        mirror.get_older(room, msgs[0]["id"], limit=50)
+        st.session_state[limit_key] = limit = limit + 50
+        msgs = mirror.get_messages(room, limit=limit, sync=False)
+    for m in msgs:
+        st.markdown(f"**{m['user']}**: {m['message']}")
+    with st.form(f"chat_form:{room}", clear_on_submit=True):
+        text = st.text_input("Message", key=f"chat_input:{room}")
+        if st.form_submit_button("Send") and text.strip():
+            get_chat_batcher().send(room, name, text.strip())
+            st.rerun()
@@ -0,0 +1,64 @@
+import json
+import time
+
+import streamlit as st
+
+from resources import get_db, get_learning_path
+from views.common import cached_chat
+
+
+def due_label(due: int, now: float) -> str:
+    return "now" if due <= now else f"day {int((due - now) // 86400) + 1}"
+
+
+def render(name: str):
+    db = get_db()
+    learning_path = get_learning_path()
+
+    st.header("🎯 AI Learning Planner")
+    st.caption("EduGenie analyzes your progress and creates a custom 3-day study plan using Gemini!")
+
+    # spaced-repetition reviews falling due during the 3-day plan
+    reviews = learning_path.due_reviews(name, within=3 * 24 * 3600, limit=10)
+    now = time.time()
+    if reviews:
+        st.markdown("**📅 Due for review:** " + ", ".join(
+            f"{r['topic']} ({due_label(r['due'], now)})" for r in reviews))
+
+    user_goals = st.text_area(
+        "What do you want to achieve this week? ✍️",
+        placeholder="e.g., Master Trigonometry and Fourier basics."
+    )
+
+    if st.button("✨ Generate My Learning Plan"):
+        with st.spinner("Analyzing your quiz history and crafting a plan..."):
+            history = db.get_recent_quiz_scores(name, limit=10)
+            history_text = json.dumps(history)
+            review_text = json.dumps([
+                {"topic": r["topic"], "due": due_label(r["due"], now), "ease": r["ease"], "lapses": r["lapses"]}
+                for r in reviews])
+
+            prompt = f"""
+You are EduGenie, an AI tutor that creates personalized learning plans.
+Analyze the student's quiz history and current goals to build a 3-day study plan.
+
+Quiz History:
+{history_text}
+
+Spaced-repetition reviews due during these 3 days (schedule each on or after its due day;
+low ease / many lapses means the student keeps forgetting it):
+{review_text}
+
+User Goal: {user_goals}
+
+Provide a markdown-formatted output with:
+- Day 1: Topics, short explanation, and 2 practice questions
+- Day 2: Topics, example problem and mini quiz
+- Day 3: Review, real-world application, and motivational quote
+            """
+
+            plan = cached_chat(prompt)
+            st.markdown("### 📘 Your Personalized 3-Day Learning Plan")
+            st.markdown(plan)
+            db.cache_set(f"learning_plan:{name}", plan)
+            st.balloons()
@@ -0,0 +1,65 @@
+import plotly.express as px
+import streamlit as st
+
+from certificates import certificate_filename, render_certificate
+from resources import get_assets, get_db
+
+
+def render(name: str):
+    db = get_db()
+    ASSETS = get_assets()
+
+    st.header("📊 Your Progress Dashboard")
+
+    col1, col2 = st.columns([2, 1])
+    xp = db.get_xp(name)
+    level = "Beginner" if xp < 100 else "Intermediate" if xp < 250 else "Expert"
+    progress_pct = min(xp / 300, 1.0) * 100
+
+    with col1:
+        st.subheader(f"Welcome, {name} 👋")
+        st.markdown(f"### 🌟 Level: **{level}**")
+        st.progress(progress_pct / 100)
+        st.metric("XP", f"{xp} pts")
+
+        # XP Ring
+        fig = px.pie(
+            values=[xp, max(0, 300 - xp)],
+            names=["XP", "Remaining"],
+            hole=0.7,
+            color_discrete_sequence=["#2563EB", "#E5E7EB"]
+        )
+        fig.update_traces(textinfo="none")
+        st.plotly_chart(fig, use_container_width=True)
+
+    with col2:
+        st.subheader("🏅 Badges")
+        if xp < 100:
+            st.image(ASSETS.get("badge_easy", ""), width=80)
+            st.caption("Beginner 🌱")
+        elif xp < 250:
+            st.image(ASSETS.get("badge_medium", ""), width=80)
+            st.caption("Intermediate 🚀")
+        else:
+            st.image(ASSETS.get("badge_hard", ""), width=80)
+            st.caption("Expert 🧠")
+
+        if xp >= 200:
+            st.success("🎉 Genie Mentor says: 'You’re ready to unlock Advanced Quizzes!'")
+        else:
+            st.info("💡 Keep going! Earn 50 more XP to unlock new topics!")
+
+    st.markdown("### 🏁 Leaderboard")
+    lb = db.get_leaderboard(limit=10)
+    st.table(lb)
+    
+    # Certificate generation example (rendered in memory on request, then cached per user/course/day)
+    if st.button("🎓 Get Completion Certificate (Sample)"):
+        st.session_state["certificate_requested"] = True
+    if st.session_state.get("certificate_requested"):
+        st.download_button(
+            label="Download Completion Certificate (Sample)",
+            data=render_certificate(name, "EduGenie Quick Course"),
+            file_name=certificate_filename(name),
+            mime="application/pdf",
+        )
@@ -0,0 +1,61 @@
+import os
+import time
+
+import streamlit as st
+
+from resources import get_assets, get_db, get_gemini, get_learning_path
+
+
+def render(name: str):
+    db = get_db()
+    gemini = get_gemini()
+    learning_path = get_learning_path()
+    ASSETS = get_assets()
+
+    st.header("🧩 Quick Quiz Generator")
+    suggestion = learning_path.suggest_next_topic(name)
+    if suggestion:
+        st.caption(f"📅 Suggested next: **{suggestion}**")
+    topic = st.text_input("Enter a topic:", value="Fourier Transform")
+    diff = st.selectbox("Difficulty Level", ["Easy","Medium","Hard"])
+    n = st.slider("Number of Questions", 1, 10, 5)
+    
+    # show badge preview
+    badge_map = {"Easy": "badge_easy", "Medium": "badge_medium", "Hard": "badge_hard"}
+    badge_img = ASSETS.get(badge_map.get(diff, "badge_easy"))
+    if badge_img and os.path.exists(badge_img):
+        st.image(badge_img, width=80)
+    if st.button("Generate Quiz 🧠"):
+        with st.spinner("Crafting smart questions..."):
+            # adapt difficulty using learning_path
+            adapted_diff = learning_path.adapt_difficulty(name, diff)
+            quiz = gemini.generate_quiz(topic, difficulty=adapted_diff, n_questions=n)
+            st.session_state['quiz'] = quiz
+            # every button click reruns this script, so keep results and the start time across reruns
+            st.session_state['quiz_correct'] = {}
+            st.session_state['quiz_started'] = time.time()
+    if st.session_state.get('quiz'):
+        quiz = st.session_state['quiz']
+        correct = st.session_state.setdefault('quiz_correct', {})
+        start_time = st.session_state.setdefault('quiz_started', time.time())
+        for idx, q in enumerate(quiz):
+            st.markdown(f"**Q{idx+1}.** {q.get('q', 'No question')}")
+            ans = st.text_input(f"Your Answer Q{idx+1}", key=f"q{idx}")
+            if st.button(f"Submit Q{idx+1}", key=f"sub{idx}"):
+                feedback = gemini.chat(f'Grade: Q: {q.get("q")} | User: {ans}. Give correct/incorrect + feedback.')
+                st.write(feedback.get('text','Feedback not available'))
+                correct[idx] = bool(q.get('answer')) and ans.strip().lower() == q.get('answer','').lower()
+        if st.button("Finish Quiz 🏁"):
+            score = sum(correct.values())
+            elapsed = time.time() - start_time
+            xp = score * (1 if diff=='Easy' else 2 if diff=='Medium' else 3)
+            
+            # small bonus for speed
+            if elapsed < max(30, n * 10):
+                xp += 1
+            db.add_xp(name, xp)
+            
+            # update learning path with results
+            learning_path.record_quiz_result(user=name, topic=topic, score=score, total=len(quiz))
+            st.success(f"✅ Score: {score}/{len(quiz)} | XP earned: {xp} ✨")
+            st.balloons()
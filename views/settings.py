@@ -0,0 +1,15 @@
+import streamlit as st
+
+from resources import get_db, get_gemini
+
+
+def render(name: str):
+    db = get_db()
+    gemini = get_gemini()
+
+    st.header("⚙️ Settings / Debug")
+    st.write("Gemini Available:", gemini.available)
+    st.write("Model:", gemini.model)
+    if st.button("Reset DB 🔄"):
+        db.reset_db()
+        st.success("✅ Database reset complete.")
@@ -0,0 +1,146 @@
+import os
+import time
+
+import streamlit as st
+from streamlit_drawable_canvas import st_canvas
+
+from resources import get_db, get_gemini
+
+# Optional STT
+try:
+    import speech_recognition as sr
+    HAS_STT = True
+except Exception:
+    HAS_STT = False
+
+
+def stt_listen_once(timeout=5):
+    if not HAS_STT:
+        return None
+    r = sr.Recognizer()
+    with sr.Microphone() as source:
+        audio = r.listen(source, timeout=timeout)
+    try:
+        text = r.recognize_google(audio)
+        return text
+    except Exception:
+        return None
+
+
+def show_image_result(result: dict, heading: str, image):
+    if result.get("blank"):
+        st.info("The canvas is empty — draw something first ✏️")
+        return
+    if "error" in result:
+        st.error(f"EduGenie couldn't analyze the image: {result['error']}")
+        return
+    st.image(image)
+    st.markdown(heading)
+    st.write(result.get("text", ""))
+    if result.get("cached"):
+        st.caption("♻️ Reused the explanation of a near-identical image.")
+
+
+def render(name: str):
+    db = get_db()
+    gemini = get_gemini()
+
+    st.header("AI Tutor 🤖")
+    st.caption("Ask EduGenie anything! Type, speak, or draw a diagram for analysis.")
+
+    # Contextual memory (previous chat)
+    prev_ctx = db.cache_get(f"context:{name}") or ""
+
+    # User input
+    query = st.text_area("💬 Type your question here:", placeholder="E.g., Explain Nyquist sampling theorem in simple terms...")
+
+    # Layout for chat + image/sketch
+    col1, col2 = st.columns([3, 2])
+
+    # ----------- Text / Voice Interaction -----------
+    with col1:
+        st.subheader("💬 Ask or Speak")
+
+        # Type-based interaction
+        if st.button("Ask EduGenie 🧠"):
+            if not query.strip():
+                st.warning("Please type a question first.")
+            else:
+                with st.spinner("Thinking deeply... 💭"):
+                    prompt = prev_ctx + "\nUser: " + query
+                    response = gemini.chat(prompt)
+                    if "error" in response:
+                        # nothing to speak, cache or remember; the next ask retries
+                        st.error(f"EduGenie couldn't reach the AI service: {response['error']}")
+                    else:
+                        text = response.get("text", "")
+                        st.markdown("### 📘 EduGenie says:")
+                        st.write(text)
+
+                        # 🎧 Text-to-Speech
+                        audio_file = gemini.tts(text)
+                        if isinstance(audio_file, str) and os.path.exists(audio_file):
+                            st.audio(audio_file)
+
+                        # 💾 Cache response + update context memory
+                        new_ctx = (prev_ctx + f"\nUser: {query}\nAI: {text}")[-4000:]
+                        db.cache_set_many({f"chat:{query[:64]}": text, f"context:{name}": new_ctx}, int(time.time()))
+                        st.balloons()
+
+        # 🎙️ Speech Input (if available)
+        st.markdown("Or try speaking your question 👇")
+
+        if HAS_STT:
+            if st.button("🎙️ Speak to EduGenie"):
+                recognizer = sr.Recognizer()
+                with sr.Microphone() as source:
+                    st.info("Listening... Speak now 🎧")
+                    audio = recognizer.listen(source, phrase_time_limit=6)
+                    st.success("Got it! Processing your speech...")
+                    try:
+                        said = recognizer.recognize_google(audio)
+                        st.write(f"🗣️ You said: **{said}**")
+                        response = gemini.chat(prev_ctx + "\nUser: " + said)
+                        if "error" in response:
+                            st.error(f"EduGenie couldn't reach the AI service: {response['error']}")
+                        else:
+                            st.markdown("### 📘 EduGenie says:")
+                            st.write(response.get("text", ""))
+                            audio_file = gemini.tts(response.get("text", ""))
+                            if isinstance(audio_file, str) and os.path.exists(audio_file):
+                                st.audio(audio_file)
+                    except sr.UnknownValueError:
+                        st.error("Sorry, I couldn’t understand that. Please try again.")
+        else:
+            st.info("🎤 Speech recognition not installed. Run `pip install SpeechRecognition pyaudio` to enable it.")
+
+    # ----------- Image / Sketch Analysis -----------
+    with col2:
+        st.subheader("📷 Image or Sketch Analysis")
+        st.markdown("Draw or upload a concept diagram — EduGenie will explain it step by step!")
+
+        canvas_result = st_canvas(
+            fill_color="rgba(255, 165, 0, 0.3)",
+            stroke_width=2,
+            stroke_color="#000000",
+            background_color="#ffffff",
+            height=250,
+            width=350,
+            drawing_mode="freedraw",
+            return_image_data=True,
+            key="canvas_ai_tutor",
+        )
+
+        if canvas_result.image_data is not None and st.button("🖊️ Explain My Sketch"):
+            with st.spinner("Interpreting your sketch... 🧩"):
+                result = gemini.explain_image(canvas_result.image_data,
+                                              "Explain this hand-drawn concept diagram in simple, visual terms.",
+                                              canvas=True)
+            show_image_result(result, "### 📘 EduGenie explains your sketch:", canvas_result.image_data)
+
+        # Image Upload Option
+        img = st.file_uploader("Or upload an image (png/jpg/jpeg)", type=['png', 'jpg', 'jpeg'])
+        if img is not None and st.button("🔍 Analyze Uploaded Image"):
+            with st.spinner("Analyzing your image... 🧠"):
+                result = gemini.explain_image(img, "Analyze this image and describe it like a teacher would.")
+            show_image_result(result, "### 📘 EduGenie explains your image:", img)
@@ -0,0 +1,45 @@
+import time
+
+import streamlit as st
+
+import metrics
+from resources import get_db, get_gemini
+
+
+def render(name: str):
+    db = get_db()
+    gemini = get_gemini()
+
+    st.header("📄 Upload Notes or PDFs")
+    uploaded = st.file_uploader("Upload PDF or TXT", type=['pdf','txt'])
+    if uploaded:
+        st.info(f"📂 File: {uploaded.name} uploaded successfully!")
+        raw = ""
+        if uploaded.type == "application/pdf":
+            from PyPDF2 import PdfReader
+            with metrics.timer("edugenie_pdf_parse_seconds"):
+                reader = PdfReader(uploaded)
+                for p in reader.pages: raw += p.extract_text() + "\n"
+        else:
+            raw = uploaded.getvalue().decode('utf-8')
+        st.write(raw[:800])
+        if st.button("Summarize & Generate Flashcards ✨"):
+            with st.spinner("Processing your notes... ⚡"):
+                summ = gemini.summarize(raw)
+                flashcards = gemini.generate_quiz(raw[:120], difficulty='Medium', n_questions=5)
+                st.subheader("📜 Summary")
+                st.write(summ)
+                st.subheader("🎴 Flashcards")
+                for i, fc in enumerate(flashcards if isinstance(flashcards, list) else []):
+                    q = fc.get('q', f"Card {i+1}")
+                    a = fc.get('a', "No answer provided")
+                    st.markdown(f"**Q{i+1}.** {q}")
+                    st.write(f"**A.** {a}")
+                    
+                # cache summary offline
+                db.cache_set(f"summary:{uploaded.name}", summ, int(time.time()))
+                st.success("Summary cached for offline access!")
+                st.balloons()
+                
+                # Download summary
+                st.download_button("Download Summary (txt)", summ)